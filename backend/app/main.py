@@ -1,10 +1,14 @@
 from fastapi import FastAPI, WebSocket, Body
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from app.routers import pcan, tpms
 from app.src.BLETestAutomation import BLETestAutomation
 from app.src.DevicesDetection import scan_devices
+from app.services.can_stream import can_stream_hub
+from app.services.pcan_service import pcan_service
+from app.services.tpms_service import tpms_service
+from app.services.metrics import render_metrics, METRICS_CONTENT_TYPE
 import os
 import asyncio
 from typing import Dict, Set, Optional
@@ -42,6 +46,77 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception:
         clients.remove(websocket)
 
+@app.websocket("/ws/can")
+async def can_stream_endpoint(websocket: WebSocket):
+    """WebSocket endpoint pushing CAN frames from the PCAN reader thread as they arrive.
+
+    The stream can be narrowed to CAN IDs or ranges with ?ids=100,200-2FF or by
+    sending {"ids": ["100", "200-2FF"]} at any time; an empty list streams everything.
+    The union of all subscribers' IDs is programmed into the hardware filter.
+    ?channel=PCAN_USBBUS1 limits it to one channel, otherwise all open
+    channels are streamed and each frame carries its channel name.
+    """
+    await websocket.accept()
+    ids = websocket.query_params.get("ids")
+    try:
+        sub = await can_stream_hub.subscribe(ids.split(",") if ids else None, websocket.query_params.get("channel"))
+    except ValueError as e:
+        await websocket.close(code=1003, reason=str(e))
+        return
+
+    async def receive_filters():
+        while True:
+            msg = await websocket.receive_json()
+            if isinstance(msg, dict) and "ids" in msg:
+                try:
+                    await can_stream_hub.set_ids(sub, msg.get("ids"))
+                except ValueError as e:
+                    await websocket.send_json({"type": "error", "error": str(e)})
+
+    async def send_frames():
+        while True:
+            frames = await sub.queue.get()
+            await websocket.send_json({"type": "can_frames", "frames": frames, "dropped": sub.dropped})
+
+    tasks = [asyncio.create_task(receive_filters()), asyncio.create_task(send_frames())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await can_stream_hub.unsubscribe(sub)
+
+@app.websocket("/ws/tpms")
+async def tpms_stream_endpoint(websocket: WebSocket):
+    """WebSocket endpoint pushing decoded tire state while TPMS collection runs.
+
+    The first message carries every tire; after that only tires whose
+    values or alarm level changed are sent, each with its complete current
+    state. Alarm transitions arrive as separate "tpms_alarms" messages.
+    """
+    await websocket.accept()
+    sub = await tpms_service.subscribe()
+
+    async def receive():
+        while True:
+            await websocket.receive_text()
+
+    async def send_tires():
+        while True:
+            tires, alarms = await sub.next_changes()
+            if tires:
+                await websocket.send_json({"type": "tpms_tires", "tires": tires})
+            if alarms:
+                await websocket.send_json({"type": "tpms_alarms", "alarms": alarms})
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send_tires())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        tpms_service.unsubscribe(sub)
+
 async def broadcast(msg: dict) -> None:
     """Send JSON message to all connected WebSocket clients, removing disconnected."""
     disconnected = []
@@ -154,6 +229,11 @@ async def run_ble_test(ble):
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """CAN ingest pipeline metrics in the Prometheus text exposition format"""
+    return Response(render_metrics(pcan_service, can_stream_hub), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/api/{path:path}")
 async def api_not_found(path: str):
     return JSONResponse(
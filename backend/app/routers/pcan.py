@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas.pcan import InitRequest, WriteRequest, SaveDataRequest, CommandResponse, ResponsePayload
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from app.schemas.pcan import InitRequest, WriteRequest, WriteBatchRequest, SaveDataRequest, BufferConfigRequest, FilterRequest, CyclicRequest, CyclicUpdateRequest, VirtualTrafficRequest, RecordRequest, ReplayRequest, DBCLoadRequest, CommandResponse, ResponsePayload
 from app.services.pcan_service import pcan_service
+from app.services.pcan_async import pcan_async
+from typing import Optional
 import json
 import os
 from datetime import datetime
@@ -11,7 +14,12 @@ DATA_FILE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'data
 
 @router.post("/pcan/initialize", response_model=CommandResponse)
 async def initialize_pcan(request: InitRequest):
-    result = pcan_service.initialize(request.payload.id, request.payload.bit_rate)
+    result = await pcan_async.initialize(
+        request.payload.id,
+        request.payload.bit_rate,
+        request.payload.reader_mode or "event",
+        bool(request.payload.fd)
+    )
     return CommandResponse(
         command="PCAN_INIT_RESULT",
         payload=ResponsePayload(
@@ -22,8 +30,8 @@ async def initialize_pcan(request: InitRequest):
     )
 
 @router.post("/pcan/release", response_model=CommandResponse)
-async def release_pcan():
-    result = pcan_service.release()
+async def release_pcan(channel: Optional[str] = None):
+    result = await pcan_async.release(channel)
     return CommandResponse(
         command="PCAN_UNINIT_RESULT",
         payload=ResponsePayload(
@@ -34,8 +42,8 @@ async def release_pcan():
     )
 
 @router.get("/pcan/read", response_model=CommandResponse)
-async def read_pcan():
-    result = pcan_service.read_message()
+async def read_pcan(channel: Optional[str] = None):
+    result = await pcan_async.read_message(channel)
     # Wrap message in data object for frontend compatibility
     message_data = result.get("message")
     response_data = {"message": message_data} if message_data else result.get("error", "")
@@ -48,11 +56,98 @@ async def read_pcan():
         )
     )
 
+@router.get("/pcan/read/batch", response_model=CommandResponse)
+async def read_pcan_batch(
+    max_count: int = Query(500, ge=1, le=10000),
+    max_bytes: int = Query(262144, ge=64),
+    wait_ms: int = Query(0, ge=0, le=30000),
+    channel: Optional[str] = None
+):
+    # Long-poll waits happen on the threadpool so the event loop stays free
+    result = await run_in_threadpool(pcan_service.read_messages, max_count, max_bytes, wait_ms / 1000.0, channel)
+    if result["success"]:
+        response_data = {
+            "fields": result["fields"],
+            "rows": result["rows"],
+            "pending": result["pending"]
+        }
+    else:
+        response_data = result.get("error", "")
+    return CommandResponse(
+        command="DATA_BATCH",
+        payload=ResponsePayload(
+            status="ok" if result["success"] else "error",
+            data=response_data,
+            packet_status="success" if result["success"] else "failed"
+        )
+    )
+
+@router.get("/pcan/read/since", response_model=CommandResponse)
+async def read_pcan_since(
+    seq: Optional[int] = Query(None, ge=0),
+    max_count: int = Query(500, ge=1, le=10000),
+    max_bytes: int = Query(262144, ge=64),
+    wait_ms: int = Query(0, ge=0, le=30000),
+    channel: Optional[str] = None
+):
+    """Non-destructive read from sequence number seq; pass next_seq back as seq to continue"""
+    result = await run_in_threadpool(pcan_service.read_since, seq, max_count, max_bytes, wait_ms / 1000.0, channel)
+    if result["success"]:
+        response_data = {
+            "fields": result["fields"],
+            "rows": result["rows"],
+            "next_seq": result["next_seq"],
+            "gap": result["gap"],
+            "pending": result["pending"]
+        }
+    else:
+        response_data = result.get("error", "")
+    return CommandResponse(
+        command="DATA_STREAM",
+        payload=ResponsePayload(
+            status="ok" if result["success"] else "error",
+            data=response_data,
+            packet_status="success" if result["success"] else "failed"
+        )
+    )
+
+@router.get("/pcan/latest", response_model=CommandResponse)
+async def read_pcan_latest(channel: Optional[str] = None, ids: Optional[str] = None):
+    """Latest frame per CAN ID; ids narrows the snapshot, e.g. ?ids=100,200-2FF"""
+    # Off the event loop: an HTTP read may reprogram the acceptance filter (a driver call)
+    result = await pcan_async.get_latest(channel, ids.split(",") if ids else None)
+    return CommandResponse(
+        command="DATA_LATEST",
+        payload=ResponsePayload(
+            status="ok" if result["success"] else "error",
+            data={"fields": result["fields"], "rows": result["rows"]} if result["success"] else result.get("error", ""),
+            packet_status="success" if result["success"] else "failed"
+        )
+    )
+
+@router.get("/pcan/stats")
+async def get_pcan_stats(channel: Optional[str] = None, ids: Optional[str] = None):
+    """Per-ID count, frame rates over 1/10/60 s, inter-arrival mean/min/max, jitter and DLC changes"""
+    return await pcan_async.get_stats(channel, ids.split(",") if ids else None)
+
+@router.delete("/pcan/stats")
+async def reset_pcan_stats(channel: Optional[str] = None):
+    return pcan_service.reset_stats(channel)
+
+@router.get("/pcan/health")
+async def get_pcan_health(channel: Optional[str] = None, since: Optional[float] = None):
+    """Bus state, error counters, bus load and their sampled history (since = unix time).
+    Load is null while the acceptance filter is narrowed, as it would undercount"""
+    return await pcan_async.get_health(channel, since)
+
 @router.post("/pcan/write", response_model=CommandResponse)
-async def write_pcan(request: WriteRequest):
-    result = pcan_service.write_message(
+async def write_pcan(request: WriteRequest, channel: Optional[str] = None):
+    result = await pcan_async.write_message(
         request.payload.id,
-        request.payload.data
+        request.payload.data,
+        channel=channel,
+        fd=request.payload.fd,
+        brs=bool(request.payload.brs)
     )
     return CommandResponse(
         command="DATA",
@@ -63,9 +158,160 @@ async def write_pcan(request: WriteRequest):
         )
     )
 
+def _batch_response(result: dict) -> CommandResponse:
+    return CommandResponse(
+        command="WRITE_BATCH",
+        payload=ResponsePayload(
+            status="ok" if result["success"] else "error",
+            data=result["batch"] if result["success"] else result.get("error", ""),
+            packet_status="success" if result["success"] else "failed"
+        )
+    )
+
+@router.post("/pcan/write/batch", response_model=CommandResponse)
+async def write_pcan_batch(request: WriteBatchRequest):
+    """Queue frames for the writer thread; with wait_ms, wait up to that long for the batch to finish"""
+    result = await pcan_async.write_batch(
+        [f.model_dump() for f in request.frames],
+        request.channel,
+        bool(request.stop_on_error)
+    )
+    if result["success"] and request.wait_ms:
+        batch = pcan_service.get_tx_batch(result["batch"]["batch_id"])
+        if batch is not None:
+            await run_in_threadpool(batch.wait, min(request.wait_ms, 30000) / 1000.0)
+            result["batch"] = batch.to_dict()
+    return _batch_response(result)
+
+@router.get("/pcan/write/batch/{batch_id}", response_model=CommandResponse)
+async def get_pcan_batch(batch_id: int, wait_ms: int = Query(0, ge=0, le=30000)):
+    batch = pcan_service.get_tx_batch(batch_id)
+    if batch is None:
+        return _batch_response({"success": False, "error": f"Unknown batch: {batch_id}"})
+    if wait_ms:
+        await run_in_threadpool(batch.wait, wait_ms / 1000.0)
+    return _batch_response({"success": True, "batch": batch.to_dict()})
+
 @router.get("/pcan/status")
-async def get_pcan_status():
-    return pcan_service.get_status()
+async def get_pcan_status(channel: Optional[str] = None):
+    return await pcan_async.get_status(channel)
+
+@router.get("/pcan/commands")
+async def get_pcan_commands():
+    """Load of the executor that runs driver calls off the event loop"""
+    return pcan_async.stats()
+
+@router.get("/pcan/buffer")
+async def get_pcan_buffer(channel: Optional[str] = None):
+    return pcan_service.get_buffer_stats(channel)
+
+@router.post("/pcan/buffer")
+async def configure_pcan_buffer(request: BufferConfigRequest, channel: Optional[str] = None):
+    return await pcan_async.set_overflow_policy(request.overflow, request.spool_dir, request.spool_mb, channel)
+
+@router.get("/pcan/filter")
+async def get_pcan_filter():
+    return pcan_service.get_filters()
+
+@router.post("/pcan/filter")
+async def set_pcan_filter(request: FilterRequest):
+    return await pcan_async.set_subscription(request.owner, request.ids, request.channel)
+
+@router.delete("/pcan/filter/{owner}")
+async def remove_pcan_filter(owner: str):
+    return await pcan_async.remove_subscription(owner)
+
+@router.get("/pcan/cyclic")
+async def list_pcan_cyclic():
+    return pcan_service.get_cyclic()
+
+@router.post("/pcan/cyclic")
+async def start_pcan_cyclic(request: CyclicRequest):
+    return await pcan_async.start_cyclic(
+        request.id, request.data, request.period_ms, request.channel,
+        request.extended, request.fd, request.brs,
+        request.counter_byte, request.counter_mask, request.checksum_byte, request.checksum,
+        request.key
+    )
+
+@router.patch("/pcan/cyclic/{key}")
+async def update_pcan_cyclic(key: str, request: CyclicUpdateRequest):
+    return await pcan_async.update_cyclic(key, **request.model_dump())
+
+@router.delete("/pcan/cyclic/{key}")
+async def stop_pcan_cyclic(key: str):
+    return await pcan_async.stop_cyclic(key)
+
+@router.delete("/pcan/cyclic")
+async def stop_all_pcan_cyclic():
+    return await pcan_async.stop_cyclic()
+
+@router.get("/pcan/virtual")
+async def get_pcan_virtual():
+    return pcan_service.get_virtual()
+
+@router.post("/pcan/virtual")
+async def configure_pcan_virtual(request: VirtualTrafficRequest):
+    settings = request.model_dump()
+    if request.tpms_id:
+        try:
+            settings["tpms_id"] = int(request.tpms_id, 16)
+        except ValueError:
+            return {"success": False, "error": f"Invalid TPMS ID: {request.tpms_id}"}
+    return await pcan_async.configure_virtual(**settings)
+
+@router.get("/pcan/record")
+async def get_pcan_recording():
+    return pcan_service.get_recording()
+
+@router.post("/pcan/record/start")
+async def start_pcan_recording(request: RecordRequest):
+    return await pcan_async.start_recording(request.name, bool(request.compress))
+
+@router.post("/pcan/record/stop")
+async def stop_pcan_recording():
+    return await run_in_threadpool(pcan_service.stop_recording)
+
+@router.get("/pcan/captures")
+async def list_pcan_captures():
+    return await run_in_threadpool(pcan_service.list_captures)
+
+@router.get("/pcan/captures/{name}")
+async def read_pcan_capture(
+    name: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=10000)
+):
+    return await run_in_threadpool(pcan_service.read_capture, name, offset, limit)
+
+@router.get("/pcan/replay")
+async def get_pcan_replay():
+    return pcan_service.get_replay()
+
+@router.post("/pcan/replay/start")
+async def start_pcan_replay(request: ReplayRequest):
+    """Replay a capture file or "data.json"; speed 0 replays as fast as possible"""
+    return await run_in_threadpool(
+        pcan_service.start_replay, request.source, request.target or "bus", request.channel,
+        1.0 if request.speed is None else request.speed, bool(request.loop)
+    )
+
+@router.post("/pcan/replay/stop")
+async def stop_pcan_replay():
+    return await run_in_threadpool(pcan_service.stop_replay)
+
+@router.get("/pcan/dbc")
+async def get_pcan_dbc():
+    return pcan_service.get_dbc()
+
+@router.post("/pcan/dbc")
+async def load_pcan_dbc(request: DBCLoadRequest):
+    """Compile a .dbc file from the DBC directory, or upload one with content"""
+    return await run_in_threadpool(pcan_service.load_dbc, request.name, request.content)
+
+@router.delete("/pcan/dbc/{name}")
+async def unload_pcan_dbc(name: str):
+    return pcan_service.unload_dbc(name)
 
 @router.post("/save-data", response_model=CommandResponse)
 async def save_data(request: SaveDataRequest):
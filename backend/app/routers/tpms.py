@@ -1,17 +1,81 @@
-from fastapi import APIRouter
-from app.schemas.tpms import TPMSStartRequest, TPMSStatusResponse
+from fastapi import APIRouter, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+from app.schemas.tpms import TPMSStartRequest, TPMSStatusResponse, AlarmRulesRequest
 from app.services.tpms_service import tpms_service
 
 router = APIRouter()
 
 @router.post("/start")
 async def start_tpms(request: TPMSStartRequest):
-    return tpms_service.start_collection(request.tire_count, request.axle_config or [])
+    can_id = None
+    if request.can_id:
+        try:
+            can_id = int(request.can_id, 16)
+        except ValueError:
+            return {"success": False, "error": f"Invalid TPMS ID: {request.can_id}"}
+    return await run_in_threadpool(
+        tpms_service.start_collection, request.tire_count, request.axle_config or [], can_id,
+        request.channel, request.vehicle
+    )
 
 @router.post("/stop")
 async def stop_tpms():
-    return tpms_service.stop_collection()
+    return await run_in_threadpool(tpms_service.stop_collection)
+
+@router.post("/reset")
+async def reset_tpms():
+    """Start a new session without changing the configuration"""
+    return tpms_service.reset_session()
 
 @router.get("/status", response_model=TPMSStatusResponse)
 async def get_tpms_status():
     return tpms_service.get_status()
+
+@router.get("/tires")
+async def get_tpms_tires():
+    """Current decoded state of every tire"""
+    return tpms_service.get_tires()
+
+@router.get("/history")
+async def get_tpms_history(
+    metric: Optional[str] = None,
+    tires: Optional[str] = None,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    points: int = Query(500, ge=3, le=10000),
+    method: str = "lttb"
+):
+    """Downsampled per-tire history; tires=1,2,3 narrows it, start/end are unix times"""
+    try:
+        tire_list = [int(t) for t in tires.split(",")] if tires else None
+    except ValueError:
+        return {"success": False, "error": f"Invalid tire list: {tires}"}
+    return await run_in_threadpool(tpms_service.get_history, metric, tire_list, start, end, points, method)
+
+@router.get("/readings")
+async def get_tpms_readings(
+    tire: int,
+    vehicle: Optional[str] = None,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    metric: Optional[str] = None,
+    points: Optional[int] = Query(None, ge=1, le=10000),
+    limit: int = Query(10000, ge=1, le=1000000)
+):
+    """Stored readings of one tire (default the last 24 h); points aggregates metric into time buckets"""
+    return await run_in_threadpool(tpms_service.get_readings, tire, vehicle, start, end, metric, points, limit)
+
+@router.get("/vehicles")
+async def get_tpms_vehicles():
+    return await run_in_threadpool(tpms_service.get_vehicles)
+
+@router.get("/alarms")
+async def get_tpms_alarms(since: Optional[float] = None):
+    """Active alarms and alarm transitions (since = unix time)"""
+    return tpms_service.get_alarms(since)
+
+@router.put("/alarms/rules")
+async def set_tpms_alarm_rules(request: AlarmRulesRequest):
+    """Replace the threshold/hysteresis and pressure-drop rules; omitted sections are disabled"""
+    return tpms_service.set_alarm_rules(request.model_dump())
@@ -5,6 +5,8 @@ class InitPayload(BaseModel):
     id: str
     bit_rate: str
     data: Optional[str] = ""
+    reader_mode: Optional[str] = "event"
+    fd: Optional[bool] = False
 
 class InitRequest(BaseModel):
     command: str
@@ -14,11 +16,27 @@ class WritePayload(BaseModel):
     id: str
     bit_rate: Optional[str] = ""
     data: List[int]
+    fd: Optional[bool] = None
+    brs: Optional[bool] = False
 
 class WriteRequest(BaseModel):
     command: str
     payload: WritePayload
 
+class BatchFrame(BaseModel):
+    id: str
+    data: List[int] = []
+    extended: Optional[bool] = False
+    rtr: Optional[bool] = False
+    fd: Optional[bool] = None
+    brs: Optional[bool] = False
+
+class WriteBatchRequest(BaseModel):
+    frames: List[BatchFrame]
+    channel: Optional[str] = None
+    stop_on_error: Optional[bool] = True
+    wait_ms: Optional[int] = 0
+
 class SaveDataPayload(BaseModel):
     id: Optional[str] = ""
     bit_rate: Optional[str] = ""
@@ -28,6 +46,60 @@ class SaveDataRequest(BaseModel):
     command: str
     payload: SaveDataPayload
 
+class BufferConfigRequest(BaseModel):
+    overflow: str
+    spool_dir: Optional[str] = None
+    spool_mb: Optional[float] = None
+
+class FilterRequest(BaseModel):
+    owner: str = "http"
+    ids: Optional[List[str]] = None
+    channel: Optional[str] = None
+
+class CyclicRequest(BaseModel):
+    id: str
+    data: List[int]
+    period_ms: float
+    channel: Optional[str] = None
+    key: Optional[str] = None
+    extended: Optional[bool] = False
+    fd: Optional[bool] = None
+    brs: Optional[bool] = False
+    counter_byte: Optional[int] = None
+    counter_mask: Optional[int] = 0xFF
+    checksum_byte: Optional[int] = None
+    checksum: Optional[str] = "sum"
+
+class CyclicUpdateRequest(BaseModel):
+    data: Optional[List[int]] = None
+    period_ms: Optional[float] = None
+    counter_byte: Optional[int] = None
+    counter_mask: Optional[int] = None
+    checksum_byte: Optional[int] = None
+    checksum: Optional[str] = None
+
+class VirtualTrafficRequest(BaseModel):
+    load: Optional[float] = None
+    ids: Optional[str] = None
+    tpms_id: Optional[str] = None
+    tpms_tires: Optional[int] = None
+    tpms_hz: Optional[float] = None
+
+class RecordRequest(BaseModel):
+    name: Optional[str] = None
+    compress: Optional[bool] = True
+
+class ReplayRequest(BaseModel):
+    source: str
+    target: Optional[str] = "bus"
+    channel: Optional[str] = None
+    speed: Optional[float] = 1.0
+    loop: Optional[bool] = False
+
+class DBCLoadRequest(BaseModel):
+    name: str
+    content: Optional[str] = None
+
 class ResponsePayload(BaseModel):
     status: str
     data: Any
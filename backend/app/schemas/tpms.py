@@ -1,11 +1,28 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, Any
 
 class TPMSStartRequest(BaseModel):
     tire_count: int
     axle_config: Optional[list[int]] = None
+    can_id: Optional[str] = None
+    channel: Optional[str] = None
+    vehicle: Optional[str] = None
+
+class AlarmRulesRequest(BaseModel):
+    thresholds: Optional[Dict[str, Any]] = None
+    pressure_drop: Optional[Dict[str, Any]] = None
 
 class TPMSStatusResponse(BaseModel):
     success: bool
     is_collecting: bool
     message: Optional[str] = None
+    tire_count: Optional[int] = None
+    axle_config: Optional[list[int]] = None
+    can_id: Optional[str] = None
+    channel: Optional[str] = None
+    frames: Optional[int] = None
+    ignored: Optional[int] = None
+    subscribers: Optional[int] = None
+    vehicle: Optional[str] = None
+    store: Optional[dict] = None
+    store_error: Optional[str] = None
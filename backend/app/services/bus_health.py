@@ -0,0 +1,206 @@
+from typing import Optional, Dict, Any, List, Callable
+from collections import deque
+import threading
+import time
+
+from app.services.frame_ring import (
+    Frame, SeqFrame, frame_bits, MSGTYPE_RTR, MSGTYPE_EXTENDED, MSGTYPE_BRS,
+    MSGTYPE_ERRFRAME, MSGTYPE_STATUS
+)
+
+# Sampling period of the health monitor and how many samples are kept
+# per channel (10 minutes at the default period)
+HEALTH_INTERVAL = 1.0
+HEALTH_HISTORY = 600
+# Bus state transitions kept per channel
+HEALTH_EVENTS = 100
+# Most frames the sampler reads back from the ring per sample for the load estimate
+HEALTH_MAX_FRAMES = 65536
+
+# Message types that carry bus events rather than data
+BUS_EVENT_TYPES = MSGTYPE_ERRFRAME | MSGTYPE_STATUS
+
+# TPCANStatus bits as plain ints
+STATUS_OVERRUN = 0x00002
+STATUS_BUSLIGHT = 0x00004
+STATUS_BUSHEAVY = 0x00008
+STATUS_BUSOFF = 0x00010
+STATUS_QOVERRUN = 0x00040
+STATUS_BUSPASSIVE = 0x40000
+
+# Error frame IDs carry the error type
+ERROR_FRAME_TYPES = {0x01: "bit", 0x02: "form", 0x04: "stuff", 0x08: "other"}
+
+# Column layout of health samples
+HEALTH_FIELDS = [
+    "time", "state", "status", "load_pct", "frames", "error_frames",
+    "rx_errors", "tx_errors", "overruns", "dropped", "read_errors"
+]
+
+
+def bus_state(status: int) -> str:
+    """Bus state named after the most severe error bit in a TPCANStatus"""
+    if status & STATUS_BUSOFF:
+        return "bus-off"
+    if status & STATUS_BUSPASSIVE:
+        return "passive"
+    if status & STATUS_BUSHEAVY:
+        return "warning"
+    if status & STATUS_BUSLIGHT:
+        return "light"
+    return "active"
+
+
+def busy_seconds(frames: List[SeqFrame], nominal: int, data: Optional[int] = None) -> float:
+    """Approximate time the given frames occupied the bus at the configured bit rates"""
+    busy = 0.0
+    for seq, (timestamp, can_id, msg_type, dlc, length, payload) in frames:
+        if msg_type & BUS_EVENT_TYPES:
+            continue
+        if msg_type & MSGTYPE_RTR:
+            length = 0
+        bits = frame_bits(bool(msg_type & MSGTYPE_EXTENDED), length)
+        if msg_type & MSGTYPE_BRS and data:
+            # The data phase of a bit-rate-switched FD frame runs at the data rate
+            busy += (bits - 8 * length) / nominal + 8 * length / data
+        else:
+            busy += bits / nominal
+    return busy
+
+
+class BusHealth:
+    """Bus condition of one channel: live state from status and error frames
+    plus a ring of periodic samples.
+
+    record() is called by the reader only for error and status frames, so
+    it costs nothing on data traffic; everything else (GetStatus, bus load,
+    drop counters) is gathered by sample() on the monitor thread.
+    """
+    def __init__(self, history: int = HEALTH_HISTORY):
+        self.lock = threading.Lock()
+        self.samples: deque = deque(maxlen=history)
+        self.events: deque = deque(maxlen=HEALTH_EVENTS)
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.samples.clear()
+            self.events.clear()
+            self.state = "active"
+            self.status = 0
+            self.rx_errors = 0
+            self.tx_errors = 0
+            self.max_rx_errors = 0
+            self.max_tx_errors = 0
+            self.error_frames = 0
+            self.sampled_error_frames = 0
+            self.error_types: Dict[str, int] = {}
+            self.status_frames = 0
+            self.bus_off_count = 0
+            self.load_pct: Optional[float] = None
+
+    def record(self, frame: Frame) -> None:
+        """Account for an error or status frame from the reader"""
+        timestamp, can_id, msg_type, dlc, length, data = frame
+        with self.lock:
+            if msg_type & MSGTYPE_STATUS:
+                # DATA[0..3] hold the TPCANStatus value, big endian
+                self.status_frames += 1
+                self._set_status(int.from_bytes(data[:4], 'big'), timestamp)
+            else:
+                # ID is the error type, DATA[2]/DATA[3] the receive/transmit error counters
+                self.error_frames += 1
+                kind = ERROR_FRAME_TYPES.get(can_id, f"0x{can_id:X}")
+                self.error_types[kind] = self.error_types.get(kind, 0) + 1
+                self.rx_errors = data[2]
+                self.tx_errors = data[3]
+                self.max_rx_errors = max(self.max_rx_errors, self.rx_errors)
+                self.max_tx_errors = max(self.max_tx_errors, self.tx_errors)
+
+    def sample(self, status: Optional[int], load_pct: Optional[float], frames: int,
+               overruns: int, dropped: int, read_errors: int) -> None:
+        """Append one sample; counts are deltas since the previous sample"""
+        with self.lock:
+            if status is not None:
+                self._set_status(status, None)
+            self.load_pct = load_pct
+            error_frames = self.error_frames - self.sampled_error_frames
+            self.sampled_error_frames = self.error_frames
+            self.samples.append([
+                round(time.time(), 3), self.state, f"{self.status:05X}h",
+                load_pct, frames, error_frames, self.rx_errors, self.tx_errors,
+                overruns, dropped, read_errors
+            ])
+
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "state": self.state,
+                "status": f"{self.status:05X}h",
+                "load_pct": self.load_pct,
+                "rx_errors": self.rx_errors,
+                "tx_errors": self.tx_errors,
+                "max_rx_errors": self.max_rx_errors,
+                "max_tx_errors": self.max_tx_errors,
+                "error_frames": self.error_frames,
+                "error_types": dict(self.error_types),
+                "status_frames": self.status_frames,
+                "bus_off_count": self.bus_off_count,
+                "events": list(self.events)
+            }
+
+    def history(self, since: Optional[float] = None) -> List[List[Any]]:
+        """Samples as HEALTH_FIELDS rows, optionally only those after unix time since"""
+        with self.lock:
+            return [row for row in self.samples if since is None or row[0] > since]
+
+    def _set_status(self, status: int, timestamp: Optional[int]) -> None:
+        state = bus_state(status)
+        self.status = status
+        if state != self.state:
+            if state == "bus-off":
+                self.bus_off_count += 1
+            self.events.append({
+                "time": round(time.time(), 3),
+                "timestamp": timestamp,
+                "from": self.state,
+                "to": state
+            })
+            self.state = state
+
+
+class HealthMonitor:
+    """Low-rate timer thread calling sample() every interval while started"""
+    def __init__(self, sample: Callable[[], None], interval: float = HEALTH_INTERVAL):
+        self.sample = sample
+        self.interval = interval
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="pcan-health", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def _run(self) -> None:
+        deadline = time.monotonic()
+        while True:
+            deadline += self.interval
+            if self.stop_event.wait(max(0.0, deadline - time.monotonic())):
+                return
+            try:
+                self.sample()
+            except Exception:
+                pass
@@ -0,0 +1,124 @@
+from typing import Optional, List, Set
+from bisect import bisect_right
+import asyncio
+import threading
+
+from app.services.pcan_service import pcan_service
+from app.services.pcan_async import pcan_async
+from app.services.frame_ring import Frame, frame_to_message
+from app.services.dbc import frame_key
+from app.services.bus_health import BUS_EVENT_TYPES
+from app.services.id_filter import IdRange, parse_id_ranges, merge_ranges
+
+
+class CANSubscription:
+    """A single stream consumer: a bounded queue of frame batches plus optional channel and ID filters"""
+    def __init__(self, queue_size: int, channel: Optional[str] = None):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.channel = channel
+        self.ids: Optional[List[str]] = None
+        self.ranges: Optional[List[IdRange]] = None
+        self.starts: List[int] = []
+        self.dropped = 0
+
+    @property
+    def owner(self) -> str:
+        return f"ws:{id(self):x}"
+
+    def set_ids(self, ids: Optional[List[str]]) -> None:
+        """Accepts hex IDs and ranges ("100", "100-1FF"); raises ValueError on bad input"""
+        # A bare string would otherwise be parsed one character at a time
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, str) for i in ids)):
+            raise ValueError('ids must be a list of hex IDs or ranges, e.g. ["100", "200-2FF"]')
+        ranges = parse_id_ranges(ids)
+        self.ranges = merge_ranges(ranges) if ranges else None
+        self.starts = [first for first, last in self.ranges] if self.ranges else []
+        self.ids = ids if ranges else None
+
+    def accepts(self, can_id: int) -> bool:
+        i = bisect_right(self.starts, can_id) - 1
+        return i >= 0 and can_id <= self.ranges[i][1]
+
+
+class CANStreamHub:
+    """Pushes frames from the PCAN reader thread to asyncio subscribers.
+
+    The reader thread calls publish() once per drain burst; the batch is
+    handed to the event loop with call_soon_threadsafe and fanned out to
+    every subscription queue. A slow subscriber loses its oldest batches
+    (counted in frames in CANSubscription.dropped) instead of stalling the others.
+    """
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.subscriptions: Set[CANSubscription] = set()
+        self.lock = threading.Lock()
+
+    async def subscribe(self, ids: Optional[List[str]] = None, channel: Optional[str] = None) -> CANSubscription:
+        # Must be called from the event loop that will consume the queue
+        self.loop = asyncio.get_running_loop()
+        sub = CANSubscription(self.queue_size, channel=channel)
+        sub.set_ids(ids)
+        with self.lock:
+            self.subscriptions.add(sub)
+        # Narrow the hardware acceptance filter to what subscribers need
+        # (programming it is a driver call, so it runs off the event loop)
+        await pcan_async.set_subscription(sub.owner, sub.ids, channel)
+        return sub
+
+    async def set_ids(self, sub: CANSubscription, ids: Optional[List[str]]) -> None:
+        sub.set_ids(ids)
+        await pcan_async.set_subscription(sub.owner, sub.ids, sub.channel)
+
+    async def unsubscribe(self, sub: CANSubscription) -> None:
+        with self.lock:
+            self.subscriptions.discard(sub)
+        await pcan_async.remove_subscription(sub.owner)
+
+    def publish(self, channel: str, frames: List[Frame]) -> None:
+        """Called from a reader thread with the frames of one drain burst"""
+        loop = self.loop
+        if loop is None or not self.subscriptions:
+            return
+        try:
+            loop.call_soon_threadsafe(self._dispatch, channel, frames)
+        except RuntimeError:
+            # Event loop already closed
+            self.loop = None
+
+    def _dispatch(self, channel: str, frames: List[Frame]) -> None:
+        with self.lock:
+            subs = list(self.subscriptions)
+        messages = None
+        decoders = pcan_service.dbc.decoders
+        for sub in subs:
+            if sub.channel is not None and sub.channel != channel:
+                continue
+            if sub.ranges is None:
+                # Unfiltered subscribers share one set of message dicts
+                if messages is None:
+                    messages = [self._message(f, channel, decoders) for f in frames]
+                selected = messages
+            else:
+                selected = [self._message(f, channel, decoders) for f in frames if sub.accepts(f[1])]
+            if not selected:
+                continue
+            if sub.queue.full():
+                try:
+                    sub.dropped += len(sub.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    pass
+            sub.queue.put_nowait(selected)
+
+    @staticmethod
+    def _message(frame: Frame, channel: str, decoders: dict) -> dict:
+        """Message dict of a frame, with its DBC signals when a loaded DBC defines the ID"""
+        message = frame_to_message(frame, channel)
+        decoder = None if frame[2] & BUS_EVENT_TYPES else decoders.get(frame_key(frame[1], frame[2]))
+        if decoder is not None:
+            message["signals"] = decoder.decode(frame[5], frame[4])
+        return message
+
+can_stream_hub = CANStreamHub()
+# Each stream client declares its IDs through its own subscription
+pcan_service.add_listener(can_stream_hub.publish, subscribed=True)
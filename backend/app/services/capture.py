@@ -0,0 +1,285 @@
+from typing import Optional, Dict, Any, List, Tuple, Iterator
+from bisect import bisect_right
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from app.services.frame_ring import Frame, RECORD_SIZE
+
+# Capture file layout:
+#   file header | block | block | ...
+#   block = block header + payload, payload = count fixed-size records
+#           (zlib-compressed when BLOCK_ZLIB is set) or, for BLOCK_CHANNEL,
+#           the UTF-8 name of the channel numbered `count`
+# Records use the FrameRing layout with the channel number in the pad byte.
+MAGIC = b"PCANCAP1"
+VERSION = 1
+FILE_HEADER = struct.Struct("<8sHHId")     # magic, version, record size, flags, created (unix time)
+BLOCK_HEADER = struct.Struct("<4sIIIQQ")   # magic, flags, count, stored size, first / last timestamp
+BLOCK_MAGIC = b"CBLK"
+BLOCK_ZLIB = 0x01
+BLOCK_CHANNEL = 0x02
+CAPTURE_RECORD = struct.Struct("<QIBBBB64s")
+CAPTURE_EXTENSION = ".cancap"
+
+# Frames per block, and the longest a partial block is held in memory
+DEFAULT_BLOCK_FRAMES = 4096
+FLUSH_INTERVAL = 1.0
+
+CaptureFrame = Tuple[Frame, Optional[str]]
+
+
+class CaptureWriter:
+    """Appends frames to a capture file in blocks of fixed-size records.
+
+    append() only packs records into the current block, so the reader
+    threads calling it never compress or touch the disk. A writer thread
+    compresses and writes each block once it holds block_frames records,
+    and every FLUSH_INTERVAL also writes the partial block, so at most
+    about a second of traffic is lost if the process dies, even on a
+    quiet bus. Safe to call from several reader threads.
+    """
+    def __init__(self, path: str, compress: bool = True, block_frames: int = DEFAULT_BLOCK_FRAMES,
+                 level: int = 1, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.compress = compress
+        self.block_frames = block_frames
+        self.level = level
+        self.flush_interval = flush_interval
+        self.file = open(path, 'wb')
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, RECORD_SIZE, 0, time.time()))
+        self.block = bytearray()
+        self.count = 0
+        self.first_ts = 0
+        self.last_ts = 0
+        self.channels: Dict[str, int] = {}
+        # Blocks waiting for the writer: (flags, count, payload, first_ts, last_ts)
+        self.sealed: List[Tuple[int, int, bytes, int, int]] = []
+        self.frames = 0
+        self.blocks = 0
+        self.raw_bytes = 0
+        self.stored_bytes = FILE_HEADER.size
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.closed = False
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="pcan-capture", daemon=True)
+        self.thread.start()
+
+    def append(self, frames: List[Frame], channel: Optional[str] = None) -> None:
+        with self.lock:
+            if self.closed:
+                return
+            index = 0
+            if channel is not None:
+                index = self.channels.get(channel)
+                if index is None:
+                    index = self._add_channel(channel)
+            pack = CAPTURE_RECORD.pack
+            for timestamp, can_id, msg_type, dlc, length, data in frames:
+                if not self.count:
+                    self.first_ts = timestamp
+                self.block += pack(timestamp, can_id, msg_type, dlc, length, index, data)
+                self.last_ts = timestamp
+                self.count += 1
+                self.frames += 1
+                if self.count >= self.block_frames:
+                    self._seal()
+                    self.wake.set()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.stop_event.set()
+        self.wake.set()
+        self.thread.join(timeout=5.0)
+        with self.write_lock:
+            # The writer's last pass took everything sealed before closed was
+            # set; this only matters if it failed to finish in time
+            self._write_pending()
+            self.file.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "path": self.path,
+                "frames": self.frames,
+                "blocks": self.blocks,
+                "bytes": self.stored_bytes,
+                "compression_ratio": round(self.raw_bytes / (self.stored_bytes - FILE_HEADER.size), 2)
+                if self.stored_bytes > FILE_HEADER.size else None,
+                "channels": list(self.channels)
+            }
+
+    def _add_channel(self, name: str) -> int:
+        # Channel numbers fit in the record's spare byte
+        index = len(self.channels) + 1
+        if index > 0xFF:
+            return 0
+        self.channels[name] = index
+        # Queued ahead of the block holding the channel's first record
+        self.sealed.append((BLOCK_CHANNEL, index, name.encode(), 0, 0))
+        return index
+
+    def _seal(self) -> None:
+        """Queue the current block for the writer; called with lock held"""
+        self.sealed.append((0, self.count, bytes(self.block), self.first_ts, self.last_ts))
+        self.block.clear()
+        self.count = 0
+
+    def _write_pending(self) -> None:
+        """Seal the partial block and write every queued block; called with write_lock held"""
+        with self.lock:
+            if self.count:
+                self._seal()
+            sealed, self.sealed = self.sealed, []
+        if not sealed or self.file.closed:
+            return
+        for flags, count, payload, first_ts, last_ts in sealed:
+            if not flags & BLOCK_CHANNEL:
+                raw = len(payload)
+                if self.compress:
+                    packed = zlib.compress(payload, self.level)
+                    if len(packed) < len(payload):
+                        payload = packed
+                        flags |= BLOCK_ZLIB
+                with self.lock:
+                    self.raw_bytes += raw
+                    self.blocks += 1
+            self.file.write(BLOCK_HEADER.pack(BLOCK_MAGIC, flags, count, len(payload), first_ts, last_ts))
+            self.file.write(payload)
+            with self.lock:
+                self.stored_bytes += BLOCK_HEADER.size + len(payload)
+        self.file.flush()
+
+    def _run(self) -> None:
+        while not self.stop_event.is_set():
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            with self.write_lock:
+                self._write_pending()
+        with self.write_lock:
+            self._write_pending()
+
+
+class CaptureReader:
+    """Memory-mapped reader for capture files.
+
+    Opening a capture only walks the block headers; records are read
+    straight from the mapping (uncompressed blocks) or decompressed one
+    block at a time, so captures far larger than RAM can be iterated or
+    paged through by frame index. A truncated final block, as left by a
+    crash, is ignored.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < FILE_HEADER.size:
+            self.file.close()
+            raise ValueError(f"{path} is not a capture file")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, flags, created = FILE_HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or record_size != CAPTURE_RECORD.size:
+            self.close()
+            raise ValueError(f"{path} is not a capture file")
+        self.created = created
+        self.channels: Dict[int, str] = {}
+        # Data blocks: (payload offset, flags, count, stored size, first ts, last ts)
+        self.blocks: List[Tuple[int, int, int, int, int, int]] = []
+        self.starts: List[int] = []
+        self.frame_count = 0
+        self._index(size)
+
+    def __enter__(self) -> "CaptureReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def close(self) -> None:
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                # A suspended iterator still references the mapping; it is freed with it
+                pass
+            self.map = None
+        self.file.close()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "name": os.path.basename(self.path),
+            "frames": self.frame_count,
+            "blocks": len(self.blocks),
+            "bytes": self.map.size(),
+            "created": self.created,
+            "first_timestamp": self.blocks[0][4] if self.blocks else None,
+            "last_timestamp": self.blocks[-1][5] if self.blocks else None,
+            "channels": list(self.channels.values())
+        }
+
+    def __iter__(self) -> Iterator[CaptureFrame]:
+        return self.iter_frames()
+
+    def iter_frames(self, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> Iterator[CaptureFrame]:
+        """Yield (frame, channel) in file order, optionally limited to a timestamp window"""
+        for block in range(len(self.blocks)):
+            first_ts, last_ts = self.blocks[block][4:6]
+            if start_ts is not None and last_ts < start_ts:
+                continue
+            if end_ts is not None and first_ts > end_ts:
+                break
+            for record in CAPTURE_RECORD.iter_unpack(self._payload(block)):
+                timestamp = record[0]
+                if start_ts is not None and timestamp < start_ts:
+                    continue
+                if end_ts is not None and timestamp > end_ts:
+                    return
+                yield self._frame(record)
+
+    def read(self, start: int, count: int) -> List[CaptureFrame]:
+        """Frames start .. start+count-1 by index in the capture"""
+        out: List[CaptureFrame] = []
+        block = bisect_right(self.starts, start) - 1
+        while block >= 0 and block < len(self.blocks) and len(out) < count:
+            payload = self._payload(block)
+            offset = max(start - self.starts[block], 0) * CAPTURE_RECORD.size
+            end = min(len(payload), offset + (count - len(out)) * CAPTURE_RECORD.size)
+            out.extend(self._frame(r) for r in CAPTURE_RECORD.iter_unpack(payload[offset:end]))
+            block += 1
+        return out
+
+    def _frame(self, record: Tuple[Any, ...]) -> CaptureFrame:
+        timestamp, can_id, msg_type, dlc, length, channel, data = record
+        return (timestamp, can_id, msg_type, dlc, length, data), self.channels.get(channel)
+
+    def _payload(self, block: int) -> Any:
+        offset, flags, count, stored, first_ts, last_ts = self.blocks[block]
+        if flags & BLOCK_ZLIB:
+            return zlib.decompress(self.map[offset:offset + stored])
+        return memoryview(self.map)[offset:offset + stored]
+
+    def _index(self, size: int) -> None:
+        offset = FILE_HEADER.size
+        while offset + BLOCK_HEADER.size <= size:
+            magic, flags, count, stored, first_ts, last_ts = BLOCK_HEADER.unpack_from(self.map, offset)
+            payload = offset + BLOCK_HEADER.size
+            if magic != BLOCK_MAGIC or payload + stored > size:
+                break
+            if flags & BLOCK_CHANNEL:
+                self.channels[count] = self.map[payload:payload + stored].decode(errors='replace')
+            elif count:
+                self.starts.append(self.frame_count)
+                self.blocks.append((payload, flags, count, stored, first_ts, last_ts))
+                self.frame_count += count
+            offset = payload + stored
@@ -0,0 +1,247 @@
+from typing import Optional, Dict, Any, List, Callable
+import heapq
+import math
+import threading
+import time
+
+# The scheduler sleeps until this close to a deadline, then spins so
+# frames leave closer to it than the OS timer slack allows. The spin yields
+# the GIL on every pass and is kept this short so the reader threads and
+# the event loop are not starved
+SPIN_MARGIN = 0.00005
+MIN_PERIOD_MS = 1.0
+CHECKSUMS = ("sum", "xor")
+
+
+class CyclicMessage:
+    """One periodic frame with its optional rolling counter / checksum byte and timing statistics"""
+    def __init__(self, key: str, msg_id: str, data: List[int], period_ms: float,
+                 channel: Optional[str] = None, extended: bool = False,
+                 fd: Optional[bool] = None, brs: bool = False,
+                 counter_byte: Optional[int] = None, counter_mask: int = 0xFF,
+                 checksum_byte: Optional[int] = None, checksum: str = "sum"):
+        self.key = key
+        self.msg_id = msg_id
+        self.channel = channel
+        self.extended = extended
+        self.fd = fd
+        self.brs = brs
+        self.data = list(data)
+        self.period = period_ms / 1000.0
+        self.counter_byte = counter_byte
+        self.counter_mask = counter_mask
+        self.checksum_byte = checksum_byte
+        self.checksum = checksum
+        self.counter = 0
+        # Bumped on every update so stale heap entries are ignored
+        self.generation = 0
+        self.deadline = 0.0
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.sent = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.overruns = 0
+        self.jitter_count = 0
+        self.jitter_sum = 0.0
+        self.jitter_sq_sum = 0.0
+        self.jitter_max = 0.0
+        self.last_sent: Optional[float] = None
+        self.period_min: Optional[float] = None
+        self.period_max: Optional[float] = None
+
+    def validate(self) -> None:
+        if self.period * 1000.0 < MIN_PERIOD_MS:
+            raise ValueError(f"period must be at least {MIN_PERIOD_MS} ms")
+        for name, index in (("counter_byte", self.counter_byte), ("checksum_byte", self.checksum_byte)):
+            if index is not None and not 0 <= index < len(self.data):
+                raise ValueError(f"{name} {index} is outside the {len(self.data)} byte payload")
+        if self.counter_byte is not None and self.counter_byte == self.checksum_byte:
+            raise ValueError("counter_byte and checksum_byte must differ")
+        if not 0 < self.counter_mask <= 0xFF:
+            raise ValueError("counter_mask must be between 0x01 and 0xFF")
+        if self.checksum not in CHECKSUMS:
+            raise ValueError(f"checksum must be one of {', '.join(CHECKSUMS)}")
+
+    def next_payload(self) -> List[int]:
+        data = self.data
+        if self.counter_byte is None and self.checksum_byte is None:
+            return data
+        data = list(data)
+        if self.counter_byte is not None:
+            # Counter occupies the masked bits, e.g. 0x0F for a 4-bit alive counter
+            mask = self.counter_mask
+            shift = (mask & -mask).bit_length() - 1
+            data[self.counter_byte] = (data[self.counter_byte] & ~mask & 0xFF) | ((self.counter << shift) & mask)
+            self.counter = (self.counter + 1) & (mask >> shift)
+        if self.checksum_byte is not None:
+            value = 0
+            for i, byte in enumerate(data):
+                if i != self.checksum_byte:
+                    value = value + byte if self.checksum == "sum" else value ^ byte
+            data[self.checksum_byte] = value & 0xFF
+        return data
+
+    def record(self, deadline: float, sent_at: float) -> None:
+        lateness = sent_at - deadline
+        self.jitter_count += 1
+        self.jitter_sum += lateness
+        self.jitter_sq_sum += lateness * lateness
+        if lateness > self.jitter_max:
+            self.jitter_max = lateness
+        if self.last_sent is not None:
+            period = sent_at - self.last_sent
+            if self.period_min is None or period < self.period_min:
+                self.period_min = period
+            if self.period_max is None or period > self.period_max:
+                self.period_max = period
+        self.last_sent = sent_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        n = self.jitter_count
+        mean = self.jitter_sum / n if n else 0.0
+        std = math.sqrt(max(self.jitter_sq_sum / n - mean * mean, 0.0)) if n else 0.0
+        return {
+            "key": self.key,
+            "id": self.msg_id,
+            "channel": self.channel,
+            "data": self.data,
+            "period_ms": self.period * 1000.0,
+            "counter_byte": self.counter_byte,
+            "counter_mask": self.counter_mask,
+            "checksum_byte": self.checksum_byte,
+            "checksum": self.checksum,
+            "sent": self.sent,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "overruns": self.overruns,
+            # Lateness of each transmission against its deadline, in microseconds
+            "jitter_mean_us": round(mean * 1e6, 1),
+            "jitter_std_us": round(std * 1e6, 1),
+            "jitter_max_us": round(self.jitter_max * 1e6, 1),
+            "period_min_ms": round(self.period_min * 1000.0, 3) if self.period_min is not None else None,
+            "period_max_ms": round(self.period_max * 1000.0, 3) if self.period_max is not None else None
+        }
+
+
+class CyclicScheduler:
+    """Single thread transmitting all cyclic messages from a monotonic deadline heap.
+
+    Deadlines advance by exactly one period per transmission so there is
+    no cumulative drift; when the thread falls more than a period behind
+    the missed cycles are skipped and counted as overruns rather than
+    sent in a burst. The thread starts with the first message and exits
+    when the last one is removed.
+    """
+    def __init__(self, send: Callable[[CyclicMessage, List[int]], Dict[str, Any]]):
+        self.send = send
+        self.messages: Dict[str, CyclicMessage] = {}
+        self.heap: List[Any] = []
+        self.cond = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+
+    def add(self, msg: CyclicMessage) -> None:
+        msg.validate()
+        with self.cond:
+            old = self.messages.get(msg.key)
+            if old is not None:
+                # Carry the generation forward so the old message's heap
+                # entry no longer matches and is skipped
+                old.generation += 1
+                msg.generation = old.generation
+            self.messages[msg.key] = msg
+            self._schedule(msg, time.monotonic())
+            self._ensure_thread()
+            self.cond.notify()
+
+    def update(self, key: str, changes: Dict[str, Any]) -> CyclicMessage:
+        with self.cond:
+            msg = self.messages.get(key)
+            if msg is None:
+                raise KeyError(key)
+            saved = dict(msg.__dict__)
+            for name, value in changes.items():
+                if name == "period_ms":
+                    msg.period = value / 1000.0
+                elif name == "data":
+                    msg.data = list(value)
+                else:
+                    setattr(msg, name, value)
+            try:
+                msg.validate()
+            except ValueError:
+                msg.__dict__.update(saved)
+                raise
+            if "period_ms" in changes:
+                # Keep the new period relative to the last transmission
+                msg.generation += 1
+                start = time.monotonic()
+                if msg.last_sent is not None:
+                    start = max(start, msg.last_sent + msg.period)
+                self._schedule(msg, start)
+                self.cond.notify()
+            return msg
+
+    def remove(self, key: Optional[str] = None) -> List[str]:
+        """Stop one message, or all of them when key is None"""
+        with self.cond:
+            keys = list(self.messages) if key is None else [key] if key in self.messages else []
+            for k in keys:
+                self.messages.pop(k).generation += 1
+            if not self.messages:
+                self.heap.clear()
+            self.cond.notify()
+            return keys
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self.cond:
+            return [msg.to_dict() for msg in self.messages.values()]
+
+    def _schedule(self, msg: CyclicMessage, start: float) -> None:
+        msg.deadline = start
+        heapq.heappush(self.heap, (msg.deadline, msg.key, msg.generation))
+
+    def _ensure_thread(self) -> None:
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name="pcan-cyclic-tx", daemon=True)
+            self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self.cond:
+                while True:
+                    if not self.messages:
+                        self.thread = None
+                        return
+                    deadline, key, generation = self.heap[0]
+                    msg = self.messages.get(key)
+                    if msg is None or msg.generation != generation:
+                        heapq.heappop(self.heap)
+                        continue
+                    remaining = deadline - time.monotonic()
+                    if remaining <= SPIN_MARGIN:
+                        break
+                    self.cond.wait(remaining - SPIN_MARGIN)
+                heapq.heappop(self.heap)
+                payload = msg.next_payload()
+            while time.monotonic() < deadline:
+                time.sleep(0)
+            result = self.send(msg, payload)
+            sent_at = time.monotonic()
+            with self.cond:
+                if msg.generation != generation:
+                    continue
+                if result.get("success"):
+                    msg.sent += 1
+                    msg.record(deadline, sent_at)
+                else:
+                    msg.errors += 1
+                    msg.last_error = result.get("error")
+                next_deadline = deadline + msg.period
+                if next_deadline <= sent_at:
+                    missed = int((sent_at - next_deadline) // msg.period) + 1
+                    msg.overruns += missed
+                    next_deadline += missed * msg.period
+                msg.deadline = next_deadline
+                heapq.heappush(self.heap, (next_deadline, key, generation))
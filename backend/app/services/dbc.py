@@ -0,0 +1,366 @@
+from typing import Optional, Dict, Any, List, Tuple, Callable
+import os
+import re
+import struct
+import threading
+
+from app.services.frame_ring import Frame, MSGTYPE_EXTENDED
+
+DBC_EXTENSION = ".dbc"
+# Bit 31 of a DBC message ID marks an extended frame; decoders are keyed the
+# same way, which is also how the latest-value table keys extended IDs
+DBC_EXTENDED_FLAG = 0x80000000
+DBC_ID_MASK = 0x1FFFFFFF
+
+_BO = re.compile(r'^BO_\s+(\d+)\s+(\w+)\s*:\s*(\d+)\s+(\w+)')
+_SG = re.compile(
+    r'^SG_\s+(\w+)\s*(M|m\d+M?)?\s*:\s*(\d+)\|(\d+)@([01])([+-])\s*'
+    r'\(\s*([^,\s]+)\s*,\s*([^)\s]+)\s*\)\s*\[\s*([^|\s]*)\s*\|\s*([^\]\s]*)\s*\]\s*"([^"]*)"\s*(.*)$'
+)
+_VAL = re.compile(r'^VAL_\s+(\d+)\s+(\w+)\s+(.*?)\s*;')
+_VAL_PAIR = re.compile(r'(-?\d+)\s+"([^"]*)"')
+_VALTYPE = re.compile(r'^SIG_VALTYPE_\s+(\d+)\s+(\w+)\s*:?\s*([12])\s*;')
+
+# IEEE float signals (SIG_VALTYPE_ 1 = float, 2 = double)
+_FLOAT_FORMATS = {1: struct.Struct("<f"), 2: struct.Struct("<d")}
+
+
+class DBCError(ValueError):
+    pass
+
+
+def _number(text: str) -> Any:
+    value = float(text)
+    return int(value) if value.is_integer() and 'e' not in text.lower() and '.' not in text else value
+
+
+class SignalDef:
+    """One SG_ line of a DBC file"""
+    def __init__(self, name: str, start: int, length: int, little_endian: bool, signed: bool,
+                 factor: Any = 1, offset: Any = 0, minimum: Any = None, maximum: Any = None,
+                 unit: str = "", multiplexer: bool = False, multiplex_id: Optional[int] = None):
+        self.name = name
+        self.start = start
+        self.length = length
+        self.little_endian = little_endian
+        self.signed = signed
+        self.factor = factor
+        self.offset = offset
+        self.minimum = minimum
+        self.maximum = maximum
+        self.unit = unit
+        self.multiplexer = multiplexer
+        self.multiplex_id = multiplex_id
+        self.choices: Dict[int, str] = {}
+        self.float_size: Optional[int] = None
+
+    def bit_span(self) -> Tuple[int, int]:
+        """First and last bit of the signal in a big-endian numbering of the
+        payload (bit 0 = MSB of byte 0), used for Motorola signals"""
+        if self.little_endian:
+            raise ValueError("bit_span is only defined for Motorola signals")
+        msb = (self.start // 8) * 8 + 7 - self.start % 8
+        return msb, msb + self.length - 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        info = {
+            "name": self.name,
+            "start": self.start,
+            "length": self.length,
+            "byte_order": "little_endian" if self.little_endian else "big_endian",
+            "signed": self.signed,
+            "factor": self.factor,
+            "offset": self.offset,
+            "min": self.minimum,
+            "max": self.maximum,
+            "unit": self.unit
+        }
+        if self.multiplexer:
+            info["multiplexer"] = True
+        if self.multiplex_id is not None:
+            info["multiplex_id"] = self.multiplex_id
+        if self.choices:
+            info["choices"] = {str(k): v for k, v in sorted(self.choices.items())}
+        return info
+
+
+class MessageDef:
+    """One BO_ block of a DBC file"""
+    def __init__(self, frame_id: int, name: str, length: int, sender: str):
+        self.frame_id = frame_id
+        self.name = name
+        self.length = length
+        self.sender = sender
+        self.signals: List[SignalDef] = []
+
+    @property
+    def extended(self) -> bool:
+        return bool(self.frame_id & DBC_EXTENDED_FLAG)
+
+    @property
+    def can_id(self) -> int:
+        return self.frame_id & DBC_ID_MASK
+
+    @property
+    def key(self) -> int:
+        return self.can_id | DBC_EXTENDED_FLAG if self.extended else self.can_id
+
+
+def parse_dbc(text: str) -> List[MessageDef]:
+    """Messages, signals, value tables and float signal types of a DBC file;
+    everything else (attributes, comments, nodes) is ignored. Raises DBCError"""
+    messages: Dict[int, MessageDef] = {}
+    current: Optional[MessageDef] = None
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            current = None
+            continue
+        try:
+            if line.startswith("BO_ "):
+                m = _BO.match(line)
+                if not m:
+                    raise DBCError("malformed BO_")
+                current = MessageDef(int(m.group(1)), m.group(2), int(m.group(3)), m.group(4))
+                messages[current.frame_id] = current
+            elif line.startswith("SG_ "):
+                m = _SG.match(line)
+                if not m or current is None:
+                    raise DBCError("malformed SG_" if not m else "SG_ outside a BO_ block")
+                mux = m.group(2) or ""
+                signal = SignalDef(
+                    m.group(1), int(m.group(3)), int(m.group(4)),
+                    little_endian=m.group(5) == "1", signed=m.group(6) == "-",
+                    factor=_number(m.group(7)), offset=_number(m.group(8)),
+                    minimum=_number(m.group(9)) if m.group(9) else None,
+                    maximum=_number(m.group(10)) if m.group(10) else None,
+                    unit=m.group(11),
+                    multiplexer=mux.endswith("M"),
+                    multiplex_id=int(mux[1:].rstrip("M")) if mux.startswith("m") else None
+                )
+                if not 0 < signal.length <= 64:
+                    raise DBCError(f"signal length {signal.length} out of range")
+                current.signals.append(signal)
+            elif line.startswith("VAL_ "):
+                m = _VAL.match(line)
+                message = messages.get(int(m.group(1))) if m else None
+                if message is not None:
+                    for signal in message.signals:
+                        if signal.name == m.group(2):
+                            signal.choices = {int(k): v for k, v in _VAL_PAIR.findall(m.group(3))}
+            elif line.startswith("SIG_VALTYPE_ "):
+                m = _VALTYPE.match(line)
+                message = messages.get(int(m.group(1))) if m else None
+                if message is not None:
+                    for signal in message.signals:
+                        if signal.name == m.group(2):
+                            signal.float_size = int(m.group(3))
+        except (DBCError, ValueError) as e:
+            raise DBCError(f"line {number}: {str(e)}")
+    return list(messages.values())
+
+
+class MessageDecoder:
+    """A DBC message compiled into per-signal extraction constants.
+
+    Everything that depends only on the definition is worked out once:
+    each signal becomes a tuple of (byte order, shift, mask, sign bit,
+    scaling, bytes needed, ...), so decoding a frame is one int.from_bytes
+    per byte order in use followed by a shift and mask per signal. When
+    the factor is 1/n for an integer n the value is computed as
+    (raw + offset*n) / n, which gives the same float as the dashboard's
+    integer arithmetic instead of raw*0.01 rounding artifacts.
+    """
+    def __init__(self, message: MessageDef):
+        self.message = message
+        self.name = message.name
+        self.key = message.key
+        self.size = message.length
+        self.uses_little = any(s.little_endian for s in message.signals)
+        self.uses_big = any(not s.little_endian for s in message.signals)
+        self.mux: Optional[tuple] = None
+        self.signals: List[tuple] = []
+        for signal in message.signals:
+            compiled = self._compile(signal)
+            if signal.multiplexer:
+                self.mux = compiled
+            self.signals.append(compiled)
+
+    def _compile(self, signal: SignalDef) -> tuple:
+        bits = self.size * 8
+        if signal.little_endian:
+            shift = signal.start
+            last_bit = signal.start + signal.length - 1
+        else:
+            last_bit = signal.bit_span()[1]
+            shift = bits - 1 - last_bit
+        if last_bit >= bits:
+            raise DBCError(f"{self.name}.{signal.name} does not fit in {self.size} bytes")
+        mask = (1 << signal.length) - 1
+        sign_bit = 1 << (signal.length - 1) if signal.signed else 0
+        # Scaling: 0 = raw integer, 1 = integer factor/offset, 2 = divide by n, 3 = float factor
+        factor, offset, divisor = signal.factor, signal.offset, 0
+        if signal.float_size is not None:
+            scaling = 3
+        elif factor == 1 and offset == 0:
+            scaling = 0
+        elif isinstance(factor, int) and isinstance(offset, int):
+            scaling = 1
+        else:
+            inverse = 1 / factor if factor else 0
+            if inverse and inverse > 1 and abs(inverse - round(inverse)) < 1e-9:
+                divisor = round(inverse)
+                offset = offset * divisor
+                scaling = 2
+            else:
+                scaling = 3
+        needed = last_bit // 8 + 1
+        float_format = _FLOAT_FORMATS.get(signal.float_size) if signal.float_size else None
+        return (signal.name, signal.little_endian, shift, mask, sign_bit, scaling, factor, offset,
+                divisor, needed, signal.choices or None, signal.multiplex_id, float_format)
+
+    def decode(self, data: bytes, length: Optional[int] = None, labels: bool = True) -> Dict[str, Any]:
+        """Physical value (or value-table label unless labels is False) of every signal present in the payload"""
+        size = self.size
+        if length is None:
+            length = len(data)
+        chunk = data[:size]
+        if len(chunk) < size:
+            chunk = chunk.ljust(size, b'\0')
+        little = int.from_bytes(chunk, 'little') if self.uses_little else 0
+        big = int.from_bytes(chunk, 'big') if self.uses_big else 0
+        mux_value = None
+        if self.mux is not None:
+            name, is_little, shift, mask = self.mux[:4]
+            mux_value = ((little if is_little else big) >> shift) & mask
+        values: Dict[str, Any] = {}
+        for (name, is_little, shift, mask, sign_bit, scaling, factor, offset,
+             divisor, needed, choices, mux_id, float_format) in self.signals:
+            if needed > length or (mux_id is not None and mux_id != mux_value):
+                continue
+            raw = ((little if is_little else big) >> shift) & mask
+            if float_format is not None:
+                raw = float_format.unpack(raw.to_bytes(float_format.size, 'little'))[0]
+            elif sign_bit and raw & sign_bit:
+                raw -= mask + 1
+            if labels and choices is not None and raw in choices:
+                values[name] = choices[raw]
+            elif scaling == 0:
+                values[name] = raw
+            elif scaling == 1:
+                values[name] = raw * factor + offset
+            elif scaling == 2:
+                values[name] = (raw + offset) / divisor
+            else:
+                values[name] = raw * factor + offset
+        return values
+
+    def choices(self, name: str) -> Dict[int, str]:
+        """Value table of one signal (empty when it has none)"""
+        for signal in self.message.signals:
+            if signal.name == name:
+                return signal.choices
+        return {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        message = self.message
+        return {
+            "id": f"{message.can_id:03X}",
+            "extended": message.extended,
+            "name": message.name,
+            "length": message.length,
+            "sender": message.sender,
+            "signals": [s.to_dict() for s in message.signals]
+        }
+
+
+def frame_key(can_id: int, msg_type: int) -> int:
+    return can_id | DBC_EXTENDED_FLAG if msg_type & MSGTYPE_EXTENDED else can_id
+
+
+class DBCDatabase:
+    """Compiled decoders of the loaded DBC files, keyed like the latest table.
+
+    The decoder map is replaced, never mutated, when a file is loaded or
+    unloaded, so the reader thread looks decoders up without a lock.
+    Later files win where two files define the same ID.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.decoders: Dict[int, MessageDecoder] = {}
+        self.by_name: Dict[str, MessageDecoder] = {}
+        self.files: Dict[str, List[MessageDecoder]] = {}
+        # Called without arguments after every load or unload
+        self.on_change: List[Callable[[], None]] = []
+
+    def load_text(self, name: str, text: str) -> List[MessageDecoder]:
+        """Parse and compile one file's text under name; raises DBCError"""
+        decoders = [MessageDecoder(m) for m in parse_dbc(text)]
+        with self.lock:
+            self.files[name] = decoders
+            self._rebuild()
+        self._changed()
+        return decoders
+
+    def load_file(self, path: str) -> List[MessageDecoder]:
+        """Raises OSError / DBCError"""
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        return self.load_text(os.path.basename(path), text)
+
+    def load_dir(self, directory: str) -> Dict[str, str]:
+        """Load every .dbc file in directory; returns the errors by file name"""
+        errors = {}
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.lower().endswith(DBC_EXTENSION):
+                    try:
+                        self.load_file(os.path.join(directory, name))
+                    except (OSError, DBCError) as e:
+                        errors[name] = str(e)
+        return errors
+
+    def unload(self, name: str) -> bool:
+        with self.lock:
+            if self.files.pop(name, None) is None:
+                return False
+            self._rebuild()
+        self._changed()
+        return True
+
+    def get(self, can_id: int, msg_type: int = 0) -> Optional[MessageDecoder]:
+        return self.decoders.get(frame_key(can_id, msg_type))
+
+    def find(self, name: str) -> Optional[MessageDecoder]:
+        """Decoder of the message with this name, wherever its ID has been set"""
+        return self.by_name.get(name)
+
+    def decode(self, frame: Frame) -> Optional[Dict[str, Any]]:
+        """Signals of a frame record, or None when no loaded DBC defines its ID"""
+        timestamp, can_id, msg_type, dlc, length, data = frame
+        decoder = self.decoders.get(frame_key(can_id, msg_type))
+        return decoder.decode(data, length) if decoder is not None else None
+
+    def describe(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                name: [d.to_dict() for d in decoders]
+                for name, decoders in self.files.items()
+            }
+
+    def _rebuild(self) -> None:
+        decoders: Dict[int, MessageDecoder] = {}
+        by_name: Dict[str, MessageDecoder] = {}
+        for file_decoders in self.files.values():
+            for decoder in file_decoders:
+                decoders[decoder.key] = decoder
+                by_name[decoder.name] = decoder
+        self.decoders = decoders
+        self.by_name = by_name
+
+    def _changed(self) -> None:
+        for callback in list(self.on_change):
+            try:
+                callback()
+            except Exception:
+                pass
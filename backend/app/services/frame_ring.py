@@ -0,0 +1,254 @@
+from typing import Optional, Dict, Any, List, Tuple
+import struct
+import threading
+
+# One frame per fixed-size record:
+# timestamp (us), CAN ID, PCAN message type flags, DLC, payload length, 64 data bytes
+RECORD = struct.Struct("<QIBBB1x64s")
+RECORD_SIZE = RECORD.size
+TIMESTAMP = struct.Struct("<Q")
+
+# Default ring size: ~8 MB of records
+DEFAULT_CAPACITY = 100000
+
+# PCAN_MESSAGE_* flags as plain ints
+MSGTYPE_RTR = 0x01
+MSGTYPE_EXTENDED = 0x02
+MSGTYPE_FD = 0x04
+MSGTYPE_BRS = 0x08
+MSGTYPE_ESI = 0x10
+MSGTYPE_ERRFRAME = 0x40
+MSGTYPE_STATUS = 0x80
+
+# CAN FD data length codes 0..15 to payload length in bytes
+DLC_TO_LEN = (0, 1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 32, 48, 64)
+
+
+def len_to_dlc(length: int) -> int:
+    """Smallest DLC whose payload holds length bytes"""
+    for dlc, size in enumerate(DLC_TO_LEN):
+        if size >= length:
+            return dlc
+    raise ValueError(f"CAN FD payload too long: {length} bytes")
+
+
+def frame_bits(extended: bool, length: int) -> int:
+    """Approximate bits on the wire for a classic data frame, including average bit stuffing"""
+    header = 67 if extended else 47
+    return header + 8 * length + (header - 13 + 8 * length) // 10
+
+
+def msg_type_label(msg_type: int) -> str:
+    """Human readable frame type, e.g. DATA, RTR, FD, FD+BRS+ESI, ERROR or STATUS"""
+    if msg_type & MSGTYPE_STATUS:
+        return "STATUS"
+    if msg_type & MSGTYPE_ERRFRAME:
+        return "ERROR"
+    if msg_type & MSGTYPE_RTR:
+        return "RTR"
+    if not msg_type & MSGTYPE_FD:
+        return "DATA"
+    label = "FD"
+    if msg_type & MSGTYPE_BRS:
+        label += "+BRS"
+    if msg_type & MSGTYPE_ESI:
+        label += "+ESI"
+    return label
+
+Frame = Tuple[int, int, int, int, int, bytes]
+# A frame with its sequence number in the ring that stored it
+SeqFrame = Tuple[int, Frame]
+
+
+def frame_to_message(frame: Frame, channel: Optional[str] = None) -> Dict[str, Any]:
+    """Build the API dict for a frame record; only done at the API edge"""
+    timestamp, can_id, msg_type, dlc, length, data = frame
+    message = {
+        "id": f"{can_id:03X}",
+        "msg_type": msg_type_label(msg_type),
+        "len": length,
+        "data": list(data[:length]),
+        "timestamp": timestamp
+    }
+    if channel is not None:
+        message["channel"] = channel
+    return message
+
+
+class FrameRing:
+    """Preallocated ring buffer of fixed-size CAN frame records.
+
+    Frames are packed into a single bytearray, so memory use is
+    RECORD_SIZE bytes per slot regardless of traffic and a capacity of
+    millions of frames costs tens of megabytes. When the ring is full
+    the oldest frame is overwritten: it is moved to the optional spool
+    (see FrameSpool) if one is attached, otherwise it is lost and counted
+    in `evicted`. Spooled frames are always older than those in memory,
+    so pop() drains the spool first to keep frames in order. Both only
+    apply while `drained` is set, i.e. something pops the ring; without
+    a pop() consumer the ring is just a window over recent traffic and
+    the oldest frame is overwritten silently.
+
+    Every appended frame gets the next sequence number (its absolute
+    index), which never goes backwards for the life of the ring. pop() is
+    the single destructive consumer; any number of other readers use
+    read_since() with their own cursor, which only copies the frames
+    returned and reports how many were overwritten before they got to them.
+    """
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, spool: Optional[Any] = None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least one frame")
+        self.capacity = capacity
+        self.buf = bytearray(capacity * RECORD_SIZE)
+        # Absolute indices, i.e. sequence numbers: head is the oldest frame
+        # pop() has not returned, tail the next write
+        self.head = 0
+        self.tail = 0
+        self.evicted = 0
+        # Highest number of frames held in memory at once
+        self.high_water = 0
+        self.spool = spool
+        # Whether a pop() consumer is expected; see the class docstring
+        self.drained = True
+        self.lock = threading.Lock()
+
+    @classmethod
+    def sized(cls, frames: Optional[int] = None, megabytes: Optional[float] = None,
+              spool: Optional[Any] = None) -> "FrameRing":
+        """Create a ring sized either in frames or in megabytes of record storage"""
+        if megabytes is not None:
+            frames = int(megabytes * 1024 * 1024) // RECORD_SIZE
+        return cls(frames or DEFAULT_CAPACITY, spool)
+
+    def __len__(self) -> int:
+        return self.tail - self.head + (len(self.spool) if self.spool is not None else 0)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buf)
+
+    def append(self, timestamp: int, can_id: int, msg_type: int, dlc: int, length: int, data: bytes) -> None:
+        with self.lock:
+            if self.tail - self.head >= self.capacity:
+                self._evict()
+            RECORD.pack_into(self.buf, (self.tail % self.capacity) * RECORD_SIZE,
+                             timestamp, can_id, msg_type, dlc, length, data)
+            self.tail += 1
+            if self.tail - self.head > self.high_water:
+                self.high_water = self.tail - self.head
+
+    def extend(self, frames: List[Frame]) -> None:
+        """Append a burst of frames under a single lock acquisition"""
+        pack_into = RECORD.pack_into
+        buf = self.buf
+        capacity = self.capacity
+        with self.lock:
+            tail = self.tail
+            for frame in frames:
+                if tail - self.head >= capacity:
+                    self._evict()
+                pack_into(buf, (tail % capacity) * RECORD_SIZE, *frame)
+                tail += 1
+            self.tail = tail
+            if tail - self.head > self.high_water:
+                self.high_water = tail - self.head
+
+    def _evict(self) -> None:
+        if self.drained and self.spool is not None:
+            offset = (self.head % self.capacity) * RECORD_SIZE
+            if not self.spool.append(self.buf[offset:offset + RECORD_SIZE], self.head):
+                self.evicted += 1
+        elif self.drained:
+            self.evicted += 1
+        self.head += 1
+
+    @property
+    def next_seq(self) -> int:
+        """Sequence number the next appended frame will get"""
+        return self.tail
+
+    @property
+    def oldest_seq(self) -> int:
+        """Oldest sequence number still held in memory"""
+        return max(self.tail - self.capacity, 0)
+
+    def pop(self, max_count: int = 1) -> List[Frame]:
+        """Remove and return up to max_count of the oldest frames"""
+        with self.lock:
+            return [frame for seq, frame in self._pop(max_count)]
+
+    def pop_seq(self, max_count: int = 1) -> List[SeqFrame]:
+        """Like pop, with each frame's sequence number"""
+        with self.lock:
+            return self._pop(max_count)
+
+    def read_since(self, seq: int, max_count: int) -> Tuple[List[SeqFrame], int, int]:
+        """Up to max_count frames from sequence number seq on, without consuming them.
+
+        Returns (frames, next cursor, gap) where gap counts the frames from
+        seq that were overwritten before this read. A cursor past the end
+        (e.g. from before a restart) restarts at the next frame.
+        """
+        with self.lock:
+            tail = self.tail
+            oldest = max(tail - self.capacity, 0)
+            gap = 0
+            if seq < oldest:
+                gap = oldest - seq
+                seq = oldest
+            elif seq > tail:
+                seq = tail
+            count = min(max_count, tail - seq)
+            unpack_from = RECORD.unpack_from
+            buf = self.buf
+            capacity = self.capacity
+            frames = [(s, unpack_from(buf, (s % capacity) * RECORD_SIZE)) for s in range(seq, seq + count)]
+        return frames, seq + count, gap
+
+    def peek_timestamp(self) -> Optional[int]:
+        """Timestamp of the oldest frame, or None when empty"""
+        with self.lock:
+            return self._peek_timestamp()
+
+    def pop_until(self, max_timestamp: Optional[int], max_count: int) -> List[SeqFrame]:
+        """Pop up to max_count of the oldest frames stamped no later than max_timestamp"""
+        if max_timestamp is None:
+            return self.pop_seq(max_count)
+        frames = []
+        with self.lock:
+            while len(frames) < max_count:
+                timestamp = self._peek_timestamp()
+                if timestamp is None or timestamp > max_timestamp:
+                    break
+                frames.extend(self._pop(1))
+        return frames
+
+    def _pop(self, max_count: int) -> List[SeqFrame]:
+        frames: List[SeqFrame] = []
+        if self.spool is not None and len(self.spool):
+            records, seqs = self.spool.read_seq(max_count)
+            frames = list(zip(seqs, RECORD.iter_unpack(records)))
+        count = min(max_count - len(frames), self.tail - self.head)
+        start = self.head
+        frames.extend(
+            (start + i, RECORD.unpack_from(self.buf, ((start + i) % self.capacity) * RECORD_SIZE))
+            for i in range(count)
+        )
+        self.head += count
+        return frames
+
+    def _peek_timestamp(self) -> Optional[int]:
+        if self.spool is not None and len(self.spool):
+            return self.spool.peek_timestamp()
+        if self.tail == self.head:
+            return None
+        return TIMESTAMP.unpack_from(self.buf, (self.head % self.capacity) * RECORD_SIZE)[0]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.head = self.tail
+            if self.spool is not None:
+                self.spool.clear()
@@ -0,0 +1,163 @@
+from typing import Optional, List, Tuple
+from collections import deque
+import os
+import shutil
+import tempfile
+
+from app.services.frame_ring import RECORD_SIZE, TIMESTAMP
+
+# Spilled records are batched in memory and written in chunks of this size
+WRITE_CHUNK = 64 * 1024
+
+
+class _Segment:
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'w+b')
+        self.size = 0
+        self.read_pos = 0
+
+    def close(self) -> None:
+        try:
+            self.file.close()
+        finally:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class FrameSpool:
+    """Append-only on-disk overflow for FrameRing records.
+
+    Records are appended to segment files of segment_bytes each and read
+    back strictly in order; a segment is deleted once fully read and the
+    spool resets itself whenever it drains. Appends beyond max_bytes of
+    disk usage are refused and counted in `dropped`. The ring's sequence
+    number of every record is kept as runs of consecutive numbers, so a
+    refused append leaves a visible hole rather than shifting later ones.
+    """
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 1024 * 1024 * 1024,
+                 segment_bytes: int = 64 * 1024 * 1024):
+        self.base_directory = directory
+        self.directory: Optional[str] = None
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.segments: deque = deque()
+        # Sequence numbers of the queued records as [first, count] runs
+        self.seqs: deque = deque()
+        self.pending = bytearray()
+        self.disk_bytes = 0
+        self.count = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.segment_index = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, record: bytes, seq: int = 0) -> bool:
+        """Queue one record; False when the disk cap would be exceeded"""
+        if self.disk_bytes + len(self.pending) + RECORD_SIZE > self.max_bytes:
+            self.dropped += 1
+            return False
+        self.pending += record
+        if self.seqs and sum(self.seqs[-1]) == seq:
+            self.seqs[-1][1] += 1
+        else:
+            self.seqs.append([seq, 1])
+        self.count += 1
+        self.spilled += 1
+        if len(self.pending) >= WRITE_CHUNK:
+            self._flush()
+        return True
+
+    def read(self, max_count: int) -> bytes:
+        """Remove and return up to max_count of the oldest records, concatenated"""
+        return self.read_seq(max_count)[0]
+
+    def read_seq(self, max_count: int) -> Tuple[bytes, List[int]]:
+        """Like read, also returning the sequence number of each record"""
+        out = bytearray()
+        while max_count > 0 and self.segments:
+            seg = self.segments[0]
+            available = (seg.size - seg.read_pos) // RECORD_SIZE
+            if available == 0:
+                if len(self.segments) == 1:
+                    break
+                self._drop_segment()
+                continue
+            n = min(available, max_count)
+            seg.file.seek(seg.read_pos)
+            out += seg.file.read(n * RECORD_SIZE)
+            seg.read_pos += n * RECORD_SIZE
+            max_count -= n
+        # Records still in the write buffer are newer than anything on disk
+        if max_count > 0 and self.pending:
+            n = min(max_count * RECORD_SIZE, len(self.pending))
+            out += self.pending[:n]
+            del self.pending[:n]
+        count = len(out) // RECORD_SIZE
+        seqs: List[int] = []
+        while len(seqs) < count:
+            run = self.seqs[0]
+            n = min(run[1], count - len(seqs))
+            seqs.extend(range(run[0], run[0] + n))
+            if n == run[1]:
+                self.seqs.popleft()
+            else:
+                run[0] += n
+                run[1] -= n
+        self.count -= count
+        if self.count == 0:
+            self.clear()
+        return bytes(out), seqs
+
+    def peek_timestamp(self) -> Optional[int]:
+        """Timestamp of the oldest spooled record without consuming it"""
+        for seg in self.segments:
+            if seg.read_pos < seg.size:
+                seg.file.seek(seg.read_pos)
+                return TIMESTAMP.unpack(seg.file.read(TIMESTAMP.size))[0]
+        if self.pending:
+            return TIMESTAMP.unpack_from(self.pending)[0]
+        return None
+
+    def clear(self) -> None:
+        while self.segments:
+            self._drop_segment()
+        self.pending.clear()
+        self.seqs.clear()
+        self.count = 0
+        self.disk_bytes = 0
+
+    def close(self) -> None:
+        self.clear()
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def _flush(self) -> None:
+        seg = self.segments[-1] if self.segments else None
+        if seg is None or seg.size >= self.segment_bytes:
+            seg = self._new_segment()
+        seg.file.seek(seg.size)
+        seg.file.write(self.pending)
+        seg.size += len(self.pending)
+        self.disk_bytes += len(self.pending)
+        self.pending.clear()
+
+    def _new_segment(self) -> _Segment:
+        if self.directory is None:
+            if self.base_directory:
+                os.makedirs(self.base_directory, exist_ok=True)
+            self.directory = tempfile.mkdtemp(prefix="pcan-spool-", dir=self.base_directory)
+        self.segment_index += 1
+        seg = _Segment(os.path.join(self.directory, f"segment-{self.segment_index:06d}.bin"))
+        self.segments.append(seg)
+        return seg
+
+    def _drop_segment(self) -> None:
+        seg = self.segments.popleft()
+        self.disk_bytes -= seg.size
+        seg.close()
@@ -0,0 +1,50 @@
+from typing import Optional, List, Tuple, Iterable
+
+# Inclusive CAN ID range
+IdRange = Tuple[int, int]
+
+MAX_STANDARD_ID = 0x7FF
+MAX_EXTENDED_ID = 0x1FFFFFFF
+
+
+def parse_id_ranges(specs: Optional[Iterable[str]]) -> Optional[List[IdRange]]:
+    """Parse hex IDs ("100") and ranges ("100-1FF") into ID ranges.
+
+    None or an empty list means "every ID" and is returned as None.
+    """
+    if not specs:
+        return None
+    ranges = []
+    for spec in specs:
+        spec = spec.strip()
+        if not spec:
+            continue
+        if "-" in spec:
+            low, high = spec.split("-", 1)
+            first, last = int(low, 16), int(high, 16)
+        else:
+            first = last = int(spec, 16)
+        if first > last:
+            first, last = last, first
+        if last > MAX_EXTENDED_ID:
+            raise ValueError(f"CAN ID out of range: {spec}")
+        ranges.append((first, last))
+    return ranges or None
+
+
+def merge_ranges(ranges: Iterable[IdRange]) -> List[IdRange]:
+    """Coalesce overlapping and adjacent ranges into a sorted minimal list"""
+    merged: List[IdRange] = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def format_ranges(ranges: Optional[List[IdRange]]) -> Optional[List[str]]:
+    if ranges is None:
+        return None
+    return [f"{a:03X}" if a == b else f"{a:03X}-{b:03X}" for a, b in ranges]
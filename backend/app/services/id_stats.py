@@ -0,0 +1,100 @@
+from typing import Optional, List, Any
+import math
+
+# Sliding windows (seconds) reported as frame rates; counts are kept in
+# one-second buckets covering the longest window
+STATS_WINDOWS = (1, 10, 60)
+STATS_BUCKETS = 60
+
+STATS_FIELDS = [
+    "id", "count", "rate_1s", "rate_10s", "rate_60s",
+    "period_mean_us", "period_min_us", "period_max_us", "jitter_us",
+    "dlc", "dlc_changes", "last_timestamp", "channel"
+]
+
+
+class IdStats:
+    """Streaming traffic statistics for one CAN ID, updated in O(1) per frame.
+
+    Inter-arrival times use Welford's running mean/variance (jitter is the
+    standard deviation of the period); rates come from per-second buckets
+    of hardware timestamps, so they are exact sliding-window counts.
+    """
+    __slots__ = ("count", "last_ts", "gaps", "gap_mean", "gap_m2", "gap_min", "gap_max",
+                 "dlc", "dlc_changes", "first_second", "second", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.last_ts = 0
+        self.gaps = 0
+        self.gap_mean = 0.0
+        self.gap_m2 = 0.0
+        self.gap_min: Optional[int] = None
+        self.gap_max: Optional[int] = None
+        self.dlc = 0
+        self.dlc_changes = 0
+        self.first_second = 0
+        self.second = 0
+        self.buckets = [0] * STATS_BUCKETS
+
+    def update(self, timestamp: int, dlc: int) -> None:
+        if self.count:
+            gap = timestamp - self.last_ts
+            if gap >= 0:
+                self.gaps += 1
+                delta = gap - self.gap_mean
+                self.gap_mean += delta / self.gaps
+                self.gap_m2 += delta * (gap - self.gap_mean)
+                if self.gap_min is None or gap < self.gap_min:
+                    self.gap_min = gap
+                if self.gap_max is None or gap > self.gap_max:
+                    self.gap_max = gap
+            if dlc != self.dlc:
+                self.dlc_changes += 1
+        else:
+            self.first_second = self.second = timestamp // 1000000
+        self.count += 1
+        self.last_ts = timestamp
+        self.dlc = dlc
+        second = timestamp // 1000000
+        if second > self.second:
+            # Zero the buckets of the seconds skipped since the last frame
+            for s in range(self.second + 1, min(second, self.second + STATS_BUCKETS) + 1):
+                self.buckets[s % STATS_BUCKETS] = 0
+            self.second = second
+        elif second <= self.second - STATS_BUCKETS:
+            return
+        self.buckets[second % STATS_BUCKETS] += 1
+
+    def rate(self, window: int, now_second: int) -> Optional[float]:
+        """Frames per second over the `window` complete seconds before now_second.
+
+        IDs first seen less than `window` seconds ago are averaged over the
+        seconds actually observed; None until one full second has passed.
+        """
+        span = min(window, now_second - self.first_second)
+        if span <= 0:
+            return None
+        total = 0
+        oldest = self.second - STATS_BUCKETS
+        for s in range(now_second - span, now_second):
+            if oldest < s <= self.second:
+                total += self.buckets[s % STATS_BUCKETS]
+        return round(total / span, 2)
+
+    def to_row(self, name: str, now_ts: int, channel: str) -> List[Any]:
+        now_second = now_ts // 1000000
+        jitter = math.sqrt(self.gap_m2 / self.gaps) if self.gaps else None
+        return [
+            name,
+            self.count,
+            *(self.rate(w, now_second) for w in STATS_WINDOWS),
+            round(self.gap_mean, 1) if self.gaps else None,
+            self.gap_min,
+            self.gap_max,
+            round(jitter, 1) if jitter is not None else None,
+            self.dlc,
+            self.dlc_changes,
+            self.last_ts,
+            channel
+        ]
@@ -0,0 +1,160 @@
+from typing import Optional, Dict, Any, List, Tuple, Sequence
+from bisect import bisect_left
+
+# Content type of the Prometheus text exposition format
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds of the reader histograms
+DRAIN_SECONDS_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+BURST_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+
+class Histogram:
+    """Fixed-bucket histogram written by a single thread.
+
+    observe() touches only plain ints and floats, so the owning thread
+    needs no lock; a concurrent scrape may see a sample in the count but
+    not yet in the sum, which the exposition format tolerates.
+    """
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        # One count per bound plus the +Inf bucket; not cumulative
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class ReaderMetrics:
+    """Counters owned by one channel's reader thread; only that thread writes them"""
+    def __init__(self):
+        self.drain_passes = 0
+        self.idle_passes = 0
+        self.drain_seconds = Histogram(DRAIN_SECONDS_BUCKETS)
+        self.burst_frames = Histogram(BURST_SIZE_BUCKETS)
+        self.read_errors: Dict[int, int] = {}
+
+    def observe_drain(self, seconds: float, frames: int) -> None:
+        self.drain_passes += 1
+        self.drain_seconds.observe(seconds)
+        if frames:
+            self.burst_frames.observe(frames)
+        else:
+            self.idle_passes += 1
+
+    def read_error(self, status: int) -> None:
+        self.read_errors[status] = self.read_errors.get(status, 0) + 1
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value))
+
+
+class MetricsWriter:
+    """Builds a text exposition page, one metric family at a time"""
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str) -> None:
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, labels: Optional[Dict[str, Any]], value: Optional[float]) -> None:
+        if value is None:
+            return
+        if labels:
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            self.lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+        else:
+            self.lines.append(f"{name} {_format_value(value)}")
+
+    def histogram(self, name: str, labels: Dict[str, Any], hist: Histogram) -> None:
+        # Copy first so the cumulative buckets, sum and count come from one moment
+        counts, total, count = list(hist.counts), hist.sum, hist.count
+        cumulative = 0
+        for bound, n in zip(hist.bounds + (float('inf'),), counts):
+            cumulative += n
+            self.sample(f"{name}_bucket", dict(labels, le=_format_value(bound)), cumulative)
+        self.sample(f"{name}_sum", labels, total)
+        self.sample(f"{name}_count", labels, count)
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render_metrics(service: Any, hub: Any = None) -> str:
+    """Prometheus text exposition of the CAN ingest pipeline of a PCANService"""
+    out = MetricsWriter()
+    channels = service.open_channels()
+    per_channel: List[Tuple[str, str, str, Any]] = [
+        ("pcan_frames_ingested_total", "counter", "Frames read from the driver or injected",
+         lambda ch: ch.frames_received),
+        ("pcan_frames_per_second", "gauge", "Ingest rate over the last health sample",
+         lambda ch: ch.ingest_rate),
+        ("pcan_buffer_frames", "gauge", "Frames in the in-memory receive ring not yet popped",
+         lambda ch: ch.read_buffer.tail - ch.read_buffer.head),
+        ("pcan_buffer_capacity_frames", "gauge", "Capacity of the in-memory receive ring",
+         lambda ch: ch.read_buffer.capacity),
+        ("pcan_buffer_high_water_frames", "gauge", "Highest ring occupancy seen",
+         lambda ch: ch.read_buffer.high_water),
+        ("pcan_buffer_evicted_total", "counter", "Frames overwritten in the ring and lost",
+         lambda ch: ch.read_buffer.evicted),
+        ("pcan_spool_frames", "gauge", "Frames spilled to the on-disk spool and not yet popped",
+         lambda ch: len(ch.read_buffer.spool) if ch.read_buffer.spool is not None else 0),
+        ("pcan_reader_passes_total", "counter", "Drain passes of the reader loop",
+         lambda ch: ch.metrics.drain_passes),
+        ("pcan_reader_idle_passes_total", "counter", "Drain passes that found the receive queue empty",
+         lambda ch: ch.metrics.idle_passes),
+        ("pcan_cursor_gap_frames_total", "counter", "Frames cursor readers fell behind by and missed",
+         lambda ch: ch.cursor_gaps),
+    ]
+    for name, kind, help_text, get in per_channel:
+        out.family(name, kind, help_text)
+        for ch in channels:
+            out.sample(name, {"channel": ch.name}, get(ch))
+
+    out.family("pcan_reader_drain_seconds", "histogram", "Time per reader drain pass (read, store, publish)")
+    for ch in channels:
+        out.histogram("pcan_reader_drain_seconds", {"channel": ch.name}, ch.metrics.drain_seconds)
+    out.family("pcan_reader_burst_frames", "histogram", "Frames per non-empty reader drain pass")
+    for ch in channels:
+        out.histogram("pcan_reader_burst_frames", {"channel": ch.name}, ch.metrics.burst_frames)
+
+    out.family("pcan_read_errors_total", "counter", "Driver read errors by TPCANStatus code")
+    for ch in channels:
+        for status, count in sorted(dict(ch.metrics.read_errors).items()):
+            out.sample("pcan_read_errors_total", {"channel": ch.name, "status": f"{status:05X}h"}, count)
+
+    out.family("pcan_consumer_lag_frames", "gauge", "Frames ingested but not yet read, per consumer")
+    for ch in channels:
+        ring = ch.read_buffer
+        out.sample("pcan_consumer_lag_frames", {"channel": ch.name, "consumer": "default"}, len(ring))
+        out.sample("pcan_consumer_lag_frames", {"channel": ch.name, "consumer": "cursor"}, ch.cursor_lag)
+        out.sample("pcan_consumer_lag_frames", {"channel": ch.name, "consumer": "health"},
+                   ring.next_seq - ch.health_seq)
+
+    if hub is not None:
+        subs = list(hub.subscriptions)
+        out.family("pcan_stream_subscribers", "gauge", "Connected CAN WebSocket subscribers")
+        out.sample("pcan_stream_subscribers", None, len(subs))
+        out.family("pcan_stream_queue_batches", "gauge", "Largest backlog of frame batches queued for a subscriber")
+        out.sample("pcan_stream_queue_batches", None, max((s.queue.qsize() for s in subs), default=0))
+        out.family("pcan_stream_dropped_frames", "gauge", "Frames dropped for slow subscribers currently connected")
+        out.sample("pcan_stream_dropped_frames", None, sum(s.dropped for s in subs))
+    return out.render()
@@ -0,0 +1,80 @@
+from typing import Any, Callable, Dict
+from concurrent.futures import ThreadPoolExecutor, Future
+import asyncio
+import threading
+
+from app.services.pcan_service import PCANService, pcan_service
+
+# Threads that run driver calls, and how many calls may be queued or
+# running at once before new ones are refused
+COMMAND_WORKERS = 4
+COMMAND_QUEUE = 256
+
+
+class AsyncPCANService:
+    """Awaitable facade over PCANService for code running on the event loop.
+
+    Any PCANService method is available as a coroutine, e.g.
+    `await pcan_async.write_message(...)`; the call runs on a dedicated
+    executor, so ctypes calls into the driver (Initialize, Read, Write,
+    Uninitialize and the reader-thread join in release) never block the
+    uvicorn event loop that also serves the BLE WebSocket. At most
+    max_pending calls are queued or running: beyond that a call returns
+    an error dict immediately rather than piling up behind a stuck driver.
+    """
+    def __init__(self, service: PCANService, workers: int = COMMAND_WORKERS,
+                 max_pending: int = COMMAND_QUEUE):
+        self.service = service
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pcan-cmd")
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        method = getattr(self.service, name)
+        if not callable(method):
+            raise AttributeError(name)
+
+        async def run(*args: Any, **kwargs: Any) -> Any:
+            return await self.call(method, *args, **kwargs)
+        run.__name__ = name
+        return run
+
+    async def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run fn(*args, **kwargs) on the command executor and await its result"""
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                return {
+                    "success": False,
+                    "error": f"PCAN command queue full ({self.max_pending} calls pending)"
+                }
+            self.pending += 1
+        future = self.executor.submit(fn, *args, **kwargs)
+        # Counted until the call really finishes, even if the awaiting request goes away
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _done(self, future: Future) -> None:
+        with self.lock:
+            self.pending -= 1
+            self.completed += 1
+
+
+# Global async facade instance
+pcan_async = AsyncPCANService(pcan_service)
@@ -1,9 +1,10 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Callable, Iterator
 import sys
 import os
+import ctypes
 import threading
 import time
-from collections import deque
+from datetime import datetime
 
 # Add root directory to path to import PCANBasic
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
@@ -15,6 +16,7 @@ PCANBasic = None
 PCAN_ERROR_OK = 0
 PCAN_ERROR_CAUTION = 0x8000
 PCAN_ERROR_QRCVEMPTY = 0x00020  # Receive queue is empty
+PCAN_ERROR_XMTFULL = 0x00001  # Transmit buffer in CAN controller is full
 PCAN_USBBUS1 = 0x51
 PCAN_USBBUS2 = 0x52
 PCAN_USBBUS3 = 0x53
@@ -31,6 +33,39 @@ PCAN_BAUD_20K = 0x0009
 PCAN_BAUD_10K = 0x000A
 PCAN_MESSAGE_STANDARD = 0x00
 TPCANMsg = None
+TPCANMsgFD = None
+
+# Reader wake-up intervals: poll mode sleeps between drains, event mode
+# bounds each wait so the thread can notice a stop request
+READER_POLL_INTERVAL = 0.05
+READER_EVENT_TIMEOUT = 0.1
+READER_MODES = ("event", "poll")
+
+# HTTP readers declare no subscription, so the acceptance filter stays
+# open for this many seconds after any frame or table read over HTTP
+HTTP_READER_LEASE = 10.0
+
+# What happens when the in-memory ring is full: "evict" overwrites the
+# oldest frame, "spill" moves it to an on-disk spool (dropping only
+# beyond the spool's disk cap)
+OVERFLOW_POLICIES = ("evict", "spill")
+DEFAULT_SPOOL_MB = 1024
+
+# Column layout of rows returned by read_messages; counter is the frame's sequence number + 1
+BATCH_FIELDS = ["counter", "id", "msg_type", "len", "data", "timestamp", "channel"]
+# Column layout of rows returned by read_since
+STREAM_FIELDS = ["seq", "id", "msg_type", "len", "data", "timestamp", "channel"]
+# Column layout of latest-value snapshot rows; cycle_us is the gap to the previous frame of the ID,
+# signals the values decoded by a loaded DBC (None when no DBC defines the ID)
+LATEST_FIELDS = ["id", "msg_type", "len", "data", "timestamp", "count", "cycle_us", "channel", "signals"]
+# Extended IDs are kept apart from standard IDs of the same value in the table
+LATEST_EXTENDED_KEY = 0x80000000
+LATEST_ID_MASK = 0x1FFFFFFF
+
+# Approximate JSON size of a batch row excluding its hex payload, and the
+# largest possible row (64 data bytes as hex)
+BATCH_ROW_OVERHEAD = 48
+BATCH_ROW_MAX = BATCH_ROW_OVERHEAD + 128
 
 # Try to import PCANBasic
 try:
@@ -39,88 +74,101 @@ except (ImportError, Exception):
     # PCANBasic not available - will return errors when trying to connect
     pass
 
-class PCANService:
-    """Real PCAN service - requires actual PCAN hardware"""
-    def __init__(self):
+from app.services.receive_event import ReceiveEvent
+from app.services.frame_ring import (
+    FrameRing, Frame, frame_to_message, msg_type_label, len_to_dlc, DLC_TO_LEN,
+    MSGTYPE_RTR, MSGTYPE_EXTENDED, MSGTYPE_FD, MSGTYPE_BRS, MSGTYPE_ERRFRAME, MSGTYPE_STATUS
+)
+from app.services.frame_spool import FrameSpool
+from app.services.id_filter import IdRange, MAX_STANDARD_ID, parse_id_ranges, merge_ranges, format_ranges
+from app.services.cyclic_tx import CyclicMessage, CyclicScheduler
+from app.services.tx_queue import TransmitQueue, TxBatch, TxFrame, TX_BACKOFF_START, TX_BACKOFF_MAX
+from app.services.capture import CaptureWriter, CaptureReader, CAPTURE_EXTENSION
+from app.services.replay import ReplayEngine, REPLAY_TARGETS, load_json_trace
+from app.services.id_stats import IdStats, STATS_FIELDS
+from app.services.frame_reader import FrameReader
+from app.services.metrics import ReaderMetrics
+from app.services.dbc import DBCDatabase, DBCError, DBC_EXTENSION
+from app.services.bus_health import (
+    BusHealth, HealthMonitor, busy_seconds, BUS_EVENT_TYPES, HEALTH_FIELDS, HEALTH_MAX_FRAMES,
+    STATUS_OVERRUN, STATUS_QOVERRUN
+)
+
+
+def _error_text(pcan: Any, result: int) -> str:
+    try:
+        et = pcan.GetErrorText(result)
+        return et[1].decode(errors='ignore') if isinstance(et, tuple) and isinstance(et[1], (bytes, bytearray)) else str(et)
+    except Exception:
+        return str(result)
+
+
+class PCANChannel:
+    """One PCAN channel with its own reader thread, frame ring and counters"""
+    def __init__(self, service: "PCANService", name: str, handle: Any):
+        self.service = service
+        self.pcan = service.pcan
+        self.name = name
+        self.handle = handle
         self.initialized = False
-        self.channel = None
         self.baudrate = None
-        self.message_counter = 0
-        self.pcan_available = False
-        self.pcan = None
-        self.read_buffer = deque(maxlen=2000)
+        self.fd = False
+        self.read_buffer = FrameRing.sized(service.buffer_frames, service.buffer_mb)
+        self.read_buffer.drained = service._pop_reader_active()
+        self.overflow = "evict"
+        # Shared with the service so long-polls can wait on several channels
+        self.buffer_cond = service.buffer_cond
         self.reader_thread: Optional[threading.Thread] = None
         self.reader_running = False
-        
-        # Try to instantiate PCANBasic if available
-        if PCANBasic is not None:
-            try:
-                self.pcan = PCANBasic()
-                self.pcan_available = True
-            except Exception as e:
-                # Library failed to load (e.g., libpcanbasic.so not found)
-                self.pcan = None
-                self.pcan_available = False
-        
-        # Channel mapping
-        self.channel_map = {
-            'PCAN_USBBUS1': PCAN_USBBUS1,
-            'PCAN_USBBUS2': PCAN_USBBUS2,
-            'PCAN_USBBUS3': PCAN_USBBUS3,
-            'PCAN_USBBUS4': PCAN_USBBUS4,
-            'PCAN_USBBUS5': PCAN_USBBUS5,
-        }
-        
-        # Baudrate mapping
-        self.baudrate_map = {
-            'PCAN_BAUD_1M': PCAN_BAUD_1M,
-            'PCAN_BAUD_800K': PCAN_BAUD_800K,
-            'PCAN_BAUD_500K': PCAN_BAUD_500K,
-            'PCAN_BAUD_250K': PCAN_BAUD_250K,
-            'PCAN_BAUD_125K': PCAN_BAUD_125K,
-            'PCAN_BAUD_100K': PCAN_BAUD_100K,
-            'PCAN_BAUD_50K': PCAN_BAUD_50K,
-            'PCAN_BAUD_20K': PCAN_BAUD_20K,
-            'PCAN_BAUD_10K': PCAN_BAUD_10K,
-        }
-    
-    def initialize(self, channel: str, baudrate: str) -> Dict[str, Any]:
+        self.reader_mode = "event"
+        self.reader: Optional[FrameReader] = None
+        self.receive_event: Optional[ReceiveEvent] = None
+        self.frames_received = 0
+        self.read_errors = 0
+        self.last_read_error: Optional[int] = None
+        # Ranges currently programmed into the hardware filter; None = fully open
+        self.acceptance: Optional[List[IdRange]] = None
+        # Set whenever the filter is narrowed; the next health sample then
+        # sees only part of the bus and reports no load
+        self.filtered_since_sample = False
+        self.tx_queue = TransmitQueue(self)
+        # Last frame per CAN ID, updated in place:
+        # key -> [timestamp, msg_type, dlc, length, data, count, cycle_us, signals]
+        self.latest: Dict[int, List[Any]] = {}
+        # Per-ID traffic statistics on hardware timestamps, same keys as latest
+        self.id_stats: Dict[int, IdStats] = {}
+        self.last_timestamp = 0
+        # Bus condition from error/status frames and the health monitor's samples
+        self.health = BusHealth()
+        self.health_seq = self.read_buffer.next_seq
+        self.health_mark = (time.monotonic(), 0, 0, 0)
+        self.bus_speed: Optional[tuple] = None
+        # Ingest metrics: reader-owned counters, the rate from the last
+        # health sample and the lag/gaps seen by the last cursor read
+        self.metrics = ReaderMetrics()
+        self.ingest_rate: Optional[float] = None
+        self.cursor_lag: Optional[int] = None
+        self.cursor_gaps = 0
+
+    def open(self, baudrate: str, reader_mode: str = "event", fd: bool = False) -> Dict[str, Any]:
+        """Initialize the channel; in FD mode baudrate is an FD preset name or a raw bit rate string"""
+        pcan_channel = self.handle
         try:
-            if not self.pcan_available:
-                return {
-                    "success": False,
-                    "error": "PCAN hardware not available. Ensure PCANBasic driver is installed and PCAN device is connected."
-                }
-            
-            # Get channel handle from mapping
-            if channel not in self.channel_map:
-                return {
-                    "success": False,
-                    "error": f"Invalid channel: {channel}"
-                }
-            
-            if baudrate not in self.baudrate_map:
-                return {
-                    "success": False,
-                    "error": f"Invalid baudrate: {baudrate}"
-                }
-            
-            pcan_channel = self.channel_map[channel]
-            pcan_baudrate = self.baudrate_map[baudrate]
-            
             # Initialize PCAN with proper parameters
-            result = self.pcan.Initialize(pcan_channel, pcan_baudrate)
-            
+            if fd:
+                bitrate_fd = self.service.fd_bitrate_map.get(baudrate, baudrate)
+                result = self.pcan.InitializeFD(pcan_channel, bitrate_fd.encode())
+            else:
+                result = self.pcan.Initialize(pcan_channel, self.service.baudrate_map[baudrate])
+
             # Check if initialization was successful
             if result == PCAN_ERROR_OK or result == PCAN_ERROR_CAUTION:
                 self.initialized = True
-                self.channel = channel
                 self.baudrate = baudrate
-                self.message_counter = 0
-                try:
-                    self.pcan.SetValue(pcan_channel, PCAN_MESSAGE_FILTER, PCAN_FILTER_OPEN)
-                except Exception:
-                    pass
+                self.fd = fd
+                self.reader_mode = reader_mode
+                self.reader = FrameReader(self.pcan, pcan_channel, fd)
+                self.apply_filter(self.service.acceptance_ranges(self.name))
                 try:
                     self.pcan.SetValue(pcan_channel, PCAN_ALLOW_STATUS_FRAMES, PCAN_PARAMETER_ON)
                 except Exception:
@@ -147,174 +195,121 @@ class PCANService:
                     pass
                 return {
                     "success": True,
-                    "message": f"Channel {channel} initialized successfully at {baudrate}"
+                    "message": f"Channel {self.name} initialized successfully at {baudrate}"
                 }
             else:
-                # Get error message
-                try:
-                    et = self.pcan.GetErrorText(result)
-                    error_text = et[1].decode(errors='ignore') if isinstance(et, tuple) and isinstance(et[1], (bytes, bytearray)) else str(et)
-                except Exception:
-                    error_text = str(result)
                 return {
                     "success": False,
-                    "error": f"Failed to initialize PCAN: {error_text}"
+                    "error": f"Failed to initialize PCAN: {_error_text(self.pcan, result)}"
                 }
-        
+
         except Exception as e:
             return {
                 "success": False,
                 "error": f"PCAN initialization error: {str(e)}"
             }
         finally:
-            if self.initialized and not self.reader_running and self.pcan_available:
+            if self.initialized and not self.reader_running:
+                self.receive_event = None
+                if self.reader_mode != "poll":
+                    self.receive_event = ReceiveEvent.open(self.pcan, pcan_channel)
                 self.reader_running = True
                 try:
-                    self.reader_thread = threading.Thread(target=self._reader_loop, daemon=True)
+                    self.reader_thread = threading.Thread(target=self._reader_loop, name=f"pcan-reader-{self.name}", daemon=True)
                     self.reader_thread.start()
                 except Exception:
                     self.reader_running = False
-    
-    def release(self) -> Dict[str, Any]:
+                self.tx_queue.start()
+
+    def close(self) -> Dict[str, Any]:
         try:
-            if self.initialized:
-                if self.reader_running:
-                    self.reader_running = False
-                    try:
-                        if self.reader_thread is not None:
-                            self.reader_thread.join(timeout=1.0)
-                    except Exception:
-                        pass
-                result = self.pcan.Uninitialize(self.channel_map[self.channel])
-                self.initialized = False
-                self.channel = None
-                self.baudrate = None
-                self.message_counter = 0
-                self.read_buffer.clear()
-                
-                if result == PCAN_ERROR_OK:
-                    return {
-                        "success": True,
-                        "message": "Channel released successfully"
-                    }
-                else:
-                    try:
-                        et = self.pcan.GetErrorText(result)
-                        error_text = et[1].decode(errors='ignore') if isinstance(et, tuple) and isinstance(et[1], (bytes, bytearray)) else str(et)
-                    except Exception:
-                        error_text = str(result)
-                    return {
-                        "success": False,
-                        "error": f"Failed to release PCAN: {error_text}"
-                    }
+            self.tx_queue.stop()
+            if self.reader_running:
+                self.reader_running = False
+                try:
+                    if self.reader_thread is not None:
+                        self.reader_thread.join(timeout=1.0)
+                except Exception:
+                    pass
+            if self.receive_event is not None:
+                self.receive_event.close()
+                self.receive_event = None
+            result = self.pcan.Uninitialize(self.handle)
+            self.initialized = False
+            self.baudrate = None
+            self.fd = False
+            self.read_buffer.clear()
+            if self.read_buffer.spool is not None:
+                self.read_buffer.spool.close()
+            with self.buffer_cond:
+                self.buffer_cond.notify_all()
+
+            if result == PCAN_ERROR_OK:
+                return {
+                    "success": True,
+                    "message": f"Channel {self.name} released successfully"
+                }
             else:
                 return {
                     "success": False,
-                    "error": "PCAN not initialized"
+                    "error": f"Failed to release PCAN: {_error_text(self.pcan, result)}"
                 }
         except Exception as e:
             return {
                 "success": False,
                 "error": f"Error releasing PCAN: {str(e)}"
             }
-    
+
     def get_status(self) -> Dict[str, Any]:
-        if not self.initialized:
-            return {
-                "status_code": "00001h",
-                "status_text": "Not initialized"
-            }
-        
         try:
-            result = self.pcan.GetStatus(self.channel_map[self.channel])
+            result = self.pcan.GetStatus(self.handle)
             if result == PCAN_ERROR_OK:
-                return {
+                status = {
                     "status_code": "00000h",
                     "status_text": "OK"
                 }
             else:
-                try:
-                    et = self.pcan.GetErrorText(result)
-                    error_text = et[1].decode(errors='ignore') if isinstance(et, tuple) and isinstance(et[1], (bytes, bytearray)) else str(et)
-                except Exception:
-                    error_text = str(result)
-                return {
+                status = {
                     "status_code": "00001h",
-                    "status_text": error_text
+                    "status_text": _error_text(self.pcan, result)
                 }
         except Exception as e:
-            return {
+            status = {
                 "status_code": "00001h",
                 "status_text": str(e)
             }
-    
+        status.update({
+            "channel": self.name,
+            "baudrate": self.baudrate,
+            "fd": self.fd,
+            "reader_mode": "event" if self.receive_event is not None else "poll",
+            "frames_received": self.frames_received,
+            "read_errors": self.read_errors,
+            "tx_queued": self.tx_queue.queued_frames,
+            "tx_sent": self.tx_queue.frames_sent,
+            "bus_state": self.health.state,
+            "bus_load_pct": self.health.load_pct,
+            "rx_errors": self.health.rx_errors,
+            "tx_errors": self.health.tx_errors
+        })
+        return status
+
     def read_message(self) -> Dict[str, Any]:
-        if not self.initialized:
-            return {
-                "success": False,
-                "message": "PCAN not initialized"
-            }
-        
-        if not self.pcan_available:
-            return {
-                "success": False,
-                "message": "PCAN hardware not available"
-            }
-        
         try:
-            if self.read_buffer:
-                item = self.read_buffer.popleft()
-                self.message_counter += 1
-                item["counter"] = self.message_counter
+            popped = self.read_buffer.pop_seq(1)
+            if not popped and not self.reader_running:
+                # No reader thread: pull from the driver through the ring so
+                # the frame still gets a sequence number and reaches listeners
+                reader = self.reader or FrameReader(self.pcan, self.handle, self.fd)
+                frames, status = reader.read_burst()
+                if frames:
+                    self.read_buffer.extend(frames)
+                    self._publish(frames)
+                    popped = self.read_buffer.pop_seq(1)
+            if popped:
                 return {
                     "success": True,
-                    "message": item
-                }
-            ch = self.channel_map.get(self.channel)
-            if ch is None:
-                return {"success": True, "message": None}
-            try:
-                resfd = self.pcan.ReadFD(ch)
-                if resfd[0] == PCAN_ERROR_OK:
-                    msgfd = resfd[1]
-                    tsfd = resfd[2]
-                    datafd = []
-                    for i in range(msgfd.DLC):
-                        datafd.append(msgfd.DATA[i])
-                    self.message_counter += 1
-                    return {
-                        "success": True,
-                        "message": {
-                            "counter": self.message_counter,
-                            "id": f"{msgfd.ID:03X}",
-                            "msg_type": "DATA",
-                            "len": msgfd.DLC,
-                            "data": datafd,
-                            "timestamp": self._timestamp_to_us(tsfd)
-                        }
-                    }
-                elif resfd[0] != PCAN_ERROR_QRCVEMPTY:
-                    pass
-            except Exception:
-                pass
-            res = self.pcan.Read(ch)
-            if res[0] == PCAN_ERROR_OK:
-                can_msg = res[1]
-                timestamp = res[2]
-                data = []
-                for i in range(can_msg.LEN):
-                    data.append(can_msg.DATA[i])
-                self.message_counter += 1
-                return {
-                    "success": True,
-                    "message": {
-                        "counter": self.message_counter,
-                        "id": f"{can_msg.ID:03X}",
-                        "msg_type": "DATA",
-                        "len": can_msg.LEN,
-                        "data": data,
-                        "timestamp": self._timestamp_to_us(timestamp)
-                    }
+                    "message": self.to_message(*popped[0])
                 }
             return {"success": True, "message": None}
         except Exception as e:
@@ -322,56 +317,153 @@ class PCANService:
                 "success": False,
                 "message": f"Error reading message: {str(e)}"
             }
-    
-    def write_message(self, msg_id: str, data: list, extended: bool = False, rtr: bool = False) -> Dict[str, Any]:
-        if not self.initialized:
-            return {
-                "success": False,
-                "error": "PCAN not initialized"
-            }
-        
+
+    def apply_filter(self, ranges: Optional[List[IdRange]]) -> None:
+        """Program the hardware acceptance filter; None opens it fully"""
+        try:
+            if ranges is None:
+                self.pcan.SetValue(self.handle, PCAN_MESSAGE_FILTER, PCAN_FILTER_OPEN)
+            else:
+                # FilterMessages only ever widens the filter, so start from closed
+                self.pcan.SetValue(self.handle, PCAN_MESSAGE_FILTER, PCAN_FILTER_CLOSE)
+                for first, last in ranges:
+                    # Subscriptions do not tell 11-bit from 29-bit IDs, so the
+                    # part of a range up to 0x7FF is opened in both modes and
+                    # the whole range in extended mode
+                    if first <= MAX_STANDARD_ID:
+                        self.pcan.FilterMessages(self.handle, first, min(last, MAX_STANDARD_ID), PCAN_MODE_STANDARD)
+                    self.pcan.FilterMessages(self.handle, first, last, PCAN_MODE_EXTENDED)
+                self.filtered_since_sample = True
+            self.acceptance = ranges
+        except Exception:
+            pass
+
+    def to_message(self, seq: int, frame: Frame) -> Dict[str, Any]:
+        item = frame_to_message(frame, self.name)
+        item["counter"] = seq + 1
+        return item
+
+    def to_row(self, frame: Frame, counter: int) -> List[Any]:
+        timestamp, can_id, msg_type, dlc, length, data = frame
+        return [
+            counter,
+            f"{can_id:03X}",
+            msg_type_label(msg_type),
+            length,
+            data[:length].hex().upper(),
+            timestamp,
+            self.name
+        ]
+
+    def set_overflow_policy(self, policy: str, spool_dir: Optional[str] = None,
+                            spool_mb: Optional[float] = None) -> None:
+        ring = self.read_buffer
+        with ring.lock:
+            old_spool = ring.spool
+            if policy == "spill":
+                ring.spool = FrameSpool(spool_dir, int((spool_mb or DEFAULT_SPOOL_MB) * 1024 * 1024))
+            else:
+                ring.spool = None
+            if old_spool is not None:
+                # Frames still on disk are discarded with the old spool
+                ring.evicted += len(old_spool)
+                old_spool.close()
+        self.overflow = policy
+
+    def get_buffer_stats(self) -> Dict[str, Any]:
+        ring = self.read_buffer
+        spool = ring.spool
+        return {
+            "channel": self.name,
+            "overflow": self.overflow,
+            "capacity": ring.capacity,
+            "memory_bytes": ring.nbytes,
+            "pending": len(ring),
+            "evicted": ring.evicted,
+            "spooled": len(spool) if spool is not None else 0,
+            "spool_disk_bytes": spool.disk_bytes if spool is not None else 0,
+            "spool_max_bytes": spool.max_bytes if spool is not None else 0,
+            "spilled_total": spool.spilled if spool is not None else 0,
+            "spool_dropped": spool.dropped if spool is not None else 0
+        }
+
+    def encode_frame(self, msg_id: str, data: list, extended: bool = False, rtr: bool = False,
+                     fd: Optional[bool] = None, brs: bool = False) -> TxFrame:
+        """Validate a frame for this channel and return (can_id, msg_type, payload).
+
+        On an FD channel, payloads over 8 bytes (or fd=True) become FD frames;
+        brs switches to the data bit rate. Raises ValueError on invalid input.
+        """
+        can_id = int(msg_id, 16)
+        is_extended = extended or (can_id > 0x7FF) or (len(msg_id) > 3)
+        msg_type = 0
+        if is_extended:
+            msg_type |= MSGTYPE_EXTENDED
+        if rtr:
+            msg_type |= MSGTYPE_RTR
+
+        if fd is None:
+            fd = self.fd and len(data) > 8
+        if fd and not self.fd:
+            raise ValueError(f"Channel {self.name} is not initialized in FD mode")
+        if fd:
+            msg_type |= MSGTYPE_FD
+            if brs:
+                msg_type |= MSGTYPE_BRS
+            payload = bytes(data[:64])
+        else:
+            payload = bytes(data[:8])
+        if rtr:
+            # Remote frames carry a length but no data
+            payload = bytes(len(payload))
+        return can_id, msg_type, payload
+
+    def new_tx_msg(self) -> Any:
+        return TPCANMsgFD() if self.fd else TPCANMsg()
+
+    def write_frame(self, msg: Any, can_id: int, msg_type: int, payload: bytes) -> int:
+        """Fill a reusable TPCANMsg / TPCANMsgFD from an encoded frame and send it"""
+        msg.ID = can_id
+        msg.MSGTYPE = msg_type
+        length = len(payload)
+        if self.fd:
+            # FD channels transmit through WriteFD, classic frames included
+            dlc = len_to_dlc(length)
+            msg.DLC = dlc
+            ctypes.memmove(msg.DATA, payload, length)
+            padding = DLC_TO_LEN[dlc] - length
+            if padding:
+                ctypes.memset(ctypes.addressof(msg.DATA) + length, 0, padding)
+            return self.pcan.WriteFD(self.handle, msg)
+        msg.LEN = length
+        ctypes.memmove(msg.DATA, payload, length)
+        return self.pcan.Write(self.handle, msg)
+
+    def error_text(self, result: int) -> str:
+        return _error_text(self.pcan, result)
+
+    def write_message(self, msg_id: str, data: list, extended: bool = False, rtr: bool = False,
+                      fd: Optional[bool] = None, brs: bool = False) -> Dict[str, Any]:
+        """Send one frame; see encode_frame for the FD rules"""
         try:
-            # Parse message ID
-            can_id = int(msg_id, 16)
-            is_extended = extended or (can_id > 0x7FF) or (len(msg_id) > 3)
-            
-            # Create CAN message
-            can_msg = TPCANMsg()
-            can_msg.ID = can_id
-            msg_type = 0
             try:
-                # Combine flags for extended/RTR if available
-                if is_extended:
-                    msg_type |= PCAN_MESSAGE_EXTENDED.value if hasattr(PCAN_MESSAGE_EXTENDED, 'value') else PCAN_MESSAGE_EXTENDED
-                if rtr:
-                    msg_type |= PCAN_MESSAGE_RTR.value if hasattr(PCAN_MESSAGE_RTR, 'value') else PCAN_MESSAGE_RTR
-            except Exception:
-                msg_type = 0
-            can_msg.MSGTYPE = msg_type
-            can_msg.LEN = min(len(data), 8)
-            
-            # Copy data to message
-            if not rtr:
-                for i, byte in enumerate(data[:can_msg.LEN]):
-                    can_msg.DATA[i] = byte
-            
-            # Send message
-            result = self.pcan.Write(self.channel_map[self.channel], can_msg)
-            
+                frame = self.encode_frame(msg_id, data, extended, rtr, fd, brs)
+            except ValueError as e:
+                return {
+                    "success": False,
+                    "error": f"Invalid message: {str(e)}"
+                }
+            result = self.write_frame(self.new_tx_msg(), *frame)
+
             if result == PCAN_ERROR_OK:
                 return {
                     "success": True,
                     "message": f"Message sent successfully - ID: {msg_id}"
                 }
             else:
-                try:
-                    et = self.pcan.GetErrorText(result)
-                    error_text = et[1].decode(errors='ignore') if isinstance(et, tuple) and isinstance(et[1], (bytes, bytearray)) else str(et)
-                except Exception:
-                    error_text = str(result)
                 return {
                     "success": False,
-                    "error": f"Failed to send message: {error_text}"
+                    "error": f"Failed to send message: {_error_text(self.pcan, result)}"
                 }
         
         except Exception as e:
@@ -380,66 +472,1164 @@ class PCANService:
                 "error": f"Error writing message: {str(e)}"
             }
 
+    def write_batch(self, frames: List[Dict[str, Any]], stop_on_error: bool = True) -> Dict[str, Any]:
+        """Queue frames ({"id", "data", "extended", "rtr", "fd", "brs"}) for the writer thread"""
+        encoded = []
+        for index, f in enumerate(frames):
+            try:
+                encoded.append(self.encode_frame(f["id"], f.get("data") or [], f.get("extended", False),
+                                                 f.get("rtr", False), f.get("fd"), f.get("brs", False)))
+            except (ValueError, KeyError, TypeError) as e:
+                return {
+                    "success": False,
+                    "error": f"Invalid frame at index {index}: {str(e)}"
+                }
+        batch = self.tx_queue.submit(encoded, stop_on_error)
+        if batch is None:
+            return {
+                "success": False,
+                "error": f"Transmit queue of {self.name} is full ({self.tx_queue.queued_frames} frames queued)"
+            }
+        return {
+            "success": True,
+            "message": f"Queued {len(encoded)} frames on {self.name}",
+            "batch": batch.to_dict()
+        }
+
+    def inject_frames(self, frames: List[Frame]) -> None:
+        """Feed frames into the receive path as if the reader had just read them"""
+        self.read_buffer.extend(frames)
+        self._publish(frames)
+
+    def get_latest(self, ids: Optional[List[IdRange]] = None) -> List[List[Any]]:
+        """Snapshot of the latest-frame table as LATEST_FIELDS rows, sorted by ID"""
+        rows = []
+        for key, entry in sorted(list(self.latest.items())):
+            can_id = key & LATEST_ID_MASK
+            if ids is not None and not any(lo <= can_id <= hi for lo, hi in ids):
+                continue
+            timestamp, msg_type, dlc, length, data, count, cycle, signals = tuple(entry)
+            rows.append([f"{can_id:03X}", msg_type_label(msg_type), length, data[:length].hex().upper(),
+                         timestamp, count, cycle, self.name, signals])
+        return rows
+
+    def get_stats(self, ids: Optional[List[IdRange]] = None) -> List[List[Any]]:
+        """Per-ID statistics as STATS_FIELDS rows, sorted by ID"""
+        rows = []
+        now_ts = self.last_timestamp
+        for key, stats in sorted(list(self.id_stats.items())):
+            can_id = key & LATEST_ID_MASK
+            if ids is not None and not any(lo <= can_id <= hi for lo, hi in ids):
+                continue
+            rows.append(stats.to_row(f"{can_id:03X}", now_ts, self.name))
+        return rows
+
+    def _track(self, burst: List[Frame]) -> None:
+        latest = self.latest
+        id_stats = self.id_stats
+        decoders = self.service.dbc.decoders
+        last_timestamp = self.last_timestamp
+        for frame in burst:
+            timestamp, can_id, msg_type, dlc, length, data = frame
+            if msg_type & BUS_EVENT_TYPES:
+                # Error and status frames describe the bus, not an ID's traffic
+                self.health.record(frame)
+                continue
+            key = can_id | LATEST_EXTENDED_KEY if msg_type & MSGTYPE_EXTENDED else can_id
+            stats = id_stats.get(key)
+            if stats is None:
+                stats = id_stats[key] = IdStats()
+            stats.update(timestamp, dlc)
+            if timestamp > last_timestamp:
+                last_timestamp = timestamp
+            # Decoded once here for the latest table; only IDs a DBC defines pay for it
+            decoder = decoders.get(key)
+            signals = decoder.decode(data, length) if decoder is not None else None
+            entry = latest.get(key)
+            if entry is None:
+                latest[key] = [timestamp, msg_type, dlc, length, data, 1, None, signals]
+            else:
+                entry[6] = timestamp - entry[0]
+                entry[0] = timestamp
+                entry[1] = msg_type
+                entry[2] = dlc
+                entry[3] = length
+                entry[4] = data
+                entry[5] += 1
+                entry[7] = signals
+        self.last_timestamp = last_timestamp
+
+    def sample_health(self) -> None:
+        """Take one health sample; called by the health monitor thread, never the reader"""
+        try:
+            status = self.pcan.GetStatus(self.handle)
+        except Exception:
+            status = None
+        if self.bus_speed is None:
+            self.bus_speed = (self._get_value(PCAN_BUSSPEED_NOMINAL),
+                              self._get_value(PCAN_BUSSPEED_DATA) if self.fd else None)
+        # Bus load from the bits of the frames received since the last sample,
+        # read back from the ring so the reader does no extra work. Only valid
+        # if the filter was open for the whole interval, else it undercounts
+        frames, self.health_seq, gap = self.read_buffer.read_since(self.health_seq, HEALTH_MAX_FRAMES)
+        filtered = self.filtered_since_sample or self.acceptance is not None
+        self.filtered_since_sample = False
+        now = time.monotonic()
+        ring = self.read_buffer
+        last_time, last_frames, last_evicted, last_errors = self.health_mark
+        self.health_mark = (now, self.frames_received, ring.evicted, self.read_errors)
+        load = None
+        nominal, data = self.bus_speed
+        if now > last_time:
+            self.ingest_rate = round((self.frames_received - last_frames) / (now - last_time), 1)
+            if nominal and not gap and not filtered:
+                load = round(100.0 * busy_seconds(frames, nominal, data) / (now - last_time), 2)
+        self.health.sample(
+            status, load,
+            frames=self.frames_received - last_frames,
+            overruns=1 if status is not None and status & (STATUS_OVERRUN | STATUS_QOVERRUN) else 0,
+            dropped=ring.evicted - last_evicted,
+            read_errors=self.read_errors - last_errors
+        )
+
+    def _get_value(self, parameter: Any) -> Optional[int]:
+        try:
+            result, value = self.pcan.GetValue(self.handle, parameter)
+            return int(value) if result == PCAN_ERROR_OK and value else None
+        except Exception:
+            return None
+
+    def _publish(self, burst: List[Frame]) -> None:
+        self._track(burst)
+        self.frames_received += len(burst)
+        with self.buffer_cond:
+            self.buffer_cond.notify_all()
+        for callback in self.service.listeners:
+            try:
+                callback(self.name, burst)
+            except Exception:
+                pass
+
+    def drain(self) -> int:
+        """Move everything queued in the driver to the ring and the listeners; returns the frames moved"""
+        reader = self.reader
+        ring = self.read_buffer
+        metrics = self.metrics
+        clock = time.perf_counter
+        moved = 0
+        # Drain the queue in bursts, similar to the example's timer tick;
+        # raw records go to the ring, dicts are only built at the API edge
+        while True:
+            started = clock()
+            burst, status_code = reader.read_burst()
+            if burst:
+                ring.extend(burst)
+                self._publish(burst)
+                moved += len(burst)
+            metrics.observe_drain(clock() - started, len(burst))
+            if status_code == PCAN_ERROR_OK:
+                # Burst limit reached with more frames queued
+                continue
+            if status_code != PCAN_ERROR_QRCVEMPTY:
+                # Non-empty error; we can sleep and retry
+                self.read_errors += 1
+                self.last_read_error = status_code
+                metrics.read_error(status_code)
+            return moved
+
     def _reader_loop(self):
         try:
-            while self.reader_running and self.initialized and self.pcan_available:
+            while self.reader_running and self.initialized:
                 try:
-                    ch = self.channel_map.get(self.channel)
-                    if ch is None:
-                        time.sleep(0.05)
-                        continue
-                    # Drain the queue in bursts, similar to the example's timer tick
-                    while True:
-                        res = self.pcan.Read(ch)
-                        status_code = res[0]
-                        if status_code == PCAN_ERROR_OK:
-                            can_msg = res[1]
-                            timestamp = res[2]
-                            # Extract data
-                            data = []
-                            for i in range(can_msg.LEN):
-                                data.append(can_msg.DATA[i])
-                            # Determine type label
-                            try:
-                                is_rtr = (can_msg.MSGTYPE & PCAN_MESSAGE_RTR.value) == PCAN_MESSAGE_RTR.value
-                            except Exception:
-                                is_rtr = False
-                            msg_type_str = "RTR" if is_rtr else "DATA"
-                            item = {
-                                "id": f"{can_msg.ID:03X}",
-                                "msg_type": msg_type_str,
-                                "len": can_msg.LEN,
-                                "data": data,
-                                "timestamp": self._timestamp_to_us(timestamp)
-                            }
-                            self.read_buffer.append(item)
-                            continue
-                        elif status_code == PCAN_ERROR_QRCVEMPTY:
-                            break
-                        else:
-                            # Non-empty error; we can sleep and retry
-                            break
+                    self.drain()
                 except Exception:
                     # Suppress read-loop exceptions to keep the thread alive
                     pass
-                time.sleep(0.05)
+                # Block on the driver's receive event when available; the
+                # queue was just drained so no wake-up can be missed
+                event = self.receive_event
+                if event is not None:
+                    event.wait(READER_EVENT_TIMEOUT)
+                else:
+                    time.sleep(READER_POLL_INTERVAL)
         finally:
             pass
 
-    def _timestamp_to_us(self, ts: Any) -> int:
+
+class PCANService:
+    """Real PCAN service - requires actual PCAN hardware.
+
+    Any number of channels can be initialized at once; each gets its own
+    PCANChannel (reader thread, ring buffer, statistics). Methods take an
+    optional channel name: when omitted they act on the only open channel,
+    reads merge all open channels into one stream, and release closes
+    every channel. The merge goes by hardware timestamp, so frames are
+    always in order within a channel, but across channels only when they
+    share a clock (channels of one multi-channel adapter); separate
+    adapters' clocks are not synchronised.
+
+    backend="virtual" swaps the PCAN-Basic library for VirtualPCANBasic, a
+    simulated bus with generated traffic, so everything above the driver
+    can be run and load-tested without an adapter.
+    """
+    def __init__(self, buffer_frames: Optional[int] = None, buffer_mb: Optional[float] = None,
+                 overflow: str = "evict", spool_dir: Optional[str] = None, spool_mb: Optional[float] = None,
+                 backend: str = "hardware", capture_dir: Optional[str] = None, dbc_dir: Optional[str] = None):
+        self.pcan_available = False
+        self.pcan = None
+        self.channels: Dict[str, PCANChannel] = {}
+        self.lock = threading.Lock()
+        self.buffer_cond = threading.Condition()
+        self.listeners: List[Callable[[str, List[Frame]], None]] = []
+        # Consumer interest: owner -> (channel or None for all, ID ranges or None for everything)
+        self.subscriptions: Dict[str, Any] = {}
+        # Listeners that declare no subscription and so need all traffic
+        self.unfiltered_listeners: List[Callable[[str, List[Frame]], None]] = []
+        # Monotonic time of the last HTTP read, see HTTP_READER_LEASE
+        self.http_read_at: Optional[float] = None
+        # Same for HTTP reads that pop the ring; only while one is active is
+        # ring overflow a loss worth spilling or counting
+        self.pop_read_at: Optional[float] = None
+        self.filter_lock = threading.Lock()
+        self.cyclic = CyclicScheduler(self._send_cyclic)
+        self.buffer_frames = buffer_frames
+        self.buffer_mb = buffer_mb
+        self.overflow = overflow if overflow in OVERFLOW_POLICIES else "evict"
+        self.spool_dir = spool_dir
+        self.spool_mb = spool_mb
+        self.backend = backend
+        self.capture_dir = capture_dir or os.path.join(root_dir, "captures")
+        self.recorder: Optional[CaptureWriter] = None
+        self.replay = ReplayEngine()
+        self.health_monitor = HealthMonitor(self._sample_health)
+        # Signal decoders compiled from the .dbc files in dbc_dir
+        self.dbc_dir = dbc_dir or os.path.join(os.path.dirname(__file__), '..', '..', 'dbc')
+        self.dbc = DBCDatabase()
+        self.dbc_errors = self.dbc.load_dir(self.dbc_dir)
+        
+        # Try to instantiate PCANBasic if available
+        if backend == "virtual":
+            from app.services.virtual_pcan import VirtualPCANBasic
+            self.pcan = VirtualPCANBasic.from_env()
+            self.pcan_available = True
+        elif PCANBasic is not None:
+            try:
+                self.pcan = PCANBasic()
+                self.pcan_available = True
+            except Exception as e:
+                # Library failed to load (e.g., libpcanbasic.so not found)
+                self.pcan = None
+                self.pcan_available = False
+        
+        # Channel mapping
+        self.channel_map = {
+            'PCAN_USBBUS1': PCAN_USBBUS1,
+            'PCAN_USBBUS2': PCAN_USBBUS2,
+            'PCAN_USBBUS3': PCAN_USBBUS3,
+            'PCAN_USBBUS4': PCAN_USBBUS4,
+            'PCAN_USBBUS5': PCAN_USBBUS5,
+        }
+        
+        # CAN FD bit rate presets (80 MHz clock, 80% sample points), as accepted by InitializeFD
+        self.fd_bitrate_map = {
+            'PCAN_BR_FD_250K_2M': 'f_clock_mhz=80,nom_brp=4,nom_tseg1=63,nom_tseg2=16,nom_sjw=16,data_brp=2,data_tseg1=15,data_tseg2=4,data_sjw=4',
+            'PCAN_BR_FD_500K_2M': 'f_clock_mhz=80,nom_brp=2,nom_tseg1=63,nom_tseg2=16,nom_sjw=16,data_brp=2,data_tseg1=15,data_tseg2=4,data_sjw=4',
+            'PCAN_BR_FD_500K_4M': 'f_clock_mhz=80,nom_brp=2,nom_tseg1=63,nom_tseg2=16,nom_sjw=16,data_brp=2,data_tseg1=7,data_tseg2=2,data_sjw=2',
+            'PCAN_BR_FD_1M_5M': 'f_clock_mhz=80,nom_brp=2,nom_tseg1=31,nom_tseg2=8,nom_sjw=8,data_brp=2,data_tseg1=5,data_tseg2=2,data_sjw=2',
+        }
+
+        # Baudrate mapping
+        self.baudrate_map = {
+            'PCAN_BAUD_1M': PCAN_BAUD_1M,
+            'PCAN_BAUD_800K': PCAN_BAUD_800K,
+            'PCAN_BAUD_500K': PCAN_BAUD_500K,
+            'PCAN_BAUD_250K': PCAN_BAUD_250K,
+            'PCAN_BAUD_125K': PCAN_BAUD_125K,
+            'PCAN_BAUD_100K': PCAN_BAUD_100K,
+            'PCAN_BAUD_50K': PCAN_BAUD_50K,
+            'PCAN_BAUD_20K': PCAN_BAUD_20K,
+            'PCAN_BAUD_10K': PCAN_BAUD_10K,
+        }
+
+    @property
+    def initialized(self) -> bool:
+        return bool(self.channels)
+
+    def open_channels(self) -> List[PCANChannel]:
+        return list(self.channels.values())
+
+    def _resolve(self, channel: Optional[str]) -> Any:
+        """Return the PCANChannel addressed by name (or the only open one), or an error dict"""
+        if channel:
+            ch = self.channels.get(channel)
+            if ch is None:
+                return {
+                    "success": False,
+                    "error": f"Channel {channel} not initialized"
+                }
+            return ch
+        channels = self.open_channels()
+        if not channels:
+            return {
+                "success": False,
+                "error": "PCAN not initialized"
+            }
+        if len(channels) > 1:
+            return {
+                "success": False,
+                "error": "Several channels are initialized; specify a channel"
+            }
+        return channels[0]
+    
+    def initialize(self, channel: str, baudrate: str, reader_mode: str = "event", fd: bool = False) -> Dict[str, Any]:
+        """Initialize a channel and start its reader thread.
+
+        reader_mode selects how the reader waits for frames: "event" blocks on
+        the driver's receive event (falling back to polling when the driver
+        provides none) and "poll" sleeps READER_POLL_INTERVAL between drains.
+        With fd=True the channel is opened with InitializeFD and baudrate is
+        either a fd_bitrate_map preset or a raw "f_clock=...,nom_brp=..." string.
+        """
+        if not self.pcan_available:
+            return {
+                "success": False,
+                "error": "PCAN hardware not available. Ensure PCANBasic driver is installed and PCAN device is connected."
+            }
+        
+        # Get channel handle from mapping
+        if channel not in self.channel_map:
+            return {
+                "success": False,
+                "error": f"Invalid channel: {channel}"
+            }
+        
+        if fd:
+            if baudrate not in self.fd_bitrate_map and "f_clock" not in baudrate:
+                return {
+                    "success": False,
+                    "error": f"Invalid FD bit rate: {baudrate}"
+                }
+        elif baudrate not in self.baudrate_map:
+            return {
+                "success": False,
+                "error": f"Invalid baudrate: {baudrate}"
+            }
+
+        if reader_mode not in READER_MODES:
+            return {
+                "success": False,
+                "error": f"Invalid reader mode: {reader_mode}"
+            }
+
+        with self.lock:
+            if channel in self.channels:
+                return {
+                    "success": False,
+                    "error": f"Channel {channel} already initialized"
+                }
+            ch = PCANChannel(self, channel, self.channel_map[channel])
+            ch.set_overflow_policy(self.overflow, self.spool_dir, self.spool_mb)
+            result = ch.open(baudrate, reader_mode, fd)
+            if ch.initialized:
+                self.channels[channel] = ch
+                self.health_monitor.start()
+        return result
+    
+    def release(self, channel: Optional[str] = None) -> Dict[str, Any]:
+        if channel:
+            ch = self.channels.get(channel)
+            targets = [ch] if ch is not None else []
+        else:
+            targets = self.open_channels()
+        if not targets:
+            return {
+                "success": False,
+                "error": "PCAN not initialized"
+            }
+        results = []
+        for ch in targets:
+            with self.lock:
+                self.channels.pop(ch.name, None)
+            results.append(ch.close())
+        if not self.channels:
+            # Nothing left to transmit on or watch
+            self.cyclic.remove()
+            self.replay.stop()
+            self.health_monitor.stop()
+        if len(results) == 1:
+            return results[0]
+        errors = [r["error"] for r in results if not r["success"]]
+        if errors:
+            return {
+                "success": False,
+                "error": "; ".join(errors)
+            }
+        return {
+            "success": True,
+            "message": f"Released {len(results)} channels successfully"
+        }
+    
+    def get_status(self, channel: Optional[str] = None) -> Dict[str, Any]:
+        if not self.channels or (channel and channel not in self.channels):
+            return {
+                "status_code": "00001h",
+                "status_text": "Not initialized"
+            }
+        if channel:
+            return self.channels[channel].get_status()
+        statuses = {ch.name: ch.get_status() for ch in self.open_channels()}
+        # Top-level fields describe the first open channel for older clients
+        status = dict(next(iter(statuses.values())))
+        status["channels"] = statuses
+        return status
+    
+    def read_message(self, channel: Optional[str] = None) -> Dict[str, Any]:
+        self._note_http_reader(pop=True)
+        if not self.pcan_available:
+            return {
+                "success": False,
+                "message": "PCAN hardware not available"
+            }
+        if not channel and len(self.channels) > 1:
+            popped = self._pop_merged(self.open_channels(), 1)
+            if not popped:
+                return {"success": True, "message": None}
+            ch, (seq, frame) = popped[0]
+            return {
+                "success": True,
+                "message": ch.to_message(seq, frame)
+            }
+        ch = self._resolve(channel)
+        if isinstance(ch, dict):
+            return {
+                "success": False,
+                "message": ch["error"]
+            }
+        return ch.read_message()
+
+    def set_overflow_policy(self, policy: str, spool_dir: Optional[str] = None,
+                            spool_mb: Optional[float] = None, channel: Optional[str] = None) -> Dict[str, Any]:
+        """Choose between evicting the oldest frame and spilling it to disk when a ring fills.
+
+        Without a channel the policy becomes the default for new channels and
+        is applied to every open one.
+        """
+        if policy not in OVERFLOW_POLICIES:
+            return {
+                "success": False,
+                "error": f"Invalid overflow policy: {policy}"
+            }
+        if channel:
+            ch = self._resolve(channel)
+            if isinstance(ch, dict):
+                return ch
+            targets = [ch]
+        else:
+            self.overflow = policy
+            self.spool_dir = spool_dir
+            self.spool_mb = spool_mb
+            targets = self.open_channels()
+        for ch in targets:
+            ch.set_overflow_policy(policy, spool_dir, spool_mb)
+        return {
+            "success": True,
+            "message": f"Overflow policy set to {policy}"
+        }
+
+    def get_buffer_stats(self, channel: Optional[str] = None) -> Dict[str, Any]:
+        if channel:
+            ch = self._resolve(channel)
+            return ch if isinstance(ch, dict) else ch.get_buffer_stats()
+        return {
+            "overflow": self.overflow,
+            "channels": {ch.name: ch.get_buffer_stats() for ch in self.open_channels()}
+        }
+
+    def set_subscription(self, owner: str, ids: Optional[List[str]] = None,
+                         channel: Optional[str] = None) -> Dict[str, Any]:
+        """Declare which CAN IDs a consumer needs ("100", "100-1FF"); None means all traffic.
+
+        The hardware acceptance filter of every affected channel is
+        reprogrammed to the union of all subscriptions, and opened fully as
+        soon as any subscriber wants everything, nobody subscribes, or a
+        consumer that declares no subscription is attached (a listener added
+        without subscribed=True, or an HTTP reader within HTTP_READER_LEASE).
+        """
         try:
-            # FD timestamp uses .value already in microseconds
-            if hasattr(ts, 'value'):
-                return int(getattr(ts, 'value'))
-            # Classic timestamp fields: micros + 1000*millis + overflow
-            micros = getattr(ts, 'micros', 0)
-            millis = getattr(ts, 'millis', 0)
-            overflow = getattr(ts, 'millis_overflow', 0)
-            return int(micros + (1000 * millis) + (0x100000000 * 1000 * overflow))
-        except Exception:
+            ranges = parse_id_ranges(ids)
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": f"Invalid ID filter: {str(e)}"
+            }
+        with self.filter_lock:
+            self.subscriptions[owner] = (channel, ranges)
+            self._refresh_filters()
+        return {
+            "success": True,
+            "message": f"Subscription {owner} set to {', '.join(format_ranges(ranges)) if ranges else 'all IDs'}"
+        }
+
+    def remove_subscription(self, owner: str) -> Dict[str, Any]:
+        with self.filter_lock:
+            if self.subscriptions.pop(owner, None) is None:
+                return {
+                    "success": False,
+                    "error": f"Unknown subscription: {owner}"
+                }
+            self._refresh_filters()
+        return {
+            "success": True,
+            "message": f"Subscription {owner} removed"
+        }
+
+    def acceptance_ranges(self, channel: str) -> Optional[List[IdRange]]:
+        """Union of the ID ranges subscribed on a channel, or None when it must stay open"""
+        if self.unfiltered_listeners or self._http_reader_active():
+            return None
+        relevant = [ranges for ch, ranges in self.subscriptions.values() if ch is None or ch == channel]
+        if not relevant or any(ranges is None for ranges in relevant):
+            return None
+        return merge_ranges(r for ranges in relevant for r in ranges)
+
+    def get_filters(self) -> Dict[str, Any]:
+        return {
+            "subscriptions": {
+                owner: {"channel": ch, "ids": format_ranges(ranges)}
+                for owner, (ch, ranges) in self.subscriptions.items()
+            },
+            "channels": {
+                ch.name: format_ranges(ch.acceptance) if ch.acceptance is not None else "open"
+                for ch in self.open_channels()
+            }
+        }
+
+    def _refresh_filters(self) -> None:
+        for ch in self.open_channels():
+            ranges = self.acceptance_ranges(ch.name)
+            if ranges != ch.acceptance:
+                ch.apply_filter(ranges)
+
+    def _http_reader_active(self) -> bool:
+        return self.http_read_at is not None and time.monotonic() - self.http_read_at < HTTP_READER_LEASE
+
+    def _pop_reader_active(self) -> bool:
+        return self.pop_read_at is not None and time.monotonic() - self.pop_read_at < HTTP_READER_LEASE
+
+    def _set_drained(self, drained: bool) -> None:
+        for ch in self.open_channels():
+            ch.read_buffer.drained = drained
+
+    def _note_http_reader(self, pop: bool = False) -> None:
+        """Called by every HTTP frame/table read; reopens a narrowed filter at once.
+        pop marks reads that consume the ring, which turns on overflow accounting"""
+        active = self._http_reader_active()
+        now = time.monotonic()
+        self.http_read_at = now
+        if pop:
+            if not self._pop_reader_active():
+                self._set_drained(True)
+            self.pop_read_at = now
+        if not active:
+            with self.filter_lock:
+                self._refresh_filters()
+
+    def get_latest(self, channel: Optional[str] = None, ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Latest frame per CAN ID (optionally limited to IDs/ranges), one row per ID"""
+        self._note_http_reader()
+        if channel:
+            ch = self._resolve(channel)
+            if isinstance(ch, dict):
+                return ch
+            channels = [ch]
+        else:
+            channels = self.open_channels()
+        try:
+            ranges = parse_id_ranges(ids)
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": f"Invalid ID filter: {str(e)}"
+            }
+        rows = []
+        for ch in channels:
+            rows.extend(ch.get_latest(ranges))
+        return {
+            "success": True,
+            "fields": LATEST_FIELDS,
+            "rows": rows
+        }
+
+    def get_stats(self, channel: Optional[str] = None, ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Per-ID rate, period, jitter and DLC statistics, computed incrementally by the readers"""
+        self._note_http_reader()
+        if channel:
+            ch = self._resolve(channel)
+            if isinstance(ch, dict):
+                return ch
+            channels = [ch]
+        else:
+            channels = self.open_channels()
+        try:
+            ranges = parse_id_ranges(ids)
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": f"Invalid ID filter: {str(e)}"
+            }
+        rows = []
+        for ch in channels:
+            rows.extend(ch.get_stats(ranges))
+        return {
+            "success": True,
+            "fields": STATS_FIELDS,
+            "rows": rows
+        }
+
+    def reset_stats(self, channel: Optional[str] = None) -> Dict[str, Any]:
+        channels = [self.channels[channel]] if channel in self.channels else [] if channel else self.open_channels()
+        for ch in channels:
+            ch.id_stats = {}
+        return {
+            "success": True,
+            "message": f"Statistics reset on {len(channels)} channels"
+        }
+
+    def get_health(self, channel: Optional[str] = None, since: Optional[float] = None) -> Dict[str, Any]:
+        """Bus state, error counters and the sampled health time series per channel.
+
+        since (unix time) limits the series to newer samples, for incremental polling.
+        """
+        self._note_http_reader()
+        if channel:
+            ch = self._resolve(channel)
+            if isinstance(ch, dict):
+                return ch
+            channels = [ch]
+        else:
+            channels = self.open_channels()
+        return {
+            "success": True,
+            "fields": HEALTH_FIELDS,
+            "channels": {
+                ch.name: dict(ch.health.summary(), rows=ch.health.history(since))
+                for ch in channels
+            }
+        }
+
+    def _sample_health(self) -> None:
+        for ch in self.open_channels():
+            ch.sample_health()
+        if self.pop_read_at is not None and not self._pop_reader_active():
+            # Nobody pops the ring any more: let it overwrite without loss accounting
+            self.pop_read_at = None
+            self._set_drained(False)
+        if self.http_read_at is not None and not self._http_reader_active():
+            # Last HTTP reader's lease ran out: narrow the filter again
+            self.http_read_at = None
+            with self.filter_lock:
+                self._refresh_filters()
+
+    def add_listener(self, callback: Callable[[str, List[Frame]], None], subscribed: bool = False) -> None:
+        """Register a callback invoked from reader threads with (channel, burst of frames).
+
+        Pass subscribed=True only when the listener declares the IDs it needs
+        with set_subscription; any other listener keeps the acceptance filter open.
+        """
+        with self.filter_lock:
+            if callback not in self.listeners:
+                self.listeners = self.listeners + [callback]
+            if not subscribed and callback not in self.unfiltered_listeners:
+                self.unfiltered_listeners = self.unfiltered_listeners + [callback]
+                self._refresh_filters()
+
+    def remove_listener(self, callback: Callable[[str, List[Frame]], None]) -> None:
+        with self.filter_lock:
+            self.listeners = [cb for cb in self.listeners if cb != callback]
+            if callback in self.unfiltered_listeners:
+                self.unfiltered_listeners = [cb for cb in self.unfiltered_listeners if cb != callback]
+                self._refresh_filters()
+
+    def read_messages(self, max_count: int = 500, max_bytes: int = 262144, timeout: float = 0.0,
+                      channel: Optional[str] = None) -> Dict[str, Any]:
+        """Drain up to max_count buffered frames in one call.
+
+        When the buffer is empty and timeout > 0 the call blocks until the
+        reader thread delivers frames or the timeout expires (long-poll).
+        max_bytes bounds the approximate encoded size of the returned rows;
+        at least one frame is always returned when one is pending. Without a
+        channel, frames of all open channels are merged by hardware timestamp;
+        see the class docstring for why that order only holds per channel
+        across separate adapters.
+        """
+        self._note_http_reader(pop=True)
+        if channel:
+            ch = self._resolve(channel)
+            if isinstance(ch, dict):
+                return ch
+            targets = [ch]
+        else:
+            targets = self.open_channels()
+            if not targets:
+                return {
+                    "success": False,
+                    "error": "PCAN not initialized"
+                }
+
+        if timeout > 0 and not any(ch.read_buffer for ch in targets):
+            with self.buffer_cond:
+                self.buffer_cond.wait_for(
+                    lambda: any(ch.read_buffer or not ch.initialized for ch in targets), timeout)
+
+        rows = []
+        size = 0
+        while len(rows) < max_count and size < max_bytes:
+            # Pop only as many frames as are certain to fit the byte budget so
+            # nothing is removed from the ring and then discarded
+            chunk = max(1, (max_bytes - size) // BATCH_ROW_MAX)
+            popped = self._pop_merged(targets, min(chunk, max_count - len(rows)))
+            if not popped:
+                break
+            for ch, (seq, frame) in popped:
+                row = ch.to_row(frame, seq + 1)
+                rows.append(row)
+                size += BATCH_ROW_OVERHEAD + len(row[4])
+
+        return {
+            "success": True,
+            "fields": BATCH_FIELDS,
+            "rows": rows,
+            "pending": sum(len(ch.read_buffer) for ch in targets)
+        }
+
+    def read_since(self, seq: Optional[int] = None, max_count: int = 500, max_bytes: int = 262144,
+                   timeout: float = 0.0, channel: Optional[str] = None) -> Dict[str, Any]:
+        """Non-destructive read of one channel's frames from sequence number seq on.
+
+        Each client keeps its own cursor: pass the returned next_seq as seq
+        on the following call. Without seq the read starts at the next
+        frame to arrive. gap is the number of frames the client fell behind
+        by, i.e. that were overwritten before this read. Long-polls like
+        read_messages when nothing newer than seq is buffered.
+        """
+        self._note_http_reader()
+        ch = self._resolve(channel)
+        if isinstance(ch, dict):
+            return ch
+        ring = ch.read_buffer
+        if seq is None:
+            seq = ring.next_seq
+        if timeout > 0 and ring.next_seq <= seq:
+            with self.buffer_cond:
+                self.buffer_cond.wait_for(lambda: ring.next_seq > seq or not ch.initialized, timeout)
+
+        # Same byte budget rule as read_messages: never read more than certainly fits
+        frames, next_seq, gap = ring.read_since(seq, min(max_count, max(1, max_bytes // BATCH_ROW_MAX)))
+        ch.cursor_lag = ring.next_seq - next_seq
+        ch.cursor_gaps += gap
+        return {
+            "success": True,
+            "fields": STREAM_FIELDS,
+            "rows": [ch.to_row(frame, s) for s, frame in frames],
+            "next_seq": next_seq,
+            "gap": gap,
+            "pending": ring.next_seq - next_seq
+        }
+
+    def _pop_merged(self, channels: List[PCANChannel], max_count: int) -> List[Any]:
+        """Pop up to max_count (channel, (seq, frame)) pairs across channels by hardware timestamp.
+
+        Each channel's frames keep their order; comparing timestamps of
+        channels on different adapters compares unsynchronised clocks.
+        """
+        if len(channels) == 1:
+            return [(channels[0], f) for f in channels[0].read_buffer.pop_seq(max_count)]
+        out = []
+        while len(out) < max_count:
+            heads = []
+            for ch in channels:
+                timestamp = ch.read_buffer.peek_timestamp()
+                if timestamp is not None:
+                    heads.append((timestamp, ch))
+            if not heads:
+                break
+            heads.sort(key=lambda h: h[0])
+            # Take frames from the oldest channel up to the next channel's head
+            limit = heads[1][0] if len(heads) > 1 else None
+            ch = heads[0][1]
+            out.extend((ch, f) for f in ch.read_buffer.pop_until(limit, max_count - len(out)))
+        return out
+
+    def write_message(self, msg_id: str, data: list, extended: bool = False, rtr: bool = False,
+                      channel: Optional[str] = None, fd: Optional[bool] = None, brs: bool = False) -> Dict[str, Any]:
+        ch = self._resolve(channel)
+        if isinstance(ch, dict):
+            return ch
+        return ch.write_message(msg_id, data, extended, rtr, fd, brs)
+
+
+    def start_cyclic(self, msg_id: str, data: list, period_ms: float, channel: Optional[str] = None,
+                     extended: bool = False, fd: Optional[bool] = None, brs: bool = False,
+                     counter_byte: Optional[int] = None, counter_mask: int = 0xFF,
+                     checksum_byte: Optional[int] = None, checksum: str = "sum",
+                     key: Optional[str] = None) -> Dict[str, Any]:
+        """Transmit a frame every period_ms; an existing message with the same key is replaced.
+
+        counter_byte gets a rolling counter in its counter_mask bits and
+        checksum_byte the sum or xor of all other payload bytes, both
+        refreshed on every transmission.
+        """
+        ch = self._resolve(channel)
+        if isinstance(ch, dict):
+            return ch
+        key = key or f"{ch.name}:{msg_id.upper()}"
+        try:
+            int(msg_id, 16)
+            msg = CyclicMessage(key, msg_id, data, period_ms, ch.name, extended, fd, brs,
+                                counter_byte, counter_mask, checksum_byte, checksum)
+            self.cyclic.add(msg)
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": f"Invalid cyclic message: {str(e)}"
+            }
+        return {
+            "success": True,
+            "message": f"Cyclic message {key} started every {period_ms} ms",
+            "key": key
+        }
+
+    def update_cyclic(self, key: str, **changes: Any) -> Dict[str, Any]:
+        """Change data, period_ms, counter or checksum settings of a running cyclic message"""
+        changes = {k: v for k, v in changes.items() if v is not None}
+        try:
+            msg = self.cyclic.update(key, changes)
+        except KeyError:
+            return {
+                "success": False,
+                "error": f"Unknown cyclic message: {key}"
+            }
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": f"Invalid cyclic message: {str(e)}"
+            }
+        return {
+            "success": True,
+            "message": f"Cyclic message {key} updated",
+            "cyclic": msg.to_dict()
+        }
+
+    def stop_cyclic(self, key: Optional[str] = None) -> Dict[str, Any]:
+        stopped = self.cyclic.remove(key)
+        if key is not None and not stopped:
+            return {
+                "success": False,
+                "error": f"Unknown cyclic message: {key}"
+            }
+        return {
+            "success": True,
+            "message": f"Stopped {len(stopped)} cyclic messages"
+        }
+
+    def get_cyclic(self) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "cyclic": self.cyclic.list()
+        }
+
+    def _send_cyclic(self, msg: CyclicMessage, data: List[int]) -> Dict[str, Any]:
+        ch = self.channels.get(msg.channel)
+        if ch is None:
+            return {
+                "success": False,
+                "error": f"Channel {msg.channel} not initialized"
+            }
+        return ch.write_message(msg.msg_id, data, msg.extended, False, msg.fd, msg.brs)
+
+    def write_batch(self, frames: List[Dict[str, Any]], channel: Optional[str] = None,
+                    stop_on_error: bool = True) -> Dict[str, Any]:
+        """Queue many frames for the channel's writer thread; returns the batch with its id"""
+        ch = self._resolve(channel)
+        if isinstance(ch, dict):
+            return ch
+        return ch.write_batch(frames, stop_on_error)
+
+    def get_tx_batch(self, batch_id: int) -> Optional[TxBatch]:
+        for ch in self.open_channels():
+            batch = ch.tx_queue.get(batch_id)
+            if batch is not None:
+                return batch
+        return None
+
+    def get_virtual(self) -> Dict[str, Any]:
+        if self.backend != "virtual":
+            return {
+                "success": False,
+                "error": "Virtual PCAN backend not enabled (set PCAN_BACKEND=virtual)"
+            }
+        return {
+            "success": True,
+            "virtual": self.pcan.get_config()
+        }
+
+    def configure_virtual(self, **settings: Any) -> Dict[str, Any]:
+        """Change the simulated traffic: load (0..1), ids mix, tpms_id, tpms_tires, tpms_hz"""
+        if self.backend != "virtual":
+            return self.get_virtual()
+        try:
+            self.pcan.configure(**settings)
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": f"Invalid virtual traffic settings: {str(e)}"
+            }
+        return self.get_virtual()
+
+    def start_recording(self, name: Optional[str] = None, compress: bool = True) -> Dict[str, Any]:
+        """Record every received frame to a binary capture file in capture_dir"""
+        with self.lock:
+            if self.recorder is not None:
+                return {
+                    "success": False,
+                    "error": f"Already recording to {os.path.basename(self.recorder.path)}"
+                }
+            name = os.path.basename(name or datetime.now().strftime("capture-%Y%m%d-%H%M%S"))
+            if not name.endswith(CAPTURE_EXTENSION):
+                name += CAPTURE_EXTENSION
             try:
-                return int(ts)
-            except Exception:
-                return 0
+                os.makedirs(self.capture_dir, exist_ok=True)
+                self.recorder = CaptureWriter(os.path.join(self.capture_dir, name), compress)
+            except OSError as e:
+                return {
+                    "success": False,
+                    "error": f"Cannot create capture: {str(e)}"
+                }
+            self.add_listener(self._record)
+        return {
+            "success": True,
+            "message": f"Recording to {name}"
+        }
+
+    def stop_recording(self) -> Dict[str, Any]:
+        with self.lock:
+            recorder = self.recorder
+            if recorder is None:
+                return {
+                    "success": False,
+                    "error": "Not recording"
+                }
+            self.remove_listener(self._record)
+            self.recorder = None
+        recorder.close()
+        return {
+            "success": True,
+            "message": f"Recorded {recorder.frames} frames to {os.path.basename(recorder.path)}",
+            "recording": recorder.stats()
+        }
+
+    def get_recording(self) -> Dict[str, Any]:
+        recorder = self.recorder
+        return {
+            "success": True,
+            "recording": recorder.stats() if recorder is not None else None
+        }
+
+    def list_captures(self) -> Dict[str, Any]:
+        captures = []
+        if os.path.isdir(self.capture_dir):
+            for name in sorted(os.listdir(self.capture_dir)):
+                if not name.endswith(CAPTURE_EXTENSION):
+                    continue
+                try:
+                    with CaptureReader(os.path.join(self.capture_dir, name)) as reader:
+                        captures.append(reader.info())
+                except (OSError, ValueError):
+                    continue
+        return {
+            "success": True,
+            "captures": captures
+        }
+
+    def open_capture(self, name: str) -> CaptureReader:
+        """Open a capture in capture_dir by file name; raises OSError / ValueError"""
+        return CaptureReader(os.path.join(self.capture_dir, os.path.basename(name)))
+
+    def read_capture(self, name: str, offset: int = 0, limit: int = 500) -> Dict[str, Any]:
+        """Page through a capture; rows use the BATCH_FIELDS layout with the frame index as counter"""
+        try:
+            with self.open_capture(name) as reader:
+                frames = reader.read(offset, limit)
+                total = len(reader)
+        except (OSError, ValueError) as e:
+            return {
+                "success": False,
+                "error": f"Cannot read capture: {str(e)}"
+            }
+        rows = []
+        for i, (frame, channel) in enumerate(frames):
+            timestamp, can_id, msg_type, dlc, length, data = frame
+            rows.append([offset + i, f"{can_id:03X}", msg_type_label(msg_type), length,
+                         data[:length].hex().upper(), timestamp, channel])
+        return {
+            "success": True,
+            "fields": BATCH_FIELDS,
+            "rows": rows,
+            "total": total
+        }
+
+    def get_dbc(self) -> Dict[str, Any]:
+        """Loaded DBC files with their messages and signal definitions"""
+        return {
+            "success": True,
+            "dir": os.path.abspath(self.dbc_dir),
+            "files": self.dbc.describe(),
+            "errors": dict(self.dbc_errors)
+        }
+
+    def load_dbc(self, name: str, content: Optional[str] = None) -> Dict[str, Any]:
+        """Compile a DBC file from dbc_dir, or save content under name there first and compile it"""
+        name = os.path.basename(name)
+        if not name.lower().endswith(DBC_EXTENSION):
+            name += DBC_EXTENSION
+        path = os.path.join(self.dbc_dir, name)
+        try:
+            if content is not None:
+                # Compile before saving so a broken upload never replaces a working file
+                decoders = self.dbc.load_text(name, content)
+                os.makedirs(self.dbc_dir, exist_ok=True)
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+            else:
+                decoders = self.dbc.load_file(path)
+        except (OSError, DBCError) as e:
+            return {
+                "success": False,
+                "error": f"Cannot load {name}: {str(e)}"
+            }
+        self.dbc_errors.pop(name, None)
+        return {
+            "success": True,
+            "message": f"Loaded {len(decoders)} messages from {name}",
+            "messages": [d.to_dict() for d in decoders]
+        }
+
+    def unload_dbc(self, name: str) -> Dict[str, Any]:
+        """Stop decoding with a DBC file; the file itself stays in dbc_dir"""
+        if not self.dbc.unload(os.path.basename(name)):
+            return {
+                "success": False,
+                "error": f"DBC {name} not loaded"
+            }
+        return {
+            "success": True,
+            "message": f"Unloaded {name}"
+        }
+
+    def _record(self, channel: str, frames: List[Frame]) -> None:
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.append(frames, channel)
+
+    def start_replay(self, source: str, target: str = "bus", channel: Optional[str] = None,
+                     speed: float = 1.0, loop: bool = False) -> Dict[str, Any]:
+        """Replay a capture (by name in capture_dir) or "data.json" with its original timing.
+
+        target "bus" transmits the frames on the channel; "inject" feeds them
+        into the channel's receive path (ring, stream, recorder) instead.
+        speed scales time (2 = twice as fast); 0 replays as fast as possible.
+        """
+        if target not in REPLAY_TARGETS:
+            return {
+                "success": False,
+                "error": f"Invalid replay target: {target} (expected one of {', '.join(REPLAY_TARGETS)})"
+            }
+        ch = self._resolve(channel)
+        if isinstance(ch, dict):
+            return ch
+        try:
+            if source == "data.json":
+                trace = load_json_trace(os.path.join(root_dir, "data.json"))
+                frames = lambda: trace
+                total = len(trace)
+            else:
+                with self.open_capture(source) as reader:
+                    total = len(reader)
+                frames = lambda: self._capture_frames(source)
+            sink = self._replay_sink(ch, target)
+            self.replay.start(frames, sink, source, target, ch.name, speed, loop, total)
+        except (OSError, ValueError, RuntimeError) as e:
+            return {
+                "success": False,
+                "error": f"Cannot start replay: {str(e)}"
+            }
+        return {
+            "success": True,
+            "message": f"Replaying {total} frames from {source} to {ch.name} ({target})"
+        }
+
+    def stop_replay(self) -> Dict[str, Any]:
+        if not self.replay.stop():
+            return {
+                "success": False,
+                "error": "No replay running"
+            }
+        return {
+            "success": True,
+            "message": "Replay stopped",
+            "replay": self.replay.status()
+        }
+
+    def get_replay(self) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "replay": self.replay.status()
+        }
+
+    def _capture_frames(self, name: str) -> Iterator[Frame]:
+        with self.open_capture(name) as reader:
+            for frame, channel in reader:
+                yield frame
+
+    def _replay_sink(self, ch: PCANChannel, target: str) -> Callable[[Frame], Optional[str]]:
+        if target == "inject":
+            def inject(frame: Frame) -> Optional[str]:
+                # Restamp with the host clock so the frame looks freshly received
+                ch.inject_frames([(int(time.monotonic() * 1000000),) + frame[1:]])
+                return None
+            return inject
+
+        msg = ch.new_tx_msg()
+
+        def transmit(frame: Frame) -> Optional[str]:
+            timestamp, can_id, msg_type, dlc, length, data = frame
+            if msg_type & (MSGTYPE_STATUS | MSGTYPE_ERRFRAME):
+                return None
+            msg_type &= MSGTYPE_EXTENDED | MSGTYPE_RTR | MSGTYPE_FD | MSGTYPE_BRS
+            result = ch.write_frame(msg, can_id, msg_type, data[:length])
+            delay = TX_BACKOFF_START
+            while result == PCAN_ERROR_XMTFULL and delay <= TX_BACKOFF_MAX:
+                time.sleep(delay)
+                delay *= 2
+                result = ch.write_frame(msg, can_id, msg_type, data[:length])
+            return None if result == PCAN_ERROR_OK else ch.error_text(result)
+        return transmit
+
+def _env_number(name: str, cast: Callable[[str], Any]) -> Any:
+    value = os.environ.get(name)
+    return cast(value) if value else None
 
-pcan_service = PCANService()
+# Ring size can be set in frames (PCAN_BUFFER_FRAMES) or megabytes (PCAN_BUFFER_MB);
+# PCAN_OVERFLOW=spill enables the disk spool (PCAN_SPOOL_DIR, PCAN_SPOOL_MB);
+# PCAN_BACKEND=virtual runs against the simulated bus (PCAN_VIRTUAL_* settings);
+# .dbc files in PCAN_DBC_DIR (default backend/dbc) are loaded at startup
+pcan_service = PCANService(
+    buffer_frames=_env_number("PCAN_BUFFER_FRAMES", int),
+    buffer_mb=_env_number("PCAN_BUFFER_MB", float),
+    overflow=os.environ.get("PCAN_OVERFLOW", "evict"),
+    spool_dir=os.environ.get("PCAN_SPOOL_DIR"),
+    spool_mb=_env_number("PCAN_SPOOL_MB", float),
+    backend=os.environ.get("PCAN_BACKEND", "hardware"),
+    capture_dir=os.environ.get("PCAN_CAPTURE_DIR"),
+    dbc_dir=os.environ.get("PCAN_DBC_DIR")
+)
@@ -0,0 +1,83 @@
+from typing import Optional, Any
+import platform
+import select
+
+try:
+    from PCANBasic import PCAN_RECEIVE_EVENT, PCAN_ERROR_OK
+except (ImportError, Exception):
+    PCAN_RECEIVE_EVENT = None
+    PCAN_ERROR_OK = 0
+
+WAIT_OBJECT_0 = 0
+
+
+class ReceiveEvent:
+    """Blocks until a PCAN channel signals that its receive queue has data.
+
+    On Linux/macOS PCAN-Basic exposes the receive event as a pollable file
+    descriptor (GetValue(PCAN_RECEIVE_EVENT)); on Windows an auto-reset
+    event handle is created and registered with SetValue. open() returns
+    None when the driver does not support either, so callers can fall back
+    to sleep polling.
+    """
+    def __init__(self, pcan: Any, channel: Any):
+        self.pcan = pcan
+        self.channel = channel
+        self.poller = None
+        self.handle = None
+        self.kernel32 = None
+
+    @classmethod
+    def open(cls, pcan: Any, channel: Any) -> Optional["ReceiveEvent"]:
+        if PCAN_RECEIVE_EVENT is None:
+            return None
+        event = cls(pcan, channel)
+        try:
+            if platform.system() == 'Windows':
+                ok = event._open_windows()
+            else:
+                ok = event._open_fd()
+        except Exception:
+            ok = False
+        if not ok:
+            event.close()
+            return None
+        return event
+
+    def _open_fd(self) -> bool:
+        res = self.pcan.GetValue(self.channel, PCAN_RECEIVE_EVENT)
+        if res[0] != PCAN_ERROR_OK or res[1] <= 0 or not hasattr(select, 'poll'):
+            return False
+        self.poller = select.poll()
+        self.poller.register(res[1], select.POLLIN)
+        return True
+
+    def _open_windows(self) -> bool:
+        import ctypes
+        self.kernel32 = ctypes.windll.kernel32
+        self.handle = self.kernel32.CreateEventW(None, False, False, None)
+        if not self.handle:
+            return False
+        return self.pcan.SetValue(self.channel, PCAN_RECEIVE_EVENT, self.handle) == PCAN_ERROR_OK
+
+    def wait(self, timeout: float) -> bool:
+        """Wait up to timeout seconds; True when the channel signalled new data"""
+        ms = int(timeout * 1000)
+        if self.poller is not None:
+            return bool(self.poller.poll(ms))
+        if self.handle is not None:
+            return self.kernel32.WaitForSingleObject(self.handle, ms) == WAIT_OBJECT_0
+        return False
+
+    def close(self) -> None:
+        self.poller = None
+        if self.handle is not None:
+            try:
+                self.pcan.SetValue(self.channel, PCAN_RECEIVE_EVENT, 0)
+            except Exception:
+                pass
+            try:
+                self.kernel32.CloseHandle(self.handle)
+            except Exception:
+                pass
+            self.handle = None
@@ -0,0 +1,212 @@
+from typing import Optional, Dict, Any, List, Iterator, Iterable, Callable
+from datetime import datetime
+import json
+import threading
+import time
+
+from app.services.frame_ring import Frame, MSGTYPE_EXTENDED, MSGTYPE_FD, len_to_dlc
+
+REPLAY_TARGETS = ("bus", "inject")
+# The replay thread sleeps until this close to the next deadline, then
+# sends every frame that has come due in one pass
+REPLAY_SLEEP_MARGIN = 0.0005
+# Frames sent between checks for a stop request when running flat out
+REPLAY_CHUNK = 256
+
+
+def _parse_timestamp(value: Any) -> Optional[int]:
+    """Microseconds from a numeric timestamp (already in us) or an ISO 8601 string"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str) and value:
+        try:
+            return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000000)
+        except ValueError:
+            return None
+    return None
+
+
+def _parse_data(value: Any) -> Optional[bytes]:
+    if isinstance(value, list):
+        return bytes(value)
+    if isinstance(value, str):
+        # Console format "01 0A FF"; the batch format has no separators
+        text = value.replace(" ", "")
+        return bytes.fromhex(text)
+    return None
+
+
+def load_json_trace(path: str) -> List[Frame]:
+    """Frames from a data.json file written by /api/save-data.
+
+    Entries without a usable id, data or timestamp (e.g. decoded TPMS
+    lines) are skipped; entries missing only a timestamp reuse the
+    previous one.
+    """
+    with open(path, 'r') as f:
+        saved = json.load(f)
+    messages = saved.get("messages", []) if isinstance(saved, dict) else saved
+    frames: List[Frame] = []
+    last_ts = 0
+    for message in messages:
+        if not isinstance(message, dict):
+            continue
+        try:
+            can_id = int(str(message.get("id", "")), 16)
+            data = _parse_data(message.get("data"))
+        except ValueError:
+            continue
+        if data is None:
+            continue
+        timestamp = _parse_timestamp(message.get("timestamp"))
+        last_ts = timestamp if timestamp is not None else last_ts
+        msg_type = MSGTYPE_EXTENDED if can_id > 0x7FF else 0
+        data = data[:64]
+        if len(data) > 8:
+            msg_type |= MSGTYPE_FD
+        frames.append((last_ts, can_id, msg_type, len_to_dlc(len(data)), len(data), data))
+    frames.sort(key=lambda f: f[0])
+    return frames
+
+
+class ReplayEngine:
+    """Re-emits a recorded trace with its original inter-frame timing.
+
+    Every frame gets a deadline of start + (timestamp - first timestamp) /
+    speed on the monotonic clock. The thread sleeps only until the next
+    deadline and then sends all frames already due in one pass, so a
+    late wake-up is caught up immediately instead of accumulating drift,
+    and full bus load costs a handful of wake-ups per millisecond rather
+    than one sleep per frame. speed=0 sends as fast as the sink accepts.
+    """
+    def __init__(self):
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.state = "idle"
+        self.reset()
+
+    def reset(self) -> None:
+        self.source = None
+        self.target = None
+        self.channel = None
+        self.speed = 1.0
+        self.loop = False
+        self.total: Optional[int] = None
+        self.sent = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.passes = 0
+        self.late_max = 0.0
+        self.late_sum = 0.0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, frames: Callable[[], Iterable[Frame]], sink: Callable[[Frame], Optional[str]],
+              source: str, target: str, channel: str, speed: float = 1.0, loop: bool = False,
+              total: Optional[int] = None) -> None:
+        """Replay the frames produced by frames() through sink, which returns an error text or None"""
+        if speed < 0:
+            raise ValueError("speed must be 0 (as fast as possible) or positive")
+        with self.lock:
+            if self.running:
+                raise RuntimeError("A replay is already running")
+            self.reset()
+            self.source = source
+            self.target = target
+            self.channel = channel
+            self.speed = speed
+            self.loop = loop
+            self.total = total
+            self.state = "running"
+            self.stop_event.clear()
+            self.started_at = time.monotonic()
+            self.thread = threading.Thread(target=self._run, args=(frames, sink), name="pcan-replay", daemon=True)
+            self.thread.start()
+
+    def stop(self) -> bool:
+        with self.lock:
+            if not self.running:
+                return False
+            self.stop_event.set()
+            thread = self.thread
+        thread.join(timeout=2.0)
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            "state": self.state,
+            "source": self.source,
+            "target": self.target,
+            "channel": self.channel,
+            "speed": self.speed,
+            "loop": self.loop,
+            "total": self.total,
+            "sent": self.sent,
+            "passes": self.passes,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            # How far behind its deadline each frame went out
+            "late_mean_us": round(self.late_sum / (self.sent + self.errors) * 1e6, 1) if self.speed and self.sent + self.errors else None,
+            "late_max_us": round(self.late_max * 1e6, 1),
+            "elapsed_s": round(elapsed, 3) if elapsed is not None else None
+        }
+
+    def _run(self, frames: Callable[[], Iterable[Frame]], sink: Callable[[Frame], Optional[str]]) -> None:
+        try:
+            while not self.stop_event.is_set():
+                self._replay_once(iter(frames()), sink)
+                self.passes += 1
+                if not self.loop:
+                    break
+            self.state = "stopped" if self.stop_event.is_set() else "done"
+        except Exception as e:
+            self.state = "failed"
+            self.last_error = str(e)
+        finally:
+            self.finished_at = time.monotonic()
+
+    def _replay_once(self, frames: Iterator[Frame], sink: Callable[[Frame], Optional[str]]) -> None:
+        speed = self.speed
+        start = time.monotonic()
+        first_ts: Optional[int] = None
+        stop = self.stop_event
+        sent_in_chunk = 0
+        for frame in frames:
+            if first_ts is None:
+                first_ts = frame[0]
+            if speed:
+                deadline = start + (frame[0] - first_ts) / 1e6 / speed
+                now = time.monotonic()
+                if now < deadline:
+                    if deadline - now > REPLAY_SLEEP_MARGIN and stop.wait(deadline - now - REPLAY_SLEEP_MARGIN):
+                        return
+                    while time.monotonic() < deadline:
+                        pass
+                elif sent_in_chunk >= REPLAY_CHUNK:
+                    sent_in_chunk = 0
+                    if stop.is_set():
+                        return
+            elif sent_in_chunk >= REPLAY_CHUNK:
+                sent_in_chunk = 0
+                if stop.is_set():
+                    return
+            if speed:
+                late = time.monotonic() - deadline
+                self.late_sum += late
+                if late > self.late_max:
+                    self.late_max = late
+            error = sink(frame)
+            sent_in_chunk += 1
+            if error is None:
+                self.sent += 1
+            else:
+                self.errors += 1
+                self.last_error = error
@@ -0,0 +1,218 @@
+from typing import Optional, Dict, Any, List, Tuple
+from collections import deque
+import copy
+import math
+import threading
+
+# Alarm levels in order of severity
+ALARM_LEVELS = ("ok", "warning", "critical")
+OK, WARNING, CRITICAL = range(3)
+# Alarm transitions kept for the API
+ALARM_EVENTS = 1000
+
+# Defaults match the thresholds the dashboard used: pressure < 20 / > 120
+# critical, < 30 / > 100 warning; temperature > 80 critical, > 60 warning;
+# battery < 2.5 critical, < 3 warning. A level only clears once the value
+# is back past its threshold by the hysteresis margin.
+DEFAULT_ALARM_RULES: Dict[str, Any] = {
+    "thresholds": {
+        "pressure": {"low": {"warning": 30, "critical": 20}, "high": {"warning": 100, "critical": 120},
+                     "hysteresis": 2},
+        "temperature": {"high": {"warning": 60, "critical": 80}, "hysteresis": 2},
+        "battery": {"low": {"warning": 3.0, "critical": 2.5}, "hysteresis": 0.05}
+    },
+    # Pressure loss in psi per minute, smoothed over window seconds
+    "pressure_drop": {"warning": 2.0, "critical": 5.0, "window": 60.0, "hysteresis": 0.5}
+}
+
+METRIC_INDEX = {"pressure": 0, "temperature": 1, "battery": 2}
+
+
+class LevelRule:
+    """One direction of a threshold with hysteresis, e.g. pressure_low.
+
+    The level rises as soon as the value crosses a threshold, but only
+    falls once the value has moved hysteresis past it, so a reading that
+    hovers on a threshold does not flap the alarm.
+    """
+    __slots__ = ("name", "metric", "index", "low", "warning", "critical", "hysteresis")
+
+    def __init__(self, name: str, metric: str, low: bool, warning: Optional[float],
+                 critical: Optional[float], hysteresis: float):
+        self.name = name
+        self.metric = metric
+        self.index = METRIC_INDEX.get(metric, 0)
+        self.low = low
+        self.warning = warning
+        self.critical = critical
+        self.hysteresis = hysteresis
+
+    def _level(self, value: float, margin: float) -> int:
+        if self.low:
+            if self.critical is not None and value < self.critical + margin:
+                return CRITICAL
+            if self.warning is not None and value < self.warning + margin:
+                return WARNING
+        else:
+            if self.critical is not None and value > self.critical - margin:
+                return CRITICAL
+            if self.warning is not None and value > self.warning - margin:
+                return WARNING
+        return OK
+
+    def evaluate(self, value: float, level: int) -> int:
+        raw = self._level(value, 0)
+        if raw >= level:
+            return raw
+        return min(level, self._level(value, self.hysteresis))
+
+    def threshold(self, level: int) -> Optional[float]:
+        return self.critical if level == CRITICAL else self.warning
+
+
+def compile_rules(rules: Dict[str, Any]) -> Tuple[List[LevelRule], Optional[LevelRule], float]:
+    """Threshold rules, the pressure-drop rule and its window from a rules dict; raises ValueError"""
+    level_rules = []
+    for metric, spec in (rules.get("thresholds") or {}).items():
+        if metric not in METRIC_INDEX:
+            raise ValueError(f"Unknown metric: {metric}")
+        hysteresis = float(spec.get("hysteresis", 0))
+        if hysteresis < 0:
+            raise ValueError(f"{metric}: hysteresis must not be negative")
+        for direction in ("low", "high"):
+            bounds = spec.get(direction)
+            if not bounds:
+                continue
+            warning, critical = bounds.get("warning"), bounds.get("critical")
+            warning = float(warning) if warning is not None else None
+            critical = float(critical) if critical is not None else None
+            if warning is not None and critical is not None and (
+                    critical > warning if direction == "low" else critical < warning):
+                raise ValueError(f"{metric} {direction}: critical must lie beyond warning")
+            level_rules.append(LevelRule(f"{metric}_{direction}", metric, direction == "low",
+                                         warning, critical, hysteresis))
+    drop = rules.get("pressure_drop")
+    drop_rule, window = None, 60.0
+    if drop:
+        window = float(drop.get("window", 60.0))
+        if window <= 0:
+            raise ValueError("pressure_drop: window must be positive")
+        # A drop rate is a "high" rule on psi lost per minute
+        drop_rule = LevelRule(
+            "pressure_drop", "pressure", False,
+            float(drop["warning"]) if drop.get("warning") is not None else None,
+            float(drop["critical"]) if drop.get("critical") is not None else None,
+            float(drop.get("hysteresis", 0))
+        )
+    return level_rules, drop_rule, window
+
+
+class TireAlarms:
+    """Alarm levels of one tire plus the running pressure-drop estimate"""
+    __slots__ = ("levels", "last_time", "last_pressure", "drop_rate")
+
+    def __init__(self):
+        self.levels: Dict[str, int] = {}
+        self.last_time: Optional[float] = None
+        self.last_pressure: Optional[float] = None
+        self.drop_rate = 0.0
+
+    @property
+    def worst(self) -> int:
+        return max(self.levels.values(), default=OK)
+
+
+class AlarmEngine:
+    """Evaluates alarm rules on each reading as it is decoded.
+
+    Work per reading is constant: every rule compares the new value with
+    the tire's current level, and the pressure-drop rate is an
+    exponentially weighted average of the per-reading slope (time constant
+    = window), so no history is rescanned however long a vehicle has been
+    monitored. Level changes are returned and kept as transition events.
+    """
+    def __init__(self, rules: Optional[Dict[str, Any]] = None, max_events: int = ALARM_EVENTS):
+        self.lock = threading.Lock()
+        self.events: deque = deque(maxlen=max_events)
+        self.tires: Dict[Tuple[str, int], TireAlarms] = {}
+        self.event_count = 0
+        self.configure(rules or DEFAULT_ALARM_RULES)
+
+    def configure(self, rules: Dict[str, Any]) -> None:
+        """Replace the rules; raises ValueError. Current levels are kept and re-evaluated on the next reading"""
+        try:
+            compiled = compile_rules(rules)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid alarm rules: {str(e)}")
+        with self.lock:
+            self.rules = copy.deepcopy(rules)
+            self.level_rules, self.drop_rule, self.drop_window = compiled
+
+    def reset(self) -> None:
+        with self.lock:
+            self.tires.clear()
+            self.events.clear()
+
+    def evaluate(self, vehicle: str, tire: int, t: float, pressure: float, temperature: float,
+                 battery: float) -> List[Dict[str, Any]]:
+        """Update one tire's alarms with a reading; returns the transitions it caused"""
+        values = (pressure, temperature, battery)
+        transitions = []
+        with self.lock:
+            state = self.tires.get((vehicle, tire))
+            if state is None:
+                state = self.tires[(vehicle, tire)] = TireAlarms()
+            levels = state.levels
+            for rule in self.level_rules:
+                self._apply(rule, values[rule.index], state, levels, vehicle, tire, t, transitions)
+            if self.drop_rule is not None:
+                if state.last_time is not None and t > state.last_time:
+                    dt = t - state.last_time
+                    slope = (state.last_pressure - pressure) / dt * 60.0
+                    alpha = 1.0 - math.exp(-dt / self.drop_window)
+                    state.drop_rate += alpha * (slope - state.drop_rate)
+                state.last_time = t
+                state.last_pressure = pressure
+                self._apply(self.drop_rule, state.drop_rate, state, levels, vehicle, tire, t, transitions)
+        return transitions
+
+    def _apply(self, rule: LevelRule, value: float, state: TireAlarms, levels: Dict[str, int],
+               vehicle: str, tire: int, t: float, transitions: List[Dict[str, Any]]) -> None:
+        level = levels.get(rule.name, OK)
+        new = rule.evaluate(value, level)
+        if new == level:
+            return
+        levels[rule.name] = new
+        event = {
+            "time": round(t, 3),
+            "vehicle": vehicle,
+            "tire": tire,
+            "rule": rule.name,
+            "metric": rule.metric,
+            "from": ALARM_LEVELS[level],
+            "to": ALARM_LEVELS[new],
+            "value": round(value, 3),
+            "threshold": rule.threshold(max(new, level))
+        }
+        self.events.append(event)
+        self.event_count += 1
+        transitions.append(event)
+
+    def tire_level(self, vehicle: str, tire: int) -> str:
+        state = self.tires.get((vehicle, tire))
+        return ALARM_LEVELS[state.worst] if state is not None else "ok"
+
+    def active(self) -> List[Dict[str, Any]]:
+        """Every rule currently above ok, worst first"""
+        with self.lock:
+            active = [
+                {"vehicle": vehicle, "tire": tire, "rule": rule, "level": ALARM_LEVELS[level]}
+                for (vehicle, tire), state in self.tires.items()
+                for rule, level in state.levels.items() if level > OK
+            ]
+        active.sort(key=lambda a: (-ALARM_LEVELS.index(a["level"]), a["vehicle"], a["tire"], a["rule"]))
+        return active
+
+    def recent(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [e for e in self.events if since is None or e["time"] > since]
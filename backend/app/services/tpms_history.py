@@ -0,0 +1,140 @@
+from typing import Optional, Dict, Any, List, Tuple
+import threading
+
+import numpy as np
+
+# Metrics kept per tire, in column order
+TPMS_METRICS = ("pressure", "temperature", "battery")
+# Readings kept per tire: 10 hours at one report per second
+HISTORY_POINTS = 36000
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+DEFAULT_CHART_POINTS = 500
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; in between, every bucket
+    contributes the point forming the largest triangle with the point kept
+    from the previous bucket and the average of the next bucket, which
+    preserves peaks and the overall shape far better than striding.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    kept = np.empty(points, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i + 2 < len(edges):
+            next_lo, next_hi = hi, max(edges[i + 2], hi + 1)
+            avg_x = x[next_lo:next_hi].mean()
+            avg_y = y[next_lo:next_hi].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def minmax(y: np.ndarray, points: int) -> np.ndarray:
+    """Indices of the minimum and maximum of points/2 equal buckets, in order;
+    cheaper than LTTB and never hides a spike"""
+    n = len(y)
+    buckets = points // 2
+    if points >= n or buckets < 1:
+        return np.arange(n)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    kept = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi <= lo:
+            continue
+        chunk = y[lo:hi]
+        first, second = sorted((lo + int(np.argmin(chunk)), lo + int(np.argmax(chunk))))
+        kept.append(first)
+        if second != first:
+            kept.append(second)
+    return np.asarray(kept, dtype=np.int64)
+
+
+class SeriesRing:
+    """Fixed-capacity time series of one tire: unix times plus one float64
+    column per metric in preallocated arrays, oldest overwritten first"""
+    def __init__(self, capacity: int = HISTORY_POINTS):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.values = np.zeros((len(TPMS_METRICS), capacity))
+        self.next = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, t: float, values: Tuple[float, ...]) -> None:
+        i = self.next
+        self.times[i] = t
+        self.values[:, i] = values
+        self.next = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def window(self, start: Optional[float] = None, end: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of the times and metric columns in [start, end], oldest first"""
+        if self.count < self.capacity:
+            times = self.times[:self.count].copy()
+            values = self.values[:, :self.count].copy()
+        else:
+            order = np.r_[self.next:self.capacity, 0:self.next]
+            times = self.times[order]
+            values = self.values[:, order]
+        lo = 0 if start is None else int(np.searchsorted(times, start, 'left'))
+        hi = len(times) if end is None else int(np.searchsorted(times, end, 'right'))
+        return times[lo:hi], values[:, lo:hi]
+
+
+class TPMSHistory:
+    """Bounded per-tire reading history with downsampled chart queries"""
+    def __init__(self, capacity: int = HISTORY_POINTS):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.series: Dict[int, SeriesRing] = {}
+
+    def record(self, tire: int, t: float, pressure: float, temperature: float, battery: float) -> None:
+        with self.lock:
+            series = self.series.get(tire)
+            if series is None:
+                series = self.series[tire] = SeriesRing(self.capacity)
+            series.append(t, (pressure, temperature, battery))
+
+    def clear(self) -> None:
+        with self.lock:
+            self.series.clear()
+
+    def query(self, metrics: List[str], tires: Optional[List[int]] = None, start: Optional[float] = None,
+              end: Optional[float] = None, points: int = DEFAULT_CHART_POINTS,
+              method: str = "lttb") -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """metric -> tire -> {"t", "v", "total"}, each series downsampled to at most points"""
+        with self.lock:
+            windows = {
+                tire: series.window(start, end)
+                for tire, series in self.series.items()
+                if tires is None or tire in tires
+            }
+        result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for metric in metrics:
+            column = TPMS_METRICS.index(metric)
+            per_tire = result[metric] = {}
+            for tire in sorted(windows):
+                times, values = windows[tire]
+                y = values[column]
+                kept = lttb(times, y, points) if method == "lttb" else minmax(y, points)
+                per_tire[str(tire)] = {
+                    "t": np.round(times[kept], 3).tolist(),
+                    "v": np.round(y[kept], 3).tolist(),
+                    "total": len(times)
+                }
+        return result
@@ -1,37 +1,444 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Set, Tuple
+from collections import deque
+import asyncio
+import os
+import sqlite3
+import threading
+import time
 
-class TPMSService:
+from app.services.pcan_service import PCANService, pcan_service
+from app.services.frame_ring import Frame, MSGTYPE_RTR
+from app.services.bus_health import BUS_EVENT_TYPES
+from app.services.dbc import frame_key, DBC_EXTENDED_FLAG
+from app.services.id_filter import MAX_STANDARD_ID
+from app.services.tpms_history import TPMSHistory, TPMS_METRICS, DOWNSAMPLE_METHODS, DEFAULT_CHART_POINTS
+from app.services.tpms_store import TPMSStore, READING_FIELDS, BUCKET_FIELDS
+from app.services.tpms_alarms import AlarmEngine, ALARM_EVENTS
+
+# DBC message of the TPMS receiver's sensor reports (backend/dbc/tpms.dbc);
+# its ID is watched unless start names another one
+TPMS_MESSAGE = "TPMS_Status"
+TPMS_SIGNALS = ("Sensor", "PacketType", "Pressure", "Temperature", "Battery")
+# Vehicle name readings are stored under unless start names one
+TPMS_DEFAULT_VEHICLE = "default"
+# Window of reading queries that give no start
+READINGS_DEFAULT_SPAN = 86400.0
+# Owner of the acceptance filter subscription held while collecting
+TPMS_SUBSCRIPTION = "tpms"
+
+
+class TPMSSubscriber:
+    """One pushed-state consumer: the latest state of every tire changed since
+    its last send, plus the alarm transitions raised meanwhile"""
     def __init__(self):
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        self.alarms: deque = deque(maxlen=ALARM_EVENTS)
+        self.event = asyncio.Event()
+
+    async def next_changes(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Wait for tire changes or alarms; a slow client gets each tire's newest state, never a backlog"""
+        await self.event.wait()
+        self.event.clear()
+        pending, self.pending = self.pending, {}
+        alarms = list(self.alarms)
+        self.alarms.clear()
+        return [pending[tire] for tire in sorted(pending)], alarms
+
+
+class TPMSService:
+    """Decodes TPMS reports straight from the PCAN reader and keeps per-tire state.
+
+    While collecting, the service is a PCANService listener: reports on the
+    watched ID are decoded in the reader thread with the loaded DBC's
+    TPMS_Status message, so editing or uploading the DBC changes how
+    reports are read (and, unless start named an ID, which ID is watched).
+    Tires whose values
+    changed are handed to the event loop, where every subscriber's pending
+    map is updated. Dashboards get the state pushed instead of each one
+    polling and decoding the raw bus.
+    """
+    def __init__(self, pcan: PCANService, store_path: Optional[str] = None):
+        self.pcan = pcan
         self.is_collecting = False
         self.tire_count = 0
         self.axle_config = []
-    
-    def start_collection(self, tire_count: int, axle_config: list[int] | None = None) -> Dict[str, Any]:
-        self.is_collecting = True
-        self.tire_count = tire_count
-        self.axle_config = axle_config or []
+        # ID given to start (None follows the DBC) and the frame key watched
+        self.requested_id: Optional[int] = None
+        self.can_id: Optional[int] = None
+        self.watch_key: Optional[int] = None
+        self.channel: Optional[str] = None
+        self.lock = threading.Lock()
+        self.tires: Dict[int, Dict[str, Any]] = {}
+        self.frames = 0
+        self.ignored = 0
+        self.history = TPMSHistory()
+        # Durable readings, opened on first use
+        self.vehicle = TPMS_DEFAULT_VEHICLE
+        self.store_path = store_path or os.path.join(
+            os.path.dirname(__file__), '..', '..', '..', 'tpms.sqlite3')
+        self.store: Optional[TPMSStore] = None
+        # Why the store could not be opened; collection then runs without it
+        self.store_error: Optional[str] = None
+        self.alarms = AlarmEngine()
+        self.subscribers: Set[TPMSSubscriber] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        pcan.dbc.on_change.append(self._dbc_changed)
+
+    def start_collection(self, tire_count: int, axle_config: list[int] | None = None,
+                         can_id: Optional[int] = None, channel: Optional[str] = None,
+                         vehicle: Optional[str] = None) -> Dict[str, Any]:
+        """Start collecting; a repeated start with the running configuration changes
+        nothing, so a dashboard joining a running collection resets no other client's state"""
+        axle_config = axle_config or []
+        vehicle = vehicle or TPMS_DEFAULT_VEHICLE
+        if self.is_collecting and (tire_count, axle_config, can_id, channel, vehicle) == self._config():
+            return {
+                "success": True,
+                "message": f"TPMS collection already running with {tire_count} tires on ID {self.can_id:03X}",
+                "is_collecting": True,
+                "tire_count": self.tire_count,
+                "axle_config": self.axle_config
+            }
+        if self.pcan.dbc.find(TPMS_MESSAGE) is None:
+            return {
+                "success": False,
+                "error": f"No {TPMS_MESSAGE} message in the loaded DBC files"
+            }
+        store = self._open_store()
+        if isinstance(store, dict):
+            # Live readings, history and alarms do not need the database
+            self.store_error = store["error"]
+            print(f"TPMS collection runs without storing readings: {self.store_error}")
+        else:
+            store.start()
+        # History and alarm state belong to a session: they survive stop/start
+        # unless the configuration changes
+        new_session = (tire_count, axle_config, can_id, channel, vehicle) != self._config()
+        with self.lock:
+            self.is_collecting = True
+            self.tire_count = tire_count
+            self.axle_config = axle_config
+            self.requested_id = can_id
+            self.channel = channel
+            self.vehicle = vehicle
+            self.frames = 0
+            self.ignored = 0
+            if new_session:
+                self.history.clear()
+                self.alarms.reset()
+            self.tires = {tire: self._initial_state(tire) for tire in range(1, tire_count + 1)}
+            for tire, state in self.tires.items():
+                state["alarm"] = self.alarms.tire_level(vehicle, tire)
+        self._watch()
+        self.pcan.add_listener(self._on_frames, subscribed=True)
+        self._push(list(self.tires.values()))
+        message = f"TPMS collection started with {tire_count} tires on ID {self.can_id:03X}"
+        if self.store_error is not None:
+            message += f"; readings are not stored ({self.store_error})"
         return {
             "success": True,
-            "message": f"TPMS collection started with {tire_count} tires",
+            "message": message,
             "is_collecting": True,
             "tire_count": self.tire_count,
             "axle_config": self.axle_config
         }
-    
+
+    def _config(self) -> tuple:
+        return self.tire_count, self.axle_config, self.requested_id, self.channel, self.vehicle
+
+    def _watch(self) -> None:
+        """Resolve the watched ID and keep it in the hardware filter however
+        narrowly other consumers subscribe"""
+        decoder = self.pcan.dbc.find(TPMS_MESSAGE)
+        if self.requested_id is not None:
+            can_id = self.requested_id
+            key = can_id | DBC_EXTENDED_FLAG if can_id > MAX_STANDARD_ID else can_id
+        elif decoder is not None:
+            can_id, key = decoder.message.can_id, decoder.key
+        else:
+            can_id = key = None
+        self.can_id, self.watch_key = can_id, key
+        if can_id is not None:
+            self.pcan.set_subscription(TPMS_SUBSCRIPTION, [f"{can_id:X}"], self.channel)
+        else:
+            self.pcan.remove_subscription(TPMS_SUBSCRIPTION)
+
+    def _dbc_changed(self) -> None:
+        if self.is_collecting:
+            self._watch()
+
     def stop_collection(self) -> Dict[str, Any]:
+        self.pcan.remove_listener(self._on_frames)
+        self.pcan.remove_subscription(TPMS_SUBSCRIPTION)
         self.is_collecting = False
+        if self.store is not None:
+            # Flushes what is still pending
+            self.store.stop()
         return {
             "success": True,
             "message": "TPMS collection stopped",
             "is_collecting": False
         }
-    
+
+    def reset_session(self) -> Dict[str, Any]:
+        """Discard the in-memory history and alarm state, as a start with a new
+        configuration does; stored readings are kept"""
+        with self.lock:
+            # Under the lock so a burst being decoded cannot land in between
+            self.history.clear()
+            self.alarms.reset()
+            for state in self.tires.values():
+                state["alarm"] = "ok"
+            states = [dict(state) for state in self.tires.values()]
+        self._push(states)
+        return {
+            "success": True,
+            "message": "TPMS session reset"
+        }
+
     def get_status(self) -> Dict[str, Any]:
         return {
             "success": True,
             "is_collecting": self.is_collecting,
             "tire_count": self.tire_count,
-            "axle_config": self.axle_config
+            "axle_config": self.axle_config,
+            "can_id": f"{self.can_id:03X}" if self.can_id is not None else None,
+            "channel": self.channel,
+            "frames": self.frames,
+            "ignored": self.ignored,
+            "subscribers": len(self.subscribers),
+            "vehicle": self.vehicle,
+            "store": self.store.stats() if self.store is not None else None,
+            "store_error": self.store_error
+        }
+
+    def get_tires(self) -> Dict[str, Any]:
+        with self.lock:
+            tires = [dict(self.tires[tire]) for tire in sorted(self.tires)]
+        return {
+            "success": True,
+            "is_collecting": self.is_collecting,
+            "tires": tires
         }
 
-tpms_service = TPMSService()
+    def get_history(self, metric: Optional[str] = None, tires: Optional[List[int]] = None,
+                    start: Optional[float] = None, end: Optional[float] = None,
+                    points: int = DEFAULT_CHART_POINTS, method: str = "lttb") -> Dict[str, Any]:
+        """Per-tire readings between unix times start and end, downsampled to at most points
+        per tire and metric, so chart payloads stay the same size however long collection runs"""
+        if metric is not None and metric not in TPMS_METRICS:
+            return {
+                "success": False,
+                "error": f"Unknown metric: {metric} (expected one of {', '.join(TPMS_METRICS)})"
+            }
+        if method not in DOWNSAMPLE_METHODS:
+            return {
+                "success": False,
+                "error": f"Unknown downsampling method: {method} (expected one of {', '.join(DOWNSAMPLE_METHODS)})"
+            }
+        metrics = [metric] if metric else list(TPMS_METRICS)
+        return {
+            "success": True,
+            "method": method,
+            "points": points,
+            "series": self.history.query(metrics, tires, start, end, points, method)
+        }
+
+    def get_readings(self, tire: int, vehicle: Optional[str] = None, start: Optional[float] = None,
+                     end: Optional[float] = None, metric: Optional[str] = None,
+                     points: Optional[int] = None, limit: int = 10000) -> Dict[str, Any]:
+        """Stored readings of one tire between unix times start and end (default the last 24 h).
+
+        With points, metric (default pressure) is aggregated into that many
+        time buckets as BUCKET_FIELDS rows; otherwise raw READING_FIELDS rows
+        are returned, at most limit of them.
+        """
+        store = self._open_store()
+        if isinstance(store, dict):
+            return store
+        # Make the last second's readings visible to the query
+        store.flush()
+        vehicle = vehicle or self.vehicle
+        end = time.time() if end is None else end
+        start = end - READINGS_DEFAULT_SPAN if start is None else start
+        try:
+            if points:
+                metric = metric or "pressure"
+                fields, rows = BUCKET_FIELDS, store.buckets(vehicle, tire, metric, start, end, points)
+            else:
+                fields, rows = READING_FIELDS, store.readings(vehicle, tire, start, end, limit)
+        except (ValueError, sqlite3.Error) as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        return {
+            "success": True,
+            "vehicle": vehicle,
+            "tire": tire,
+            "metric": metric if points else None,
+            "start": start,
+            "end": end,
+            "fields": fields,
+            "rows": rows
+        }
+
+    def get_vehicles(self) -> Dict[str, Any]:
+        store = self._open_store()
+        if isinstance(store, dict):
+            return store
+        try:
+            vehicles = store.vehicles()
+        except sqlite3.Error as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        return {
+            "success": True,
+            "vehicles": vehicles
+        }
+
+    def _open_store(self) -> Any:
+        """The reading store, or an error dict when the database cannot be opened"""
+        if self.store is None:
+            try:
+                store = TPMSStore(self.store_path)
+            except (OSError, sqlite3.Error) as e:
+                return {
+                    "success": False,
+                    "error": f"Cannot open TPMS store {self.store_path}: {str(e)}"
+                }
+            if self.is_collecting:
+                # Collection started without it: record from now on
+                store.start()
+            self.store = store
+            self.store_error = None
+        return self.store
+
+    def get_alarms(self, since: Optional[float] = None) -> Dict[str, Any]:
+        """Active alarms, transitions after unix time since and the rules in force"""
+        return {
+            "success": True,
+            "active": self.alarms.active(),
+            "events": self.alarms.recent(since),
+            "rules": self.alarms.rules
+        }
+
+    def set_alarm_rules(self, rules: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            self.alarms.configure(rules)
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        return {
+            "success": True,
+            "message": "Alarm rules updated",
+            "rules": self.alarms.rules
+        }
+
+    async def subscribe(self) -> TPMSSubscriber:
+        """New subscriber, primed with the current state of every tire"""
+        self.loop = asyncio.get_running_loop()
+        sub = TPMSSubscriber()
+        with self.lock:
+            sub.pending = {tire: dict(state) for tire, state in self.tires.items()}
+        if sub.pending:
+            sub.event.set()
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: TPMSSubscriber) -> None:
+        self.subscribers.discard(sub)
+
+    @staticmethod
+    def _initial_state(tire: int) -> Dict[str, Any]:
+        return {
+            "tire": tire,
+            "sensor": tire - 1,
+            "packet_type": None,
+            "status": "missing",
+            "pressure": None,
+            "temperature": None,
+            "battery": None,
+            "timestamp": None,
+            "updated": None,
+            "count": 0,
+            "alarm": "ok"
+        }
+
+    def _on_frames(self, channel: str, frames: List[Frame]) -> None:
+        """Listener called by the reader thread with each burst"""
+        if self.channel is not None and channel != self.channel:
+            return
+        key = self.watch_key
+        decoder = self.pcan.dbc.find(TPMS_MESSAGE)
+        if key is None or decoder is None:
+            return
+        status_labels = decoder.choices("PacketType")
+        changed = {}
+        alarms = []
+        with self.lock:
+            for frame in frames:
+                if frame[2] & (BUS_EVENT_TYPES | MSGTYPE_RTR) or frame_key(frame[1], frame[2]) != key:
+                    continue
+                timestamp, _, msg_type, dlc, length, data = frame
+                self.frames += 1
+                signals = decoder.decode(data, length, labels=False)
+                try:
+                    sensor, packet_type, pressure, temperature, battery = (signals[name] for name in TPMS_SIGNALS)
+                except KeyError:
+                    # Short frame, or a DBC whose TPMS_Status lacks one of the signals
+                    self.ignored += 1
+                    continue
+                state = self.tires.get(sensor + 1)
+                if state is None:
+                    # Sensor beyond the configured tire count
+                    self.ignored += 1
+                    continue
+                now = time.time()
+                state["count"] += 1
+                state["timestamp"] = timestamp
+                state["updated"] = round(now, 3)
+                self.history.record(sensor + 1, now, pressure, temperature, battery)
+                if self.store is not None:
+                    self.store.record(self.vehicle, sensor + 1, now, pressure, temperature, battery, packet_type)
+                transitions = self.alarms.evaluate(self.vehicle, sensor + 1, now, pressure, temperature, battery)
+                if transitions:
+                    alarms.extend(transitions)
+                    state["alarm"] = self.alarms.tire_level(self.vehicle, sensor + 1)
+                    changed[sensor + 1] = state
+                if (state["packet_type"] != packet_type or state["pressure"] != pressure
+                        or state["temperature"] != temperature or state["battery"] != battery):
+                    state["packet_type"] = packet_type
+                    # Unknown packet types count as ok, as on the dashboard
+                    state["status"] = status_labels.get(packet_type, "ok")
+                    state["pressure"] = pressure
+                    state["temperature"] = temperature
+                    state["battery"] = battery
+                    changed[sensor + 1] = state
+            changed_states = [dict(state) for state in changed.values()]
+        if changed_states:
+            self._push(changed_states, alarms)
+
+    def _push(self, states: List[Dict[str, Any]], alarms: Optional[List[Dict[str, Any]]] = None) -> None:
+        loop = self.loop
+        if loop is None or not self.subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self._dispatch, states, alarms or [])
+        except RuntimeError:
+            # Event loop already closed
+            self.loop = None
+
+    def _dispatch(self, states: List[Dict[str, Any]], alarms: List[Dict[str, Any]]) -> None:
+        for sub in list(self.subscribers):
+            for state in states:
+                sub.pending[state["tire"]] = state
+            sub.alarms.extend(alarms)
+            sub.event.set()
+
+# TPMS_DB_PATH overrides where readings are stored (default tpms.sqlite3 in the project root)
+tpms_service = TPMSService(pcan_service, store_path=os.environ.get("TPMS_DB_PATH"))
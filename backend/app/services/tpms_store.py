@@ -0,0 +1,183 @@
+from typing import Optional, Dict, Any, List, Tuple
+from contextlib import closing
+import os
+import sqlite3
+import threading
+import time
+
+# Readings are written by a background thread every STORE_FLUSH_INTERVAL
+# seconds, or sooner once STORE_BATCH are pending; at most STORE_MAX_PENDING
+# are held in memory if the disk cannot keep up
+STORE_FLUSH_INTERVAL = 1.0
+STORE_BATCH = 5000
+STORE_MAX_PENDING = 500000
+
+STORE_METRICS = ("pressure", "temperature", "battery")
+READING_FIELDS = ["time", "pressure", "temperature", "battery", "packet_type"]
+BUCKET_FIELDS = ["time", "count", "min", "avg", "max"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    vehicle TEXT NOT NULL,
+    tire INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    pressure REAL,
+    temperature REAL,
+    battery REAL,
+    packet_type INTEGER,
+    PRIMARY KEY (vehicle, tire, ts)
+) WITHOUT ROWID;
+"""
+
+Reading = Tuple[str, int, float, float, float, float, int]
+
+
+class TPMSStore:
+    """Durable TPMS readings in SQLite (WAL mode).
+
+    record() only appends to an in-memory batch, so the reader thread never
+    waits on the disk; a writer thread inserts each batch in one
+    transaction. WAL lets queries run on their own connections while the
+    writer commits. The table is clustered on (vehicle, tire, ts), so
+    "tire 7, last 24 h" is one contiguous range scan without row lookups;
+    bucketed queries aggregate in SQL, so only the buckets cross into
+    Python however many rows the range holds.
+    """
+    def __init__(self, path: str, flush_interval: float = STORE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.pending: List[Reading] = []
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.last_error: Optional[str] = None
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="tpms-store", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop the writer after a last flush of everything pending"""
+        self.stop_event.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5.0)
+            self.thread = None
+
+    def record(self, vehicle: str, tire: int, ts: float, pressure: float, temperature: float,
+               battery: float, packet_type: int) -> None:
+        with self.lock:
+            if len(self.pending) >= STORE_MAX_PENDING:
+                self.dropped += 1
+                return
+            self.pending.append((vehicle, tire, ts, pressure, temperature, battery, packet_type))
+            if len(self.pending) >= STORE_BATCH:
+                self.wake.set()
+
+    def flush(self) -> int:
+        """Insert everything pending in one transaction; returns the rows written"""
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if not batch:
+            return 0
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany("INSERT OR REPLACE INTO readings VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+        except sqlite3.Error as e:
+            self.last_error = str(e)
+            self.dropped += len(batch)
+            return 0
+        self.written += len(batch)
+        self.flushes += 1
+        return len(batch)
+
+    def readings(self, vehicle: str, tire: int, start: float, end: float,
+                 limit: int = 10000) -> List[List[Any]]:
+        """Raw READING_FIELDS rows of one tire in [start, end], oldest first"""
+        with closing(self._connect()) as conn:
+            return [list(row) for row in conn.execute(
+                "SELECT ts, pressure, temperature, battery, packet_type FROM readings "
+                "WHERE vehicle = ? AND tire = ? AND ts BETWEEN ? AND ? ORDER BY ts LIMIT ?",
+                (vehicle, tire, start, end, limit)
+            )]
+
+    def buckets(self, vehicle: str, tire: int, metric: str, start: float, end: float,
+                points: int) -> List[List[Any]]:
+        """BUCKET_FIELDS rows: one metric of one tire aggregated into at most points equal time buckets"""
+        if metric not in STORE_METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        width = max((end - start) / max(points, 1), 1e-3)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT CAST((ts - ?) / ? AS INTEGER) AS bucket, COUNT(*), MIN({metric}), "
+                f"AVG({metric}), MAX({metric}) FROM readings "
+                "WHERE vehicle = ? AND tire = ? AND ts BETWEEN ? AND ? GROUP BY bucket ORDER BY bucket",
+                (start, width, vehicle, tire, start, end)
+            ).fetchall()
+        return [[round(start + (bucket + 0.5) * width, 3), count, low, round(avg, 3), high]
+                for bucket, count, low, avg, high in rows]
+
+    def vehicles(self) -> List[Dict[str, Any]]:
+        """Stored vehicles with their tires and time span"""
+        rows = []
+        with closing(self._connect()) as conn:
+            # Hop from one (vehicle, tire) to the next through the primary key
+            # instead of scanning every reading
+            key = conn.execute("SELECT vehicle, tire FROM readings ORDER BY vehicle, tire LIMIT 1").fetchone()
+            while key is not None:
+                first = conn.execute("SELECT MIN(ts) FROM readings WHERE vehicle = ? AND tire = ?", key).fetchone()[0]
+                last = conn.execute("SELECT MAX(ts) FROM readings WHERE vehicle = ? AND tire = ?", key).fetchone()[0]
+                rows.append((key[0], key[1], first, last))
+                key = conn.execute(
+                    "SELECT vehicle, tire FROM readings WHERE vehicle = ? AND tire > ? "
+                    "ORDER BY tire LIMIT 1", key
+                ).fetchone() or conn.execute(
+                    "SELECT vehicle, tire FROM readings WHERE vehicle > ? "
+                    "ORDER BY vehicle, tire LIMIT 1", (key[0],)
+                ).fetchone()
+        vehicles: Dict[str, Dict[str, Any]] = {}
+        for vehicle, tire, first, last in rows:
+            entry = vehicles.setdefault(vehicle, {"vehicle": vehicle, "tires": [], "first": first, "last": last})
+            entry["tires"].append(tire)
+            entry["first"] = min(entry["first"], first)
+            entry["last"] = max(entry["last"], last)
+        return list(vehicles.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "running": self.running,
+            "pending": len(self.pending),
+            "written": self.written,
+            "flushes": self.flushes,
+            "dropped": self.dropped,
+            "last_error": self.last_error
+        }
+
+    def _run(self) -> None:
+        while not self.stop_event.is_set():
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+        self.flush()
@@ -0,0 +1,172 @@
+from typing import Optional, Dict, Any, List, Tuple
+from collections import OrderedDict, deque
+import itertools
+import threading
+import time
+
+try:
+    from PCANBasic import PCAN_ERROR_OK, PCAN_ERROR_XMTFULL
+except (ImportError, Exception):
+    PCAN_ERROR_OK = 0
+    PCAN_ERROR_XMTFULL = 0x00001
+
+# Frames (across all batches) a channel's transmit queue may hold
+TX_QUEUE_FRAMES = 100000
+# Backoff while the driver's transmit queue is full: doubles from start to max,
+# and a frame is failed once it has waited TX_RETRY_TIMEOUT seconds
+TX_BACKOFF_START = 0.0002
+TX_BACKOFF_MAX = 0.02
+TX_RETRY_TIMEOUT = 2.0
+# Finished batches kept for result lookups
+TX_HISTORY = 256
+
+# Encoded frame: (can_id, msg_type, payload)
+TxFrame = Tuple[int, int, bytes]
+
+_batch_ids = itertools.count(1)
+
+
+class TxBatch:
+    """A list of encoded frames queued for transmission, with its outcome"""
+    def __init__(self, channel: str, frames: List[TxFrame], stop_on_error: bool = True):
+        self.id = next(_batch_ids)
+        self.channel = channel
+        self.frames = frames
+        self.stop_on_error = stop_on_error
+        self.state = "queued"
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            "batch_id": self.id,
+            "channel": self.channel,
+            "state": self.state,
+            "total": len(self.frames),
+            "sent": self.sent,
+            "failed": self.failed,
+            "skipped": len(self.frames) - self.sent - self.failed if self.state == "done" else 0,
+            "retries": self.retries,
+            "errors": self.errors,
+            "elapsed_ms": round(elapsed * 1000.0, 3) if elapsed is not None else None,
+            "frames_per_second": round(self.sent / elapsed) if elapsed else None
+        }
+
+
+class TransmitQueue:
+    """Bounded queue of frame batches drained by one writer thread per channel.
+
+    The writer reuses a single TPCANMsg / TPCANMsgFD for every frame and,
+    when the driver reports PCAN_ERROR_XMTFULL, backs off and retries the
+    same frame instead of dropping it. Batches are sent in submission
+    order; with stop_on_error a failed frame skips the rest of its batch.
+    """
+    def __init__(self, channel: Any, max_frames: int = TX_QUEUE_FRAMES):
+        self.channel = channel
+        self.max_frames = max_frames
+        self.batches: deque = deque()
+        self.history: "OrderedDict[int, TxBatch]" = OrderedDict()
+        self.queued_frames = 0
+        self.frames_sent = 0
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"pcan-writer-{self.channel.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        with self.cond:
+            # Anything still queued is reported as skipped
+            while self.batches:
+                self._finish(self.batches.popleft())
+            self.queued_frames = 0
+
+    def submit(self, frames: List[TxFrame], stop_on_error: bool = True) -> Optional[TxBatch]:
+        """Queue a batch; None when it does not fit in the remaining queue space"""
+        with self.cond:
+            if not self.running or self.queued_frames + len(frames) > self.max_frames:
+                return None
+            batch = TxBatch(self.channel.name, frames, stop_on_error)
+            self.batches.append(batch)
+            self.history[batch.id] = batch
+            while len(self.history) > TX_HISTORY:
+                self.history.popitem(last=False)
+            self.queued_frames += len(frames)
+            self.cond.notify()
+            return batch
+
+    def get(self, batch_id: int) -> Optional[TxBatch]:
+        with self.cond:
+            return self.history.get(batch_id)
+
+    def _finish(self, batch: TxBatch) -> None:
+        batch.state = "done"
+        batch.finished_at = time.monotonic()
+        batch.done.set()
+
+    def _run(self) -> None:
+        msg = self.channel.new_tx_msg()
+        write = self.channel.write_frame
+        while True:
+            with self.cond:
+                while self.running and not self.batches:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                batch = self.batches[0]
+            batch.state = "sending"
+            batch.started_at = time.monotonic()
+            for index, (can_id, msg_type, payload) in enumerate(batch.frames):
+                if not self.running:
+                    break
+                result = write(msg, can_id, msg_type, payload)
+                if result == PCAN_ERROR_XMTFULL:
+                    result = self._retry(batch, msg, can_id, msg_type, payload)
+                if result == PCAN_ERROR_OK:
+                    batch.sent += 1
+                else:
+                    batch.failed += 1
+                    batch.errors.append({"index": index, "error": self.channel.error_text(result)})
+                    if batch.stop_on_error:
+                        break
+            self.frames_sent += batch.sent
+            with self.cond:
+                if self.batches and self.batches[0] is batch:
+                    self.batches.popleft()
+                    self.queued_frames -= len(batch.frames)
+            self._finish(batch)
+
+    def _retry(self, batch: TxBatch, msg: Any, can_id: int, msg_type: int, payload: bytes) -> int:
+        delay = TX_BACKOFF_START
+        give_up = time.monotonic() + TX_RETRY_TIMEOUT
+        result = PCAN_ERROR_XMTFULL
+        while result == PCAN_ERROR_XMTFULL and self.running and time.monotonic() < give_up:
+            time.sleep(delay)
+            delay = min(delay * 2, TX_BACKOFF_MAX)
+            batch.retries += 1
+            result = self.channel.write_frame(msg, can_id, msg_type, payload)
+        return result
@@ -0,0 +1,468 @@
+from typing import Optional, Dict, Any, List, Tuple
+from collections import deque
+import ctypes
+import os
+import random
+import threading
+import time
+
+import PCANBasic as _pcan
+from PCANBasic import (
+    TPCANMsg, TPCANMsgFD, TPCANTimestamp, TPCANTimestampFD,
+    PCAN_ERROR_OK, PCAN_ERROR_QRCVEMPTY, PCAN_ERROR_QOVERRUN, PCAN_ERROR_INITIALIZE,
+    PCAN_ERROR_ILLPARAMTYPE, PCAN_ERROR_ILLPARAMVAL,
+    PCAN_ERROR_ILLOPERATION, PCAN_ERROR_ILLDATA, PCAN_ERROR_HWINUSE,
+    PCAN_RECEIVE_EVENT, PCAN_MESSAGE_FILTER, PCAN_CHANNEL_CONDITION, PCAN_BUSSPEED_NOMINAL,
+    PCAN_BUSSPEED_DATA, PCAN_FILTER_OPEN, PCAN_FILTER_CLOSE, PCAN_FILTER_CUSTOM,
+    PCAN_CHANNEL_AVAILABLE, PCAN_CHANNEL_OCCUPIED, PCAN_MODE_EXTENDED,
+    PCAN_BAUD_1M, PCAN_BAUD_800K, PCAN_BAUD_500K, PCAN_BAUD_250K, PCAN_BAUD_125K,
+    PCAN_BAUD_100K, PCAN_BAUD_50K, PCAN_BAUD_20K, PCAN_BAUD_10K, PCAN_BAUD_5K
+)
+
+from app.services.frame_ring import DLC_TO_LEN, MSGTYPE_EXTENDED, MSGTYPE_FD, MSGTYPE_RTR, frame_bits
+
+# Receive queue depth per channel, as in the PCAN driver
+RX_QUEUE_SIZE = 32768
+# How often the generator thread emits the frames that came due
+GENERATOR_TICK = 0.001
+
+BAUD_RATES = {
+    PCAN_BAUD_1M.value: 1000000,
+    PCAN_BAUD_800K.value: 800000,
+    PCAN_BAUD_500K.value: 500000,
+    PCAN_BAUD_250K.value: 250000,
+    PCAN_BAUD_125K.value: 125000,
+    PCAN_BAUD_100K.value: 100000,
+    PCAN_BAUD_50K.value: 50000,
+    PCAN_BAUD_20K.value: 20000,
+    PCAN_BAUD_10K.value: 10000,
+    PCAN_BAUD_5K.value: 5000,
+}
+
+ERROR_NAMES = {
+    value: name for name, value in vars(_pcan).items()
+    if name.startswith("PCAN_ERROR_") and isinstance(value, int)
+}
+
+# Queued frame: (timestamp_us, can_id, msg_type, payload)
+VirtualFrame = Tuple[int, int, int, bytes]
+
+
+def _value(x: Any) -> Any:
+    """Plain value of a ctypes argument (the real API is called with both)"""
+    return getattr(x, "value", x)
+
+
+def parse_id_mix(spec: Optional[str]) -> List[Tuple[int, int]]:
+    """Parse "100,200:5,18FEF100:2" into (can_id, weight) pairs; weights default to 1"""
+    mix = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        can_id, _, weight = item.partition(":")
+        mix.append((int(can_id, 16), int(weight) if weight else 1))
+    return mix
+
+
+def tpms_payload(sensor: int, packet_type: int, pressure: int, temperature: float, battery: float) -> bytes:
+    """Encode a TPMS frame as the dashboard decodes it: sensor, packet type,
+    pressure (big endian), temperature*100+8500 (little endian), (battery mV-2000)/10"""
+    temp_raw = max(0, min(0xFFFF, int(round(temperature * 100 + 8500))))
+    battery_raw = max(0, min(0xFF, int(round((battery * 1000 - 2000) / 10))))
+    pressure = max(0, min(0xFFFF, int(pressure)))
+    return bytes((sensor & 0xFF, packet_type & 0xFF, pressure >> 8, pressure & 0xFF,
+                  temp_raw & 0xFF, temp_raw >> 8, battery_raw, 0))
+
+
+class _Sensor:
+    """Slowly drifting tire values for one simulated TPMS sensor"""
+    def __init__(self, index: int, rng: random.Random):
+        self.index = index
+        self.pressure = rng.uniform(70, 90)
+        self.temperature = rng.uniform(25, 40)
+        self.battery = rng.uniform(2.9, 3.3)
+
+    def next_payload(self, rng: random.Random) -> bytes:
+        self.pressure = min(max(self.pressure + rng.gauss(0, 0.5), 0), 150)
+        self.temperature = min(max(self.temperature + rng.gauss(0, 0.2), -40), 120)
+        self.battery = max(self.battery - 0.00001, 2.0)
+        packet_type = 0x01
+        if self.pressure < 20:
+            packet_type = 0x11
+        elif self.pressure < 30:
+            packet_type = 0x10
+        return tpms_payload(self.index, packet_type, self.pressure, self.temperature, self.battery)
+
+
+class _VirtualChannel:
+    def __init__(self, handle: int, bitrate: int, fd: bool, data_bitrate: int):
+        self.handle = handle
+        self.bitrate = bitrate
+        self.fd = fd
+        self.data_bitrate = data_bitrate
+        self.queue: deque = deque()
+        self.overrun = False
+        self.filter = PCAN_FILTER_OPEN
+        self.ranges: List[Tuple[int, int, bool]] = []
+        # Pipe exposed as PCAN_RECEIVE_EVENT; holds at most one byte while frames are pending
+        self.event_r, self.event_w = os.pipe()
+        os.set_blocking(self.event_r, False)
+        os.set_blocking(self.event_w, False)
+        self.signalled = False
+        self.received = 0
+        self.dropped = 0
+
+    def accepts(self, can_id: int, msg_type: int) -> bool:
+        if self.filter == PCAN_FILTER_OPEN:
+            return True
+        extended = bool(msg_type & MSGTYPE_EXTENDED)
+        return any(lo <= can_id <= hi and ext == extended for lo, hi, ext in self.ranges)
+
+    def deliver(self, frame: VirtualFrame) -> None:
+        if frame[2] & MSGTYPE_FD and not self.fd:
+            return
+        if not self.accepts(frame[1], frame[2]):
+            return
+        if len(self.queue) >= RX_QUEUE_SIZE:
+            self.overrun = True
+            self.dropped += 1
+            return
+        self.queue.append(frame)
+        self.received += 1
+        if not self.signalled:
+            self.signalled = True
+            try:
+                os.write(self.event_w, b"\x01")
+            except OSError:
+                pass
+
+    def clear_event(self) -> None:
+        if self.signalled:
+            self.signalled = False
+            try:
+                os.read(self.event_r, 64)
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        for fd in (self.event_r, self.event_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class VirtualPCANBasic:
+    """In-process stand-in for PCANBasic that simulates one shared CAN bus.
+
+    Implements the subset of the PCANBasic API used by PCANService. Every
+    initialized channel sits on the same virtual bus: written frames are
+    looped back to all channels (the writer included), subject to each
+    channel's message filter. A generator thread adds synthetic traffic
+    while any channel is open: TPMS frames for `tpms_tires` sensors at
+    `tpms_hz` each, plus background frames drawn from the weighted `ids`
+    mix at whatever rate brings the bus to `load` (0..1) of its nominal
+    bit rate. Frames are timestamped with their scheduled time, so the
+    pattern is exact even when the generator thread runs late.
+    """
+    def __init__(self, load: float = 0.3, ids: Optional[str] = "100,101:2,200:4,18FEF100",
+                 tpms_id: int = 0x385, tpms_tires: int = 6, tpms_hz: float = 1.0,
+                 seed: Optional[int] = None):
+        self.lock = threading.Lock()
+        self.channels: Dict[int, _VirtualChannel] = {}
+        self.rng = random.Random(seed)
+        self.generator: Optional[threading.Thread] = None
+        self.generated = 0
+        self.looped_back = 0
+        self.configure(load=load, ids=ids, tpms_id=tpms_id, tpms_tires=tpms_tires, tpms_hz=tpms_hz)
+
+    @classmethod
+    def from_env(cls) -> "VirtualPCANBasic":
+        """Traffic settings from PCAN_VIRTUAL_LOAD, _IDS, _TPMS_ID, _TPMS_TIRES, _TPMS_HZ and _SEED"""
+        env = os.environ.get
+        return cls(
+            load=float(env("PCAN_VIRTUAL_LOAD", "0.3")),
+            ids=env("PCAN_VIRTUAL_IDS", "100,101:2,200:4,18FEF100"),
+            tpms_id=int(env("PCAN_VIRTUAL_TPMS_ID", "385"), 16),
+            tpms_tires=int(env("PCAN_VIRTUAL_TPMS_TIRES", "6")),
+            tpms_hz=float(env("PCAN_VIRTUAL_TPMS_HZ", "1")),
+            seed=int(env("PCAN_VIRTUAL_SEED")) if env("PCAN_VIRTUAL_SEED") else None
+        )
+
+    def configure(self, load: Optional[float] = None, ids: Optional[str] = None,
+                  tpms_id: Optional[int] = None, tpms_tires: Optional[int] = None,
+                  tpms_hz: Optional[float] = None) -> None:
+        """Change the generated traffic; takes effect on the next generator tick"""
+        if load is not None and not 0 <= load <= 1:
+            raise ValueError("load must be between 0 and 1")
+        mix = parse_id_mix(ids) if ids is not None else None
+        with self.lock:
+            if load is not None:
+                self.load = load
+            if mix is not None:
+                self.id_mix = mix
+                self.id_choices = [can_id for can_id, weight in mix for _ in range(weight)]
+                self.counters = {can_id: 0 for can_id, weight in mix}
+            if tpms_id is not None:
+                self.tpms_id = tpms_id
+            if tpms_tires is not None:
+                self.sensors = [_Sensor(i, self.rng) for i in range(tpms_tires)]
+            if tpms_hz is not None:
+                self.tpms_hz = tpms_hz
+
+    def get_config(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "load": self.load,
+                "ids": ",".join(f"{can_id:X}:{weight}" for can_id, weight in self.id_mix),
+                "tpms_id": f"{self.tpms_id:03X}",
+                "tpms_tires": len(self.sensors),
+                "tpms_hz": self.tpms_hz,
+                "generated": self.generated,
+                "looped_back": self.looped_back,
+                "channels": {
+                    f"{ch.handle:02X}h": {
+                        "bitrate": ch.bitrate,
+                        "fd": ch.fd,
+                        "queued": len(ch.queue),
+                        "received": ch.received,
+                        "dropped": ch.dropped
+                    } for ch in self.channels.values()
+                }
+            }
+
+    # PCANBasic API
+
+    def Initialize(self, Channel: Any, Btr0Btr1: Any, HwType: Any = 0, IOPort: Any = 0, Interrupt: Any = 0) -> int:
+        bitrate = BAUD_RATES.get(_value(Btr0Btr1))
+        if bitrate is None:
+            return PCAN_ERROR_ILLPARAMVAL
+        return self._open(_value(Channel), bitrate, False, bitrate)
+
+    def InitializeFD(self, Channel: Any, BitrateFD: Any) -> int:
+        spec = _value(BitrateFD)
+        if isinstance(spec, bytes):
+            spec = spec.decode()
+        try:
+            params = {k.strip(): int(v) for k, v in (p.split("=") for p in spec.split(",") if p.strip())}
+            clock = params.get("f_clock", params.get("f_clock_mhz", 80) * 1000000)
+            nominal = clock // (params["nom_brp"] * (1 + params["nom_tseg1"] + params["nom_tseg2"]))
+            data = clock // (params["data_brp"] * (1 + params["data_tseg1"] + params["data_tseg2"]))
+        except (ValueError, KeyError, ZeroDivisionError):
+            return PCAN_ERROR_ILLPARAMVAL
+        return self._open(_value(Channel), nominal, True, data)
+
+    def Uninitialize(self, Channel: Any) -> int:
+        with self.lock:
+            ch = self.channels.pop(_value(Channel), None)
+        if ch is None:
+            return PCAN_ERROR_INITIALIZE
+        ch.close()
+        return PCAN_ERROR_OK
+
+    def Reset(self, Channel: Any) -> int:
+        ch = self.channels.get(_value(Channel))
+        if ch is None:
+            return PCAN_ERROR_INITIALIZE
+        with self.lock:
+            ch.queue.clear()
+            ch.overrun = False
+            ch.clear_event()
+        return PCAN_ERROR_OK
+
+    def GetStatus(self, Channel: Any) -> int:
+        ch = self.channels.get(_value(Channel))
+        if ch is None:
+            return PCAN_ERROR_INITIALIZE
+        with self.lock:
+            if ch.overrun:
+                ch.overrun = False
+                return PCAN_ERROR_QOVERRUN
+        return PCAN_ERROR_OK
+
+    def Read(self, Channel: Any) -> Tuple[int, Any, Any]:
+        msg, timestamp = TPCANMsg(), TPCANTimestamp()
+        status, frame = self._pop(_value(Channel))
+        if frame is not None:
+            ts, msg.ID, msg.MSGTYPE, payload = frame
+            length = min(len(payload), 8)
+            msg.LEN = length
+            ctypes.memmove(msg.DATA, payload, length)
+            timestamp.micros = ts % 1000
+            timestamp.millis = (ts // 1000) & 0xFFFFFFFF
+            timestamp.millis_overflow = (ts // 1000) >> 32
+        return status, msg, timestamp
+
+    def ReadFD(self, Channel: Any) -> Tuple[int, Any, Any]:
+        msg = TPCANMsgFD()
+        ch = self.channels.get(_value(Channel))
+        if ch is not None and not ch.fd:
+            return PCAN_ERROR_ILLOPERATION, msg, TPCANTimestampFD(0)
+        status, frame = self._pop(_value(Channel))
+        ts = 0
+        if frame is not None:
+            ts, msg.ID, msg.MSGTYPE, payload = frame
+            msg.DLC = DLC_TO_LEN.index(len(payload))
+            ctypes.memmove(msg.DATA, payload, len(payload))
+        return status, msg, TPCANTimestampFD(ts)
+
+    def Write(self, Channel: Any, MessageBuffer: Any) -> int:
+        ch = self.channels.get(_value(Channel))
+        if ch is None:
+            return PCAN_ERROR_INITIALIZE
+        if MessageBuffer.LEN > 8:
+            return PCAN_ERROR_ILLDATA
+        msg_type = _value(MessageBuffer.MSGTYPE)
+        payload = bytes(MessageBuffer.LEN) if msg_type & MSGTYPE_RTR else bytes(MessageBuffer.DATA[:MessageBuffer.LEN])
+        self._transmit((self._now_us(), MessageBuffer.ID, msg_type, payload))
+        return PCAN_ERROR_OK
+
+    def WriteFD(self, Channel: Any, MessageBuffer: Any) -> int:
+        ch = self.channels.get(_value(Channel))
+        if ch is None:
+            return PCAN_ERROR_INITIALIZE
+        if not ch.fd:
+            return PCAN_ERROR_ILLOPERATION
+        msg_type = _value(MessageBuffer.MSGTYPE)
+        length = DLC_TO_LEN[MessageBuffer.DLC & 0x0F]
+        if length > 8 and not msg_type & MSGTYPE_FD:
+            return PCAN_ERROR_ILLDATA
+        self._transmit((self._now_us(), MessageBuffer.ID, msg_type, bytes(MessageBuffer.DATA[:length])))
+        return PCAN_ERROR_OK
+
+    def FilterMessages(self, Channel: Any, FromID: int, ToID: int, Mode: Any) -> int:
+        ch = self.channels.get(_value(Channel))
+        if ch is None:
+            return PCAN_ERROR_INITIALIZE
+        with self.lock:
+            if ch.filter == PCAN_FILTER_OPEN:
+                ch.ranges = []
+            ch.ranges.append((min(FromID, ToID), max(FromID, ToID), _value(Mode) == _value(PCAN_MODE_EXTENDED)))
+            ch.filter = PCAN_FILTER_CUSTOM
+        return PCAN_ERROR_OK
+
+    def GetValue(self, Channel: Any, Parameter: Any) -> Tuple[int, Any]:
+        parameter = _value(Parameter)
+        ch = self.channels.get(_value(Channel))
+        if parameter == _value(PCAN_CHANNEL_CONDITION):
+            return PCAN_ERROR_OK, PCAN_CHANNEL_OCCUPIED if ch is not None else PCAN_CHANNEL_AVAILABLE
+        if ch is None:
+            return PCAN_ERROR_INITIALIZE, 0
+        if parameter == _value(PCAN_RECEIVE_EVENT):
+            return PCAN_ERROR_OK, ch.event_r
+        if parameter == _value(PCAN_MESSAGE_FILTER):
+            return PCAN_ERROR_OK, ch.filter
+        if parameter == _value(PCAN_BUSSPEED_NOMINAL):
+            return PCAN_ERROR_OK, ch.bitrate
+        if parameter == _value(PCAN_BUSSPEED_DATA):
+            return PCAN_ERROR_OK, ch.data_bitrate
+        return PCAN_ERROR_ILLPARAMTYPE, 0
+
+    def SetValue(self, Channel: Any, Parameter: Any, Buffer: Any) -> int:
+        parameter = _value(Parameter)
+        ch = self.channels.get(_value(Channel))
+        if ch is None:
+            return PCAN_ERROR_INITIALIZE
+        if parameter == _value(PCAN_RECEIVE_EVENT):
+            # Event handles are a Windows concept; the fd from GetValue is used instead
+            return PCAN_ERROR_ILLPARAMTYPE
+        if parameter == _value(PCAN_MESSAGE_FILTER):
+            value = _value(Buffer)
+            if value not in (PCAN_FILTER_OPEN, PCAN_FILTER_CLOSE):
+                return PCAN_ERROR_ILLPARAMVAL
+            with self.lock:
+                ch.filter = value
+                ch.ranges = []
+        # Other parameters (status/RTR/error frames, auto reset...) are accepted and ignored
+        return PCAN_ERROR_OK
+
+    def GetErrorText(self, Error: Any, Language: Any = 0) -> Tuple[int, bytes]:
+        error = _value(Error)
+        names = [name for value, name in ERROR_NAMES.items() if value and value & error == value]
+        text = ERROR_NAMES.get(error) or (" | ".join(names) if names else f"Error 0x{error:X}")
+        return PCAN_ERROR_OK, f"Virtual PCAN: {text}".encode()
+
+    # Bus simulation
+
+    def _open(self, handle: int, bitrate: int, fd: bool, data_bitrate: int) -> int:
+        with self.lock:
+            if handle in self.channels:
+                return PCAN_ERROR_HWINUSE
+            self.channels[handle] = _VirtualChannel(handle, bitrate, fd, data_bitrate)
+            if self.generator is None or not self.generator.is_alive():
+                self.generator = threading.Thread(target=self._generate, name="pcan-virtual-bus", daemon=True)
+                self.generator.start()
+        return PCAN_ERROR_OK
+
+    def _pop(self, handle: int) -> Tuple[int, Optional[VirtualFrame]]:
+        with self.lock:
+            ch = self.channels.get(handle)
+            if ch is None:
+                return PCAN_ERROR_INITIALIZE, None
+            if ch.queue:
+                return PCAN_ERROR_OK, ch.queue.popleft()
+            ch.clear_event()
+            return PCAN_ERROR_QRCVEMPTY, None
+
+    def _now_us(self) -> int:
+        return int(time.monotonic() * 1000000)
+
+    def _transmit(self, frame: VirtualFrame) -> None:
+        with self.lock:
+            self.looped_back += 1
+            for ch in self.channels.values():
+                ch.deliver(frame)
+
+    def _generate(self) -> None:
+        # Scheduled time of the next TPMS and background frame
+        next_tpms = next_background = time.monotonic()
+        sensor_index = 0
+        while True:
+            time.sleep(GENERATOR_TICK)
+            with self.lock:
+                if not self.channels:
+                    self.generator = None
+                    return
+                now = time.monotonic()
+                bitrate = min(ch.bitrate for ch in self.channels.values())
+                tpms_rate = len(self.sensors) * self.tpms_hz
+                tpms_type = MSGTYPE_EXTENDED if self.tpms_id > 0x7FF else 0
+                # Background traffic fills whatever the configured load leaves after TPMS
+                avg_bits = self._average_bits()
+                spare_bits = self.load * bitrate - tpms_rate * frame_bits(bool(tpms_type), 8)
+                background_rate = spare_bits / avg_bits if avg_bits and spare_bits > 0 else 0
+                frames = []
+                if tpms_rate:
+                    next_tpms = max(next_tpms, now - 1.0)
+                    while next_tpms <= now:
+                        sensor = self.sensors[sensor_index % len(self.sensors)]
+                        sensor_index += 1
+                        frames.append((int(next_tpms * 1000000), self.tpms_id, tpms_type,
+                                       sensor.next_payload(self.rng)))
+                        next_tpms += 1.0 / tpms_rate
+                else:
+                    next_tpms = now
+                if background_rate and self.id_choices:
+                    # After a stall, skip ahead instead of emitting more than a second of backlog
+                    next_background = max(next_background, now - 1.0)
+                    while next_background <= now:
+                        can_id = self.rng.choice(self.id_choices)
+                        counter = self.counters[can_id] = (self.counters[can_id] + 1) & 0xFF
+                        payload = bytes((counter,)) + self.rng.randbytes(7)
+                        frames.append((int(next_background * 1000000), can_id,
+                                       MSGTYPE_EXTENDED if can_id > 0x7FF else 0, payload))
+                        next_background += 1.0 / background_rate
+                else:
+                    next_background = now
+                frames.sort(key=lambda f: f[0])
+                self.generated += len(frames)
+                for frame in frames:
+                    for ch in self.channels.values():
+                        ch.deliver(frame)
+
+    def _average_bits(self) -> float:
+        total = sum(weight for can_id, weight in self.id_mix)
+        if not total:
+            return 0.0
+        return sum(frame_bits(can_id > 0x7FF, 8) * weight for can_id, weight in self.id_mix) / total
@@ -0,0 +1,215 @@
+"""Frames-per-second capacity of the PCAN reader ingest path.
+
+Runs the reader drain loop against a mocked PCANBasic.Read that returns
+freshly allocated TPCANMsg/TPCANTimestamp structures, exactly as the real
+wrapper does, and reports how many frames per second each implementation
+can move from the driver into the receive buffer:
+
+  baseline  the original loop: per-byte data list, hex ID, RTR probe,
+            getattr timestamp conversion and one dict per frame
+  per-frame ctypes field access and a locked ring append per frame
+  burst     FrameReader unpacking + FrameRing.extend only
+  channel   PCANChannel.drain as shipped: burst plus the latest-value
+            table, IdStats, decoding with the bundled DBC files and the
+            listener fan-out (current)
+
+Usage (from backend/):  python benchmarks/reader_bench.py [--frames N] [--fd]
+"""
+from collections import deque
+from typing import Any, Callable, List, Tuple
+import argparse
+import ctypes
+import os
+import random
+import sys
+import time
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.dirname(BACKEND))
+
+from PCANBasic import (  # noqa: E402
+    TPCANMsg, TPCANMsgFD, TPCANTimestamp, TPCANTimestampFD,
+    PCAN_ERROR_OK, PCAN_ERROR_QRCVEMPTY, PCAN_MESSAGE_RTR
+)
+from app.services.frame_reader import FrameReader  # noqa: E402
+from app.services.frame_ring import FrameRing, DLC_TO_LEN  # noqa: E402
+from app.services.pcan_service import PCANService, PCANChannel  # noqa: E402
+
+HANDLE = 0x51
+
+
+class MockPCANBasic:
+    """Serves a pre-generated queue of frames through Read/ReadFD"""
+    def __init__(self, frames: int, fd: bool, seed: int = 1):
+        rng = random.Random(seed)
+        length = 64 if fd else 8
+        self.pool = [(rng.randrange(0x800), bytes(rng.randrange(256) for _ in range(length)))
+                     for _ in range(1024)]
+        self.frames = frames
+        self.remaining = frames
+        self.now = 0
+
+    def rewind(self) -> None:
+        self.remaining = self.frames
+
+    def Read(self, Channel: Any) -> Tuple[int, Any, Any]:
+        msg = TPCANMsg()
+        timestamp = TPCANTimestamp()
+        if not self.remaining:
+            return PCAN_ERROR_QRCVEMPTY, msg, timestamp
+        self.remaining -= 1
+        self.now += 125
+        can_id, payload = self.pool[self.remaining & 1023]
+        msg.ID = can_id
+        msg.LEN = 8
+        ctypes.memmove(msg.DATA, payload, 8)
+        timestamp.millis = self.now // 1000
+        timestamp.micros = self.now % 1000
+        return PCAN_ERROR_OK, msg, timestamp
+
+    def ReadFD(self, Channel: Any) -> Tuple[int, Any, Any]:
+        msg = TPCANMsgFD()
+        if not self.remaining:
+            return PCAN_ERROR_QRCVEMPTY, msg, TPCANTimestampFD(0)
+        self.remaining -= 1
+        self.now += 125
+        can_id, payload = self.pool[self.remaining & 1023]
+        msg.ID = can_id
+        msg.DLC = 15
+        ctypes.memmove(msg.DATA, payload, 64)
+        return PCAN_ERROR_OK, msg, TPCANTimestampFD(self.now)
+
+
+def _timestamp_to_us(ts: Any) -> int:
+    try:
+        if hasattr(ts, 'value'):
+            return int(getattr(ts, 'value'))
+        micros = getattr(ts, 'micros', 0)
+        millis = getattr(ts, 'millis', 0)
+        overflow = getattr(ts, 'millis_overflow', 0)
+        return int(micros + (1000 * millis) + (0x100000000 * 1000 * overflow))
+    except Exception:
+        try:
+            return int(ts)
+        except Exception:
+            return 0
+
+
+def drain_baseline(pcan: MockPCANBasic, fd: bool) -> int:
+    buffer: deque = deque(maxlen=1000)
+    read = pcan.ReadFD if fd else pcan.Read
+    count = 0
+    while True:
+        res = read(HANDLE)
+        if res[0] != PCAN_ERROR_OK:
+            return count
+        can_msg = res[1]
+        length = DLC_TO_LEN[can_msg.DLC & 0x0F] if fd else can_msg.LEN
+        data = []
+        for i in range(length):
+            data.append(can_msg.DATA[i])
+        try:
+            is_rtr = (can_msg.MSGTYPE & PCAN_MESSAGE_RTR.value) == PCAN_MESSAGE_RTR.value
+        except Exception:
+            is_rtr = False
+        buffer.append({
+            "id": f"{can_msg.ID:03X}",
+            "msg_type": "RTR" if is_rtr else "DATA",
+            "len": length,
+            "data": data,
+            "timestamp": _timestamp_to_us(res[2])
+        })
+        count += 1
+
+
+def drain_per_frame(pcan: MockPCANBasic, fd: bool, ring: FrameRing) -> int:
+    burst = []
+    while True:
+        res = pcan.ReadFD(HANDLE) if fd else pcan.Read(HANDLE)
+        if res[0] != PCAN_ERROR_OK:
+            return len(burst)
+        can_msg = res[1]
+        if fd:
+            dlc = can_msg.DLC & 0x0F
+            frame = (_timestamp_to_us(res[2]), can_msg.ID, can_msg.MSGTYPE, dlc, DLC_TO_LEN[dlc],
+                     bytes(can_msg.DATA))
+        else:
+            frame = (_timestamp_to_us(res[2]), can_msg.ID, can_msg.MSGTYPE, can_msg.LEN, can_msg.LEN,
+                     bytes(can_msg.DATA))
+        ring.append(*frame)
+        burst.append(frame)
+
+
+def drain_burst(pcan: MockPCANBasic, fd: bool, ring: FrameRing) -> int:
+    reader = FrameReader(pcan, HANDLE, fd)
+    count = 0
+    while True:
+        burst, status = reader.read_burst()
+        if burst:
+            ring.extend(burst)
+            count += len(burst)
+        if status != PCAN_ERROR_OK:
+            return count
+
+
+def channel_drain(pcan: MockPCANBasic, fd: bool) -> Callable[[], int]:
+    """The shipped reader path: a PCANChannel of a service with the bundled DBC
+    files loaded and one listener, drained the way its reader thread does"""
+    service = PCANService()
+    service.pcan = pcan
+    service.add_listener(lambda channel, frames: None)
+    channel = PCANChannel(service, "bench", HANDLE)
+    channel.reader = FrameReader(pcan, HANDLE, fd)
+    return channel.drain
+
+
+def measure(drain: Callable[[], int], pcan: MockPCANBasic, repeat: int) -> float:
+    """Best frames/s over `repeat` runs"""
+    best = 0.0
+    for _ in range(repeat):
+        pcan.rewind()
+        start = time.perf_counter()
+        frames = drain()
+        elapsed = time.perf_counter() - start
+        best = max(best, frames / elapsed)
+    return best
+
+
+def drain_read_only(pcan: MockPCANBasic, fd: bool) -> int:
+    read = pcan.ReadFD if fd else pcan.Read
+    count = 0
+    while read(HANDLE)[0] == PCAN_ERROR_OK:
+        count += 1
+    return count
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=200000, help="frames per run")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per variant, best is reported")
+    parser.add_argument("--fd", action="store_true", help="use ReadFD with 64-byte payloads")
+    args = parser.parse_args(argv)
+
+    pcan = MockPCANBasic(args.frames, args.fd)
+    ring = FrameRing(100000)
+    variants = [
+        ("baseline", lambda: drain_baseline(pcan, args.fd)),
+        ("per-frame", lambda: drain_per_frame(pcan, args.fd, ring)),
+        ("burst", lambda: drain_burst(pcan, args.fd, ring)),
+        ("channel", channel_drain(pcan, args.fd)),
+    ]
+    print(f"{'FD' if args.fd else 'Classic'} frames, {args.frames} per run, best of {args.repeat}")
+    # Upper bound: the wrapper's own struct allocation with nothing done per frame
+    ceiling = measure(lambda: drain_read_only(pcan, args.fd), pcan, args.repeat)
+    print(f"mocked Read alone: {ceiling:,.0f} frames/s")
+    print(f"{'variant':<10} {'frames/s':>12} {'speedup':>8}")
+    base = None
+    for name, drain in variants:
+        rate = measure(drain, pcan, args.repeat)
+        base = base or rate
+        print(f"{name:<10} {rate:>12,.0f} {rate / base:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
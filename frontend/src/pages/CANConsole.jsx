@@ -21,6 +21,7 @@ function CANConsole() {
   const [tpmsError, setTpmsError] = useState('');
 
   const pollTimerRef = useRef(null);
+  const streamRef = useRef(null);
   const MAX_BUFFER_SIZE = 1000;
 
   const pushLog = useCallback((level, message) => {
@@ -48,12 +49,38 @@ function CANConsole() {
     }
   }, []);
 
+  const stopStreaming = useCallback(() => {
+    const ws = streamRef.current;
+    streamRef.current = null;
+    if (ws) ws.close();
+    stopPolling();
+  }, [stopPolling]);
+
+  const startStreaming = useCallback(() => {
+    stopStreaming();
+    const ws = pcanApi.openStream(frames => frames.forEach(handleNewMessage));
+    // Fall back to batch polling if the stream cannot be kept open
+    ws.onclose = () => {
+      if (streamRef.current === ws) {
+        streamRef.current = null;
+        startPolling();
+      }
+    };
+    streamRef.current = ws;
+  }, [stopStreaming, startPolling]);
+
   const fetchMessage = async () => {
     try {
-      const data = await pcanApi.read();
-      if (data.payload?.data?.message && typeof data.payload.data.message !== 'string') {
-        const message = data.payload.data.message;
-        handleNewMessage(message);
+      const data = await pcanApi.readBatch();
+      const batch = data.payload?.data;
+      if (batch && Array.isArray(batch.rows)) {
+        const fields = batch.fields;
+        batch.rows.forEach(row => {
+          const message = {};
+          fields.forEach((field, i) => { message[field] = row[i]; });
+          message.data = (message.data.match(/../g) || []).map(byte => parseInt(byte, 16));
+          handleNewMessage(message);
+        });
       }
     } catch (error) {
       console.error('Read error:', error);
@@ -117,7 +144,7 @@ function CANConsole() {
         setMessages([]);
         setMessageCounters({});
         setLastTimestamps({});
-        startPolling();
+        startStreaming();
       } else {
         pushLog('error', data.payload?.data || 'Failed to initialize PCAN');
       }
@@ -132,7 +159,7 @@ function CANConsole() {
       if (data.payload?.packet_status === 'success') {
         pushLog('success', data.payload.data || 'PCAN released');
         setConnected(false);
-        stopPolling();
+        stopStreaming();
       } else {
         pushLog('error', data.payload?.data || 'Failed to release PCAN');
       }
@@ -248,7 +275,7 @@ function CANConsole() {
     pcanApi.getStatus().then(res => {
       if (res.status_code === '00000h') {
         setConnected(true);
-        startPolling();
+        startStreaming();
       }
     }).catch(() => { });
 
@@ -259,9 +286,9 @@ function CANConsole() {
     return () => {
       window.removeEventListener('beforeunload', handleBeforeUnload);
       // Removed pcanApi.release() to keep connection alive during navigation
-      stopPolling();
+      stopStreaming();
     };
-  }, [stopPolling]);
+  }, [stopStreaming]);
 
   return (
     <div className="app-shell">
@@ -2,11 +2,26 @@ import { useState, useEffect, useRef, useCallback } from 'react';
 import { useNavigate } from 'react-router-dom';
 import Chart from 'chart.js/auto';
 import ChartZoom from 'chartjs-plugin-zoom';
-import { pcanApi } from '../services/api';
+import { tpmsApi } from '../services/api';
 
 Chart.register(ChartZoom);
 
-const MAX_HISTORY_POINTS = 50;
+// Points per tire and metric requested from the backend's downsampled history
+const CHART_POINTS = 200;
+const HISTORY_REFRESH_MS = 2000;
+
+const configWatchId = (config) => (config?.watchId || '').trim().toUpperCase();
+
+// How a running collection's configuration differs from this dashboard's, or null
+const describeConfigMismatch = (status, config) => {
+  const diffs = [];
+  const runningAxles = (status.axle_config || []).join(',');
+  const watchId = configWatchId(config);
+  if (status.tire_count !== config.totalTires) diffs.push(`${status.tire_count} tires instead of ${config.totalTires}`);
+  if (runningAxles !== config.axleConfig.join(',')) diffs.push(`axles ${runningAxles} instead of ${config.axleConfig.join(',')}`);
+  if (watchId && parseInt(status.can_id, 16) !== parseInt(watchId, 16)) diffs.push(`ID ${status.can_id ?? 'none'} instead of ${watchId}`);
+  return diffs.length ? diffs.join(', ') : null;
+};
 
 function TPMSDashboard() {
   const navigate = useNavigate();
@@ -29,6 +44,7 @@ function TPMSDashboard() {
   const [detailView, setDetailView] = useState('pressure');
   const [dataHistory, setDataHistory] = useState({ pressure: {}, temperature: {}, battery: {} });
   const [isCollecting, setIsCollecting] = useState(false);
+  const [configMismatch, setConfigMismatch] = useState(null);
 
   // New state for graph filtering
   const [visibleTires, setVisibleTires] = useState([]);
@@ -87,17 +103,8 @@ function TPMSDashboard() {
   useEffect(() => {
     const parsed = config;
     const initialTires = {};
-    let initialHistory = { pressure: {}, temperature: {}, battery: {} };
-
-    const savedHistoryStr = sessionStorage.getItem('tpmsHistory');
-    if (savedHistoryStr) {
-      try {
-        const savedHistory = JSON.parse(savedHistoryStr);
-        if (savedHistory && savedHistory.pressure && savedHistory.temperature && savedHistory.battery) {
-          initialHistory = savedHistory;
-        }
-      } catch (err) { void err; }
-    }
+    // History lives in the backend and is fetched downsampled, see the refresh effect below
+    const initialHistory = { pressure: {}, temperature: {}, battery: {} };
 
     // Restore tire data if available
     const savedTireDataStr = sessionStorage.getItem('tpmsTireData');
@@ -145,87 +152,81 @@ function TPMSDashboard() {
   useEffect(() => {
     if (!isCollecting || !config) return;
 
-    let intervalId;
-
-    const fetchData = async () => {
-      try {
-        const res = await pcanApi.read();
-        // console.log('TPMS Read:', res); // Debug log
-        const msg = res?.payload?.data?.message;
-        if (!msg || typeof msg === 'string') return;
-        const watchId = (config?.watchId || '').trim().toUpperCase();
-        if (watchId && msg.id !== watchId) return;
-
-        const now = new Date();
-        const timeLabel = now.toLocaleTimeString();
-        const bytes = Array.isArray(msg.data) ? msg.data : [];
-        if (bytes.length < 7) return;
-
-        const sensorId = bytes[0] & 0xFF;
-        const tireIndex = sensorId + 1;
-        if (tireIndex < 1 || !config?.totalTires || tireIndex > config.totalTires) return;
-
-        const packetType = bytes[1] & 0xFF;
-        const pressure = ((bytes[2] << 8) | bytes[3]) & 0xFFFF;
-        const tempRaw = ((bytes[5] << 8) | bytes[4]) & 0xFFFF;
-        const temperature = (tempRaw - 8500) / 100;
-        const battery = ((bytes[6] * 10) + 2000) / 1000;
-
-        const severity = (pt => {
-          if (pt === 0x01) return 'ok';
-          if (pt === 0x02) return 'info';
-          if (pt === 0x03) return 'missing';
-          if (pt === 0x04 || pt === 0x05) return 'warning';
-          if (pt >= 0x06 && pt <= 0x09) return 'reserved';
-          if (pt === 0x10) return 'low';
-          if (pt === 0x11) return 'critical';
-          return 'ok';
-        })(packetType);
-
-        setTireData(prevTireData => {
-          const updatedTireData = { ...prevTireData };
-          if (updatedTireData[tireIndex]) {
-            updatedTireData[tireIndex] = {
-              ...updatedTireData[tireIndex],
-              pressure,
-              temperature,
-              battery,
-              lastUpdate: now,
-              status: severity,
+    // Tires are decoded by the backend and pushed over /ws/tpms as they change
+    const watchId = configWatchId(config);
+    let ws = null;
+    let cancelled = false;
+
+    const applyTires = (tires) => {
+      const updates = tires.filter(t => t.count > 0 && t.tire >= 1 && t.tire <= config.totalTires);
+      if (!updates.length) return;
+
+      setTireData(prevTireData => {
+        const updatedTireData = { ...prevTireData };
+        updates.forEach(t => {
+          if (updatedTireData[t.tire]) {
+            updatedTireData[t.tire] = {
+              ...updatedTireData[t.tire],
+              pressure: t.pressure,
+              temperature: t.temperature,
+              battery: t.battery,
+              lastUpdate: t.updated ? new Date(t.updated * 1000) : new Date(),
+              status: t.status,
             };
           }
-          try { sessionStorage.setItem('tpmsTireData', JSON.stringify(updatedTireData)); } catch (err) { void err; }
-          return updatedTireData;
         });
+        try { sessionStorage.setItem('tpmsTireData', JSON.stringify(updatedTireData)); } catch (err) { void err; }
+        return updatedTireData;
+      });
+    };
+
+    // Join a running collection as is, since starting it again would reset it for
+    // every other client, but say so when it runs with another configuration
+    tpmsApi.getStatus()
+      .then(status => {
+        if (!cancelled) setConfigMismatch(status?.is_collecting ? describeConfigMismatch(status, config) : null);
+        return status?.is_collecting ? null : tpmsApi.start(config.totalTires, config.axleConfig, watchId || null);
+      })
+      .catch(e => { void e; })
+      .finally(() => {
+        if (!cancelled) ws = tpmsApi.openStream(applyTires);
+      });
+
+    return () => {
+      cancelled = true;
+      if (ws) ws.close();
+    };
+  }, [isCollecting, config, calculateStatus]);
+
+  useEffect(() => {
+    if (!isCollecting || !config) return;
 
-        setDataHistory(prevHistory => {
-          const newHistory = { ...prevHistory };
-          ['pressure', 'temperature', 'battery'].forEach(metric => {
-            const value = metric === 'pressure' ? pressure : metric === 'temperature' ? temperature : battery;
-            if (!newHistory[metric][tireIndex]) newHistory[metric][tireIndex] = [];
-            newHistory[metric][tireIndex] = [...newHistory[metric][tireIndex], { x: timeLabel, y: value }];
-            if (newHistory[metric][tireIndex].length > MAX_HISTORY_POINTS) {
-              newHistory[metric][tireIndex] = newHistory[metric][tireIndex].slice(-MAX_HISTORY_POINTS);
-            }
+    // Chart data is a fixed number of downsampled points per tire, however long collection runs
+    let cancelled = false;
+    const refreshHistory = async () => {
+      try {
+        const res = await tpmsApi.getHistory({ points: CHART_POINTS });
+        if (cancelled || !res?.success) return;
+        const newHistory = { pressure: {}, temperature: {}, battery: {} };
+        Object.entries(res.series).forEach(([metric, tires]) => {
+          Object.entries(tires).forEach(([tire, series]) => {
+            newHistory[metric][tire] = series.t.map((t, i) => ({
+              x: new Date(t * 1000).toLocaleTimeString(),
+              y: series.v[i],
+            }));
           });
-          try { sessionStorage.setItem('tpmsHistory', JSON.stringify(newHistory)); } catch (err) { void err; }
-          return newHistory;
         });
+        setDataHistory(newHistory);
       } catch (e) { void e; }
     };
 
-    const startFetching = async () => {
-      intervalId = setInterval(fetchData, 100);
-    };
-
-    startFetching();
-
+    refreshHistory();
+    const intervalId = setInterval(refreshHistory, HISTORY_REFRESH_MS);
     return () => {
-      if (intervalId) {
-        clearInterval(intervalId);
-      }
+      cancelled = true;
+      clearInterval(intervalId);
     };
-  }, [isCollecting, config, calculateStatus]);
+  }, [isCollecting, config]);
 
   useEffect(() => {
     if (!mainChartRef.current || !config || Object.keys(dataHistory.pressure).length === 0) return;
@@ -487,6 +488,13 @@ function TPMSDashboard() {
     return { positions, truckStyle, cabStyle, trailerStyle };
   }, [config]);
 
+  const restartWithConfig = useCallback(async () => {
+    try {
+      const res = await tpmsApi.start(config.totalTires, config.axleConfig, configWatchId(config) || null);
+      if (res?.success) setConfigMismatch(null);
+    } catch (e) { void e; }
+  }, [config]);
+
   const handleZoom = useCallback((chartRef, direction) => {
     const chart = chartRef.current;
     if (!chart) return;
@@ -524,6 +532,13 @@ function TPMSDashboard() {
           </div>
         </header>
 
+        {configMismatch && (
+          <div className="config-notice">
+            <span>TPMS collection is already running with {configMismatch}.</span>
+            <button className="btn-secondary" onClick={restartWithConfig}>Restart with this configuration</button>
+          </div>
+        )}
+
         <div className="truck-view-section">
           <div className="view-selector-header">
             <div className="view-toggle">
@@ -820,6 +835,17 @@ const globalStyles = `
 
   .btn-secondary:hover { transform: translateY(-2px); border-color: var(--accent); color: var(--text); }
 
+  .config-notice {
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+    flex-wrap: wrap;
+    gap: 16px;
+    padding: 16px 30px;
+    border-bottom: 1px solid var(--card-border);
+    color: var(--warning);
+  }
+
   .truck-view-section {
     padding: 40px;
     background: var(--bg);
@@ -54,6 +54,30 @@ export const pcanApi = {
     return response.json();
   },
 
+  async readBatch(maxCount = 500, waitMs = 0) {
+    const response = await fetch(`${API_BASE}/pcan/read/batch?max_count=${maxCount}&wait_ms=${waitMs}`);
+    return response.json();
+  },
+
+  async readSince(seq = null, maxCount = 500, waitMs = 0, channel = null) {
+    const params = new URLSearchParams({ max_count: maxCount, wait_ms: waitMs });
+    if (seq !== null) params.set('seq', seq);
+    if (channel) params.set('channel', channel);
+    const response = await fetch(`${API_BASE}/pcan/read/since?${params}`);
+    return response.json();
+  },
+
+  openStream(onFrames, ids = []) {
+    const wsProtocol = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
+    const query = ids.length ? `?ids=${ids.join(',')}` : '';
+    const ws = new WebSocket(`${wsProtocol}${window.location.host}/ws/can${query}`);
+    ws.onmessage = (event) => {
+      const msg = JSON.parse(event.data);
+      if (msg.type === 'can_frames') onFrames(msg.frames);
+    };
+    return ws;
+  },
+
   async write(id, data) {
     const response = await fetch(`${API_BASE}/pcan/write`, {
       method: 'POST',
@@ -70,6 +94,18 @@ export const pcanApi = {
     return response.json();
   },
 
+  async writeBatch(frames, waitMs = 0) {
+    const response = await fetch(`${API_BASE}/pcan/write/batch`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        frames: frames.map(f => ({ ...f, id: f.id.toUpperCase() })),
+        wait_ms: waitMs
+      })
+    });
+    return response.json();
+  },
+
   async getStatus() {
     const response = await fetch(`${API_BASE}/pcan/status`);
     return response.json();
@@ -93,11 +129,11 @@ export const pcanApi = {
 };
 
 export const tpmsApi = {
-  async start(tireCount, axleConfig) {
+  async start(tireCount, axleConfig, canId = null, channel = null) {
     const response = await fetch(`${API_BASE}/tpms/start`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ tire_count: tireCount, axle_config: axleConfig })
+      body: JSON.stringify({ tire_count: tireCount, axle_config: axleConfig, can_id: canId, channel })
     });
     return response.json();
   },
@@ -110,8 +146,72 @@ export const tpmsApi = {
     return response.json();
   },
 
+  async reset() {
+    const response = await fetch(`${API_BASE}/tpms/reset`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' }
+    });
+    return response.json();
+  },
+
   async getStatus() {
     const response = await fetch(`${API_BASE}/tpms/status`);
     return response.json();
+  },
+
+  async getHistory({ metric = null, tires = null, start = null, end = null, points = 500, method = 'lttb' } = {}) {
+    const params = new URLSearchParams({ points, method });
+    if (metric) params.set('metric', metric);
+    if (tires) params.set('tires', tires.join(','));
+    if (start !== null) params.set('start', start);
+    if (end !== null) params.set('end', end);
+    const response = await fetch(`${API_BASE}/tpms/history?${params}`);
+    return response.json();
+  },
+
+  async getReadings(tire, { vehicle = null, start = null, end = null, metric = null, points = null } = {}) {
+    const params = new URLSearchParams({ tire });
+    if (vehicle) params.set('vehicle', vehicle);
+    if (start !== null) params.set('start', start);
+    if (end !== null) params.set('end', end);
+    if (metric) params.set('metric', metric);
+    if (points) params.set('points', points);
+    const response = await fetch(`${API_BASE}/tpms/readings?${params}`);
+    return response.json();
+  },
+
+  async getVehicles() {
+    const response = await fetch(`${API_BASE}/tpms/vehicles`);
+    return response.json();
+  },
+
+  async getAlarms(since = null) {
+    const query = since !== null ? `?since=${since}` : '';
+    const response = await fetch(`${API_BASE}/tpms/alarms${query}`);
+    return response.json();
+  },
+
+  async setAlarmRules(rules) {
+    const response = await fetch(`${API_BASE}/tpms/alarms/rules`, {
+      method: 'PUT',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(rules)
+    });
+    return response.json();
+  },
+
+  async getTires() {
+    const response = await fetch(`${API_BASE}/tpms/tires`);
+    return response.json();
+  },
+
+  openStream(onTires) {
+    const wsProtocol = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
+    const ws = new WebSocket(`${wsProtocol}${window.location.host}/ws/tpms`);
+    ws.onmessage = (event) => {
+      const msg = JSON.parse(event.data);
+      if (msg.type === 'tpms_tires') onTires(msg.tires);
+    };
+    return ws;
   }
 };